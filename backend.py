@@ -1,26 +1,210 @@
 from PySide6.QtCore import (
     Qt, QDate, QAbstractTableModel,
-    QSortFilterProxyModel, QModelIndex
+    QSortFilterProxyModel, QModelIndex,
+    QObject, QFileSystemWatcher, QTimer
 )
+import io
+import os
+import numpy as np
 import pandas as pd
-import uuid
+
+from file_io import (
+    DATE_FORMAT, check_log_columns, expand_log_paths, has_row_ids, read_appended_rows, normalize_log,
+    with_raw_text
+)
+from history import UndoHistory, DEFAULT_UNDO_LIMIT
+
+COLUMN_SAMPLE_EDGE = 20  # rows measured at each end of the table
+COLUMN_SAMPLE_SIZE = 200  # rows measured at random in between
+SCOPE_PATCH_ROWS = 1000  # longer changes rebuild the filter scope in one vectorized pass
+
+
+def proxy_rows(proxy):
+    # The source model does the sorting, so proxy rows keep source order and
+    # an unfiltered proxy maps row for row
+    if proxy.rowCount() == proxy.sourceModel().rowCount():
+        return list(range(proxy.rowCount()))
+    scope = proxy.scope() if hasattr(proxy, "scope") else None
+    if scope is not None:
+        return np.flatnonzero(scope).tolist()
+    return [proxy.mapToSource(proxy.index(row, 0)).row() for row in range(proxy.rowCount())]
 
 
 def proxy_to_df(proxy):
+    # Typed rows straight from the source frame, nothing is re-parsed
     source_model = proxy.sourceModel()
-    rows = proxy.rowCount()
-    cols = source_model.columnCount()
-    data = []
+    return source_model.rows_frame(proxy_rows(proxy))
+
+
+def report_frame(proxy):
+    # The filtered rows for Generate. The database reads one plate's rows
+    # off its vehicle and time index, already in the order trips pair in.
+    source_model = proxy.sourceModel()
+    frame = source_model.vehicle_frame() if hasattr(source_model, "vehicle_frame") else None
+    return proxy_to_df(proxy) if frame is None else frame
+
+
+def format_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(DATE_FORMAT)
+    if not isinstance(value, str) and pd.isna(value):
+        return ""
+    return str(value)
+
+
+def format_values(column):
+    # format_value for a whole column
+    if pd.api.types.is_datetime64_any_dtype(column):
+        text = column.dt.strftime(DATE_FORMAT)
+    else:
+        text = column.astype(object).astype(str)
+    return text.where(column.notna(), "").astype(object)
+
+
+def longest_text(column):
+    # The longest display text of a column, without formatting every value
+    values = column.dropna()
+    if values.empty:
+        return ""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return format_value(values.iat[0])  # DATE_FORMAT has a fixed width
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Series(values.cat.remove_unused_categories().cat.categories)
+    elif pd.api.types.is_integer_dtype(values):
+        values = pd.Series([values.min(), values.max()])
+    text = values.astype(str)
+    return text.iat[int(text.str.len().to_numpy().argmax())]
+
+
+def sample_rows(count, edge=COLUMN_SAMPLE_EDGE, size=COLUMN_SAMPLE_SIZE):
+    # First and last rows plus a random sample, in row order. The seed is
+    # fixed so the same file always gets the same widths.
+    if count <= 2 * edge + size:
+        return list(range(count))
+    middle = np.random.default_rng(0).choice(np.arange(edge, count - edge), size, replace=False)
+    return list(range(edge)) + sorted(middle.tolist()) + list(range(count - edge, count))
+
+
+def same_value(a, b):
+    a_missing, b_missing = pd.isna(a), pd.isna(b)
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    return bool(a == b)
+
+
+def concat_rows(frames):
+    # Plain pd.concat falls back to object dtype when categories differ
+    frames = list(frames)
+    for col in frames[0].columns:
+        dtypes = [f[col].dtype for f in frames]
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes):
+            categories = pd.Index(
+                pd.unique(np.concatenate([np.asarray(d.categories, dtype=object) for d in dtypes]))
+            )
+            frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
 
-    for row in range(rows):
-        row_data = [
-            source_model.data(proxy.mapToSource(proxy.index(row, col)), role=Qt.DisplayRole)
-            for col in range(cols)
-        ]
-        data.append(row_data)
 
-    headers = [source_model.headerData(i, Qt.Horizontal, role=Qt.DisplayRole) for i in range(cols)]
-    return pd.DataFrame(data, columns=headers)
+def sort_key(column):
+    # Numeric keys that order like the typed values, missing values above
+    # every other key so they sort last
+    if pd.api.types.is_datetime64_any_dtype(column):
+        keys = column.to_numpy(dtype="int64", copy=True)
+        keys[column.isna().to_numpy()] = np.iinfo(np.int64).max
+        return keys
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        rank = np.empty(len(categories) + 1, dtype=np.int64)
+        rank[np.argsort(np.asarray(categories.astype(str)), kind="stable")] = np.arange(len(categories))
+        rank[-1] = len(categories)  # code -1 is missing
+        return rank[column.cat.codes.to_numpy()]
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.to_numpy(dtype="float64", na_value=np.inf)
+    codes, uniques = pd.factorize(column.astype(str).where(column.notna()), sort=True)
+    codes = codes.astype(np.int64)
+    codes[codes < 0] = len(uniques)
+    return codes
+
+
+NO_PLATE = ""  # index key of rows without a plate, no plate filter contains it
+
+
+def plate_key(value):
+    return NO_PLATE if pd.isna(value) else str(value).lower()
+
+
+class PartitionIndex:
+    # Row ids of each vehicle sorted by time, so a vehicle and date range
+    # is a dict lookup and two binary searches instead of a scan. Kept by
+    # row id, ids survive sorting; PandasModel turns them into positions.
+    def __init__(self, df):
+        self.partitions = {}  # lowercase plate -> (times, ids), rows without a date last
+        self.add(df["_id"].to_numpy(), df["Pojazd"], df["Data i Godzina"].to_numpy())
+
+    def add(self, ids, vehicles, times):
+        keys = pd.Series(vehicles, dtype=object).map(plate_key).to_numpy()
+        ids = np.asarray(ids, dtype=np.int64)
+        times = np.asarray(times)
+        if not len(ids):
+            return
+        codes, uniques = pd.factorize(keys)
+        for code, key in enumerate(uniques):
+            take = codes == code
+            part_times, part_ids = times[take], ids[take]
+            if key in self.partitions:
+                old_times, old_ids = self.partitions[key]
+                part_times = np.concatenate([old_times, part_times.astype(old_times.dtype)])
+                part_ids = np.concatenate([old_ids, part_ids])
+            order = np.argsort(part_times, kind="stable")  # NaT sorts last
+            self.partitions[key] = (part_times[order], part_ids[order])
+
+    def remove(self, ids, vehicles):
+        # vehicles are the plates the rows were indexed under
+        ids = np.asarray(ids, dtype=np.int64)
+        keys = pd.Series(vehicles, dtype=object).map(plate_key)
+        for key in keys.unique():
+            part_times, part_ids = self.partitions[key]
+            keep = ~np.isin(part_ids, ids[(keys == key).to_numpy()])
+            if keep.any():
+                self.partitions[key] = (part_times[keep], part_ids[keep])
+            else:
+                del self.partitions[key]
+
+    def select(self, text="", start=None, end=None):
+        # Ids of the rows the proxy's filters would keep, or None when text
+        # is not a plate. As in the database, a plate matches the vehicles
+        # containing it and not the other columns. start and end are
+        # datetime.date values, both inclusive; rows without a date pass.
+        text = text.lower()
+        if text and text not in self.partitions:
+            return None
+        parts = [part for key, part in self.partitions.items() if text in key]
+        if start is None or end is None:
+            return np.concatenate([ids for _, ids in parts] + [np.empty(0, dtype=np.int64)])
+        bounds = pd.DatetimeIndex([start, pd.Timestamp(end) + pd.Timedelta(days=1), pd.NaT]).to_numpy()
+        selected = []
+        for times, ids in parts:
+            first, last, undated = np.searchsorted(times, bounds.astype(times.dtype))
+            selected.append(ids[first:last])
+            selected.append(ids[undated:])
+        return np.concatenate(selected + [np.empty(0, dtype=np.int64)])
+
+    def is_plate(self, text):
+        return not text or text.lower() in self.partitions
+
+    def accepts(self, vehicles, times, text="", start=None, end=None):
+        # select() over a few given rows as a mask, None when text is not a
+        # plate. Row by row, called with the short runs of an edit.
+        if not self.is_plate(text):
+            return None
+        text = text.lower()
+        mask = np.fromiter((text in plate_key(v) for v in vehicles), dtype=bool, count=len(vehicles))
+        if start is not None and end is not None:
+            times = np.asarray(times)
+            bounds = pd.DatetimeIndex([start, pd.Timestamp(end) + pd.Timedelta(days=1)]).to_numpy()
+            first, last = bounds.astype(times.dtype)
+            mask &= ((times >= first) & (times < last)) | np.isnat(times)
+        return mask
 
 
 class IDFilterProxyModel(QSortFilterProxyModel):
@@ -30,13 +214,111 @@ class IDFilterProxyModel(QSortFilterProxyModel):
         self.start_date = None
         self.end_date = None
         self.date_col_index = None
+        self.pushdown = False
+        self._scope = None
+        self._scope_stale = True
+
+    def setSourceModel(self, model):
+        # Models that filter in their own query get the filters handed down
+        self.pushdown = hasattr(model, "set_query_filter")
+        self._scope_stale = True
+        if hasattr(model, "scope_rows"):
+            # Connected ahead of the proxy's own handlers, so rows refiltered
+            # after a change are checked against a current scope. Row runs
+            # and edits patch the mask, only reordering rebuilds it.
+            model.dataChanged.connect(self._scope_data_changed)
+            model.rowsInserted.connect(self._scope_rows_inserted)
+            model.rowsRemoved.connect(self._scope_rows_removed)
+            model.layoutChanged.connect(self._invalidate_scope)
+            model.modelReset.connect(self._invalidate_scope)
+        super().setSourceModel(model)
+
+    def _invalidate_scope(self, *args):
+        self._scope_stale = True
+
+    def _scope_args(self):
+        dated = self.start_date and self.end_date
+        return (self.filter_text,) + (self._date_bounds if dated else (None, None))
+
+    def _scope_patch(self, first, last):
+        # The scope of source rows first to last, None when the text stopped
+        # being a plate (or became one) and the whole scope is rebuilt
+        if self._scope_stale or self._scope is None or last - first >= SCOPE_PATCH_ROWS:
+            self._scope_stale = True
+            return None
+        mask = self.sourceModel().scope_mask(first, last, *self._scope_args())
+        if mask is None:
+            self._scope_stale = True
+        return mask
+
+    def _scope_data_changed(self, top_left, bottom_right, roles=None):
+        mask = self._scope_patch(top_left.row(), bottom_right.row())
+        if mask is not None:
+            self._scope[top_left.row():bottom_right.row() + 1] = mask
+
+    def _scope_rows_inserted(self, parent, first, last):
+        # A scope rebuilt during an insert already covers the rows of its
+        # later runs: the model holds every new row before the first one
+        if self._scope is not None and len(self._scope) == len(self.sourceModel().to_frame().index):
+            return
+        mask = self._scope_patch(first, last)
+        if mask is not None:
+            self._scope = np.insert(self._scope, first, mask)
+
+    def _scope_rows_removed(self, parent, first, last):
+        if self._scope_stale or self._scope is None:
+            self._scope_stale = True
+        elif not self.sourceModel().partition_index().is_plate(self.filter_text):
+            self._scope_stale = True
+        else:
+            self._scope = np.delete(self._scope, np.s_[first:last + 1])
+
+    def scope(self):
+        # The rows the filters keep as a mask over source rows, looked up in
+        # the model's partition index. None when there is nothing to filter
+        # or the text filter needs a scan.
+        if self._scope_stale:
+            self._scope_stale = False
+            self._scope = None
+            model = self.sourceModel()
+            dated = self.start_date and self.end_date
+            if hasattr(model, "scope_rows") and not self.pushdown and (self.filter_text or dated):
+                rows = model.scope_rows(*self._scope_args())
+                if rows is not None:
+                    self._scope = np.zeros(len(model.to_frame().index), dtype=bool)
+                    self._scope[rows] = True
+        return self._scope
+
+    def set_filter_text(self, text):
+        self.filter_text = text
+        self._apply_filters()
+
+    def _apply_filters(self):
+        if self.pushdown:
+            start, end = self._date_bounds if self.start_date and self.end_date else (None, None)
+            self.sourceModel().set_query_filter(self.filter_text, start, end)
+        else:
+            self._scope_stale = True
+            self.invalidateFilter()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # The source reorders itself from precomputed keys in one pass,
+        # so lessThan is never called per comparison
+        if column >= 0:
+            self.sourceModel().sort(column, order)
 
     def set_date_range(self, start: QDate, end: QDate):
         self.start_date = start
         self.end_date = end
-        self.invalidateFilter()
+        self._date_bounds = (start.toPython(), end.toPython())
+        self._apply_filters()
 
     def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self.pushdown:
+            return True
+        scope = self.scope()
+        if scope is not None:
+            return bool(scope[source_row])
         if self.filter_text:
             column_count = self.sourceModel().columnCount()
             matched = False
@@ -50,30 +332,39 @@ class IDFilterProxyModel(QSortFilterProxyModel):
                 return False
 
         if self.start_date and self.end_date and self.date_col_index is not None:
-            index = self.sourceModel().index(source_row, self.date_col_index, source_parent)
-            value = self.sourceModel().data(index)
-            if value:
-                dt = pd.to_datetime(value, format="%d.%m.%Y %H:%M", errors='coerce')
-                if dt is pd.NaT:
-                    return False
-                row_date = QDate(dt.year, dt.month, dt.day)
-                if row_date < self.start_date or row_date > self.end_date:
+            value = self.sourceModel().typed_value(source_row, self.date_col_index)
+            if not pd.isna(value):
+                row_date = value.date()
+                if row_date < self._date_bounds[0] or row_date > self._date_bounds[1]:
                     return False
 
         return True
 
 
 class PandasModel(QAbstractTableModel):
-    def __init__(self, df=pd.DataFrame(), locked=False):
+    writes_through = False  # edits live in memory until the log is saved
+    edits_rows = True  # rows can be inserted, deleted and rewritten in bulk
+
+    def __init__(self, df=pd.DataFrame(), locked=False, parse_errors=(), undo_limit=DEFAULT_UNDO_LIMIT):
         super().__init__()
-        if "_id" not in df.columns:
+        if not has_row_ids(df):
             df = df.copy()
-            df['_id'] = [str(uuid.uuid4()) for _ in range(len(df))]
+            df['_id'] = np.arange(len(df), dtype=np.int64)
+        self._next_id = int(df["_id"].max()) + 1 if len(df) else 0
         self._df = df.copy(deep=True)
         self._original_df = df.copy(deep=True)
-        self._undo_stack = []
-        self._redo_stack = []
+        self._history = UndoHistory(undo_limit)
+        self._announced_rows = None
         self._locked = locked
+        self._sort_keys = {}
+        self._partitions = None  # PartitionIndex, built on first scoped filter
+        self._positions = None  # row id -> position, rebuilt after rows move
+        # (row id, column) -> text that could not be parsed on import
+        self.parse_errors = {(row_id, col): text for row_id, col, text in parse_errors}
+        self.dataChanged.connect(self._on_data_changed)
+        self.rowsInserted.connect(self._invalidate_sort_keys)
+        self.rowsRemoved.connect(self._invalidate_sort_keys)
+        self.modelReset.connect(self._invalidate_sort_keys)
 
     def set_locked(self, locked: bool):
         self._locked = locked
@@ -82,19 +373,266 @@ class PandasModel(QAbstractTableModel):
         return self._locked
 
     def rowCount(self, parent=None):
+        # While one rebuild is announced as several row ranges the count
+        # follows the announcements
+        if parent is not None and parent.isValid():
+            return 0  # cells have no children
+        if self._announced_rows is not None:
+            return self._announced_rows
         return len(self._df.index)
 
     def columnCount(self, parent=None):
+        if parent is not None and parent.isValid():
+            return 0
         return len(self._df.columns) - 1  # hide _id
 
     def data(self, index, role=Qt.DisplayRole):
         if index.isValid() and role == Qt.DisplayRole:
-            visible_col = index.column()
-            actual_cols = [c for c in self._df.columns if c != "_id"]
-            col_name = actual_cols[visible_col]
-            return str(self._df.iat[index.row(), self._df.columns.get_loc(col_name)])
+            return format_value(self.typed_value(index.row(), index.column()))
+        if index.isValid() and role == Qt.ToolTipRole and self.parse_errors:
+            col_name = [c for c in self._df.columns if c != "_id"][index.column()]
+            text = self.parse_errors.get((self._df.at[index.row(), "_id"], col_name))
+            if text is not None:
+                return f"Could not read {text!r}"
         return None
 
+    def rows_of(self, row_ids):
+        # Current positions of rows by id; ids survive sorting, positions do not
+        return pd.Index(self._df["_id"].to_numpy()).get_indexer(row_ids)
+
+    def typed_value(self, row, col):
+        visible_cols = [c for c in self._df.columns if c != "_id"]
+        return self._df.iat[row, self._df.columns.get_loc(visible_cols[col])]
+
+    def rows_frame(self, rows):
+        return self._df.iloc[rows].drop(columns="_id").reset_index(drop=True)
+
+    def partition_index(self):
+        # None for frames that are not typed logs, such as generated trips
+        if self._partitions is None and {"Pojazd", "Data i Godzina"}.issubset(self._df.columns) \
+                and pd.api.types.is_datetime64_any_dtype(self._df["Data i Godzina"]):
+            self._partitions = PartitionIndex(self._df)
+        return self._partitions
+
+    def scope_rows(self, text="", start=None, end=None):
+        # Sorted positions of the rows in a vehicle and date range, or None
+        # when the index can not answer and the rows have to be scanned
+        index = self.partition_index()
+        ids = None if index is None else index.select(text, start, end)
+        if ids is None:
+            return None
+        if self._positions is None:
+            self._positions = np.full(self._next_id, -1, dtype=np.intp)
+            self._positions[self._df["_id"].to_numpy()] = np.arange(len(self._df.index))
+        return np.sort(self._positions[ids])
+
+    def scope_mask(self, first, last, text="", start=None, end=None):
+        # scope_rows for the rows first to last only, as a mask
+        index = self.partition_index()
+        if index is None:
+            return None
+        return index.accepts(
+            self._df["Pojazd"].array[first:last + 1], self._df["Data i Godzina"].to_numpy()[first:last + 1],
+            text, start, end
+        )
+
+    def _unindex_rows(self, rows):
+        if self._partitions is not None:
+            self._partitions.remove(self._df["_id"].to_numpy()[rows], self._df["Pojazd"].iloc[rows])
+
+    def _index_rows(self, rows):
+        if self._partitions is not None:
+            self._partitions.add(rows["_id"].to_numpy(), rows["Pojazd"], rows["Data i Godzina"].to_numpy())
+
+    def longest_values(self):
+        return [longest_text(self._df[c]) for c in self._df.columns if c != "_id"]
+
+    def to_frame(self):
+        return self._df
+
+    def parse_error_list(self):
+        return [(row_id, col, text) for (row_id, col), text in self.parse_errors.items()]
+
+    def export_frame(self):
+        # The rows to save, values that did not parse kept as they were read
+        return with_raw_text(self._df, self.parse_error_list())
+
+    def date_span(self, rows):
+        dates = self._df["Data i Godzina"].iloc[rows].dropna()
+        if dates.empty:
+            return None, None
+        return dates.min(), dates.max()
+
+    def coerce_value(self, col_name, value):
+        # Editors hand back text, convert it to the column's type
+        column = self._df[col_name]
+        if isinstance(value, str):
+            if value.strip() == "":
+                return None
+        elif pd.isna(value):
+            return None
+        if pd.api.types.is_datetime64_any_dtype(column):
+            if isinstance(value, pd.Timestamp):
+                return value
+            parsed = pd.to_datetime(value, format=DATE_FORMAT, errors="coerce")
+            if parsed is pd.NaT:
+                raise ValueError(f"Expected a date like 01.03.2025 08:00, got {value!r}")
+            return parsed
+        if pd.api.types.is_integer_dtype(column):
+            return int(str(value).replace(" ", ""))
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            if value not in column.cat.categories:
+                self._df[col_name] = column.cat.add_categories([value])
+        return value
+
+    def coerce_values(self, col_name, values):
+        # coerce_value for many values at once, one bad value rejects them all
+        column = self._df[col_name]
+        text = pd.Series(list(values), dtype=object)
+        blank = text.isna() | (text.astype(str).str.strip() == "")
+        if pd.api.types.is_datetime64_any_dtype(column):
+            typed = pd.to_datetime(text.where(~blank), format=DATE_FORMAT, errors="coerce")
+            bad = typed.isna() & ~blank
+        elif pd.api.types.is_integer_dtype(column):
+            typed = pd.to_numeric(text.where(~blank).astype(str).str.replace(" ", ""), errors="coerce")
+            bad = (typed.isna() | (typed % 1 != 0)) & ~blank
+            typed = typed.where(~bad)
+        else:
+            return text.where(~blank, None).tolist()
+        if bad.any():
+            raise ValueError(f"{col_name} cannot take {text[bad].iloc[0]!r}")
+        if pd.api.types.is_integer_dtype(column):
+            typed = typed.astype("Int64")
+        return typed.astype(object).where(typed.notna(), None).tolist()
+
+    def _assign(self, col_name, rows, values):
+        # One vectorised write of already typed values
+        indexed = col_name in ("Pojazd", "Data i Godzina")
+        if indexed:
+            self._unindex_rows(rows)
+        column = self._df[col_name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            new = pd.Index([v for v in values if not pd.isna(v)]).unique().difference(column.cat.categories)
+            if len(new):
+                self._df[col_name] = column.cat.add_categories(new)
+        self._df.iloc[rows, self._df.columns.get_loc(col_name)] = pd.Series(values, dtype=object).to_numpy()
+        if indexed:
+            self._index_rows(self._df.iloc[rows])
+        if self.parse_errors:
+            for row_id, value in zip(self._df["_id"].to_numpy()[rows], values):
+                if not pd.isna(value):
+                    self.parse_errors.pop((row_id, col_name), None)
+
+    def set_column(self, col_name, rows, values):
+        # Writes values into rows of one column as a single undo entry. The
+        # caller emits dataChanged, so a block of columns can share one.
+        rows = np.asarray(rows, dtype=np.intp)
+        old_values = self._df[col_name].iloc[rows].tolist()
+        self._assign(col_name, rows, values)
+        new_values = self._df[col_name].iloc[rows].tolist()
+        changed = [i for i, (a, b) in enumerate(zip(old_values, new_values)) if not same_value(a, b)]
+        if changed:
+            self._push_edit(
+                col_name, rows[changed],
+                [old_values[i] for i in changed], [new_values[i] for i in changed]
+            )
+        return len(changed)
+
+    def _emit_block_changed(self, rows, cols):
+        self.dataChanged.emit(
+            self.index(int(min(rows)), int(min(cols))),
+            self.index(int(max(rows)), int(max(cols))),
+            [Qt.DisplayRole]
+        )
+
+    def set_block(self, rows, first_col, block):
+        # Pasted text: block[i][j] goes to rows[i], column first_col + j.
+        # Short lines leave the cells past their end alone.
+        if self._locked or not len(rows) or not block:
+            return 0
+        visible_cols = [c for c in self._df.columns if c != "_id"]
+        lines = list(zip(rows, block))
+        cols = range(first_col, min(first_col + max(len(line) for line in block), len(visible_cols)))
+        targets = {}
+        try:
+            for col in cols:
+                cells = [(row, line[col - first_col]) for row, line in lines if col - first_col < len(line)]
+                targets[col] = (
+                    [row for row, _ in cells],
+                    self.coerce_values(visible_cols[col], [text for _, text in cells])
+                )
+        except ValueError as e:
+            print(f"Rejected paste: {e}")
+            return 0
+        changed = 0
+        with self._history.group():
+            for col, (col_rows, values) in targets.items():
+                changed += self.set_column(visible_cols[col], col_rows, values)
+        self._emit_block_changed([row for row, _ in lines], cols)
+        return changed
+
+    def fill_down(self, rows_by_col):
+        # {column: rows in view order}, the first row's value goes to the rest
+        if self._locked:
+            return 0
+        visible_cols = [c for c in self._df.columns if c != "_id"]
+        rows_by_col = {col: rows for col, rows in rows_by_col.items() if len(rows) > 1}
+        if not rows_by_col:
+            return 0
+        changed = 0
+        with self._history.group():
+            for col, rows in rows_by_col.items():
+                col_name = visible_cols[col]
+                value = self._df[col_name].iat[rows[0]]
+                changed += self.set_column(col_name, rows[1:], [value] * (len(rows) - 1))
+        self._emit_block_changed(
+            [row for rows in rows_by_col.values() for row in rows], list(rows_by_col)
+        )
+        return changed
+
+    def find_replace(self, col, pattern, replacement, regex=False, rows=None):
+        # Replaces in the displayed text of one column, returns the number of
+        # cells changed. Raises re.error or ValueError for bad input.
+        if self._locked:
+            return 0
+        col_name = [c for c in self._df.columns if c != "_id"][col]
+        column = self._df[col_name]
+        rows = np.arange(len(self._df.index)) if rows is None else np.asarray(rows, dtype=np.intp)
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Each distinct text is replaced once, rows follow their category
+            categories = pd.Series(column.cat.categories.astype(str), dtype=object)
+            replaced = categories.str.replace(pattern, replacement, regex=regex).to_numpy()
+            codes = column.cat.codes.to_numpy()[rows]
+            hit = (replaced != categories.to_numpy())[codes] & (codes >= 0)
+            new_text = replaced[codes[hit]]
+        else:
+            text = format_values(column.iloc[rows])
+            replaced = text.str.replace(pattern, replacement, regex=regex)
+            hit = (replaced != text).to_numpy()
+            new_text = replaced.to_numpy()[hit]
+        rows = rows[hit]
+        if not len(rows):
+            return 0
+        changed = self.set_column(col_name, rows, self.coerce_values(col_name, new_text))
+        self._emit_block_changed(rows, [col])
+        return changed
+
+    def set_value(self, row, col_name, value):
+        try:
+            value = self.coerce_value(col_name, value)
+        except (TypeError, ValueError) as e:
+            print(f"Rejected edit: {e}")
+            return False
+        indexed = col_name in ("Pojazd", "Data i Godzina")
+        if indexed:
+            self._unindex_rows([row])
+        self._df.at[row, col_name] = value
+        if indexed:
+            self._index_rows(self._df.iloc[[row]])
+        if not pd.isna(value):
+            self.parse_errors.pop((self._df.at[row, "_id"], col_name), None)
+        return True
+
     def setData(self, index, value, role=Qt.EditRole):
         if self._locked:
             return False
@@ -102,17 +640,19 @@ class PandasModel(QAbstractTableModel):
             visible_cols = [c for c in self._df.columns if c != "_id"]
             col_name = visible_cols[index.column()]
             old_value = self._df.at[index.row(), col_name]
-            if value == old_value:
+            if isinstance(value, str) and value == format_value(old_value):
+                return False
+            if not self.set_value(index.row(), col_name, value):
                 return False
-            self._df.at[index.row(), col_name] = value
+            value = self._df.at[index.row(), col_name]
             self.dataChanged.emit(index, index, [Qt.DisplayRole])
-            # store both old and new values
-            self._undo_stack.append(('edit', index.row(), col_name, old_value, value))
-            self._redo_stack.clear()
+            self._push_edit(col_name, [index.row()], [old_value], [value])
             return True
         return False
 
     def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
         base_flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
         if not self._locked:
             base_flags |= Qt.ItemIsEditable
@@ -127,6 +667,41 @@ class PandasModel(QAbstractTableModel):
         else:
             return str(self._df.index[section])
 
+    def _on_data_changed(self, top_left, bottom_right, roles=None):
+        visible_cols = [c for c in self._df.columns if c != "_id"]
+        for col in range(top_left.column(), bottom_right.column() + 1):
+            self._sort_keys.pop(visible_cols[col], None)
+
+    def _invalidate_sort_keys(self, *args):
+        self._sort_keys.clear()
+
+    def sort_key(self, col_name):
+        if col_name not in self._sort_keys:
+            self._sort_keys[col_name] = sort_key(self._df[col_name])
+        return self._sort_keys[col_name]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        visible_cols = [c for c in self._df.columns if c != "_id"]
+        if column < 0 or column >= len(visible_cols):
+            return
+        keys = self.sort_key(visible_cols[column])
+        if order == Qt.DescendingOrder:
+            # Missing values stay last in both directions
+            keys = np.where(self._df[visible_cols[column]].isna().to_numpy(), keys, -keys)
+        permutation = np.argsort(keys, kind="stable")
+        inverse = np.empty_like(permutation)
+        inverse[permutation] = np.arange(len(permutation))
+
+        self.layoutAboutToBeChanged.emit()
+        self._df = self._df.iloc[permutation].reset_index(drop=True)
+        self._positions = None
+        self._sort_keys = {c: k[permutation] for c, k in self._sort_keys.items()}
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(old_indexes, [
+            self.index(int(inverse[i.row()]), i.column()) for i in old_indexes
+        ])
+        self.layoutChanged.emit()
+
     def revert_cell(self, row, col):
         if self._locked:
             return False
@@ -134,15 +709,13 @@ class PandasModel(QAbstractTableModel):
         col_name = visible_cols[col]
         row_id = self._df.at[row, "_id"]
         old_value = self._df.at[row, col_name]
-        new_value = self._original_df.loc[self._original_df['_id'] == row_id, col_name].values[0]
-        if old_value == new_value:
+        new_value = self._original_df.loc[self._original_df['_id'] == row_id, col_name].iloc[0]
+        if same_value(old_value, new_value):
             return
-        self._df.at[row, col_name] = new_value
+        self.set_value(row, col_name, new_value)
         index = self.index(row, col)
         self.dataChanged.emit(index, index, [Qt.DisplayRole])
-        self._undo_stack.append(('edit', row, col_name, old_value, new_value))
-        self._redo_stack.clear()
-
+        self._push_edit(col_name, [row], [old_value], [new_value])
 
     def insert_row(self, proxy_index, copy_columns=None):
         if self._locked:
@@ -154,110 +727,436 @@ class PandasModel(QAbstractTableModel):
         if hasattr(proxy_index.model(), 'mapToSource'):
             row = proxy_index.model().mapToSource(proxy_index).row()
 
-        new_row = pd.Series([None]*self._df.shape[1], index=self._df.columns)
-        new_row['_id'] = str(uuid.uuid4())
-
-        if copy_columns:
-            for col in copy_columns:
-                new_row[col] = self._df.at[row, col]
-
-        self.beginInsertRows(QModelIndex(), row, row)
-        self._df = pd.concat([
-            self._df.iloc[:row],
-            pd.DataFrame([new_row]),
-            self._df.iloc[row:]
-        ]).reset_index(drop=True)
-        self._original_df = pd.concat([
-            self._original_df,
-            pd.DataFrame([new_row])],
-            ignore_index=True)
-        self.endInsertRows()
-        # store inverse action for undo
-        self._undo_stack.append(('insert_row', row, new_row))
-        self._redo_stack.clear()
+        # Built from an existing row so every column keeps its dtype
+        template_row = min(row, len(self._df) - 1)
+        new_row = self._df.iloc[[template_row]].copy().reset_index(drop=True)
+        for col in self._df.columns:
+            if col == "_id" or (copy_columns and col in copy_columns):
+                continue
+            new_row.at[0, col] = None
+        new_row.at[0, "_id"] = self._next_id
+        self._next_id += 1
+
+        self._original_df = concat_rows([self._original_df, new_row])
+        self._insert_rows(np.array([row]), new_row)
+        self._history.push(('insert_rows', np.array([row]), self._row_tuples(new_row)))
+
+    def duplicate_rows(self, rows):
+        # Copies of each run of selected rows go right below the run
+        if self._locked:
+            return False
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        rows = rows[(rows >= 0) & (rows < len(self._df.index))]
+        if not len(rows):
+            return
+        positions = []
+        for first, last in row_runs(rows):
+            start = last + 1 + len(positions)
+            positions.extend(range(start, start + last - first + 1))
+        positions = np.array(positions)
+        copies = self._df.iloc[rows].reset_index(drop=True)
+        copies["_id"] = np.arange(self._next_id, self._next_id + len(rows), dtype=np.int64)
+        self._next_id += len(rows)
+        self._original_df = concat_rows([self._original_df, copies])
+        self._insert_rows(positions, copies)
+        self._history.push(('insert_rows', positions, self._row_tuples(copies)))
 
+    def append_rows(self, rows, parse_errors=()):
+        # Rows from outside the editor (inbox files), typed with fresh ids.
+        # Not an undoable edit.
+        if rows is None or rows.empty:
+            return
+        offset = self._next_id
+        rows = rows.assign(_id=rows["_id"] + offset).reindex(columns=self._df.columns)
+        self._next_id = int(rows["_id"].max()) + 1
+        first = len(self._df.index)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows.index) - 1)
+        self._df = concat_rows([self._df, rows])
+        self._original_df = concat_rows([self._original_df, rows])
+        self._positions = None
+        self._index_rows(rows)
+        self.endInsertRows()
+        for row_id, col, text in parse_errors:
+            self.parse_errors[(row_id + offset, col)] = text
 
     def delete_row(self, row):
+        self.delete_rows([row])
+
+    def delete_rows(self, rows):
         if self._locked:
             return False
-        if row < 0 or row >= len(self._df):
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        rows = rows[(rows >= 0) & (rows < len(self._df.index))]
+        if not len(rows):
             return
-        deleted_row_data = self._df.iloc[row].copy()
-        self.beginRemoveRows(QModelIndex(), row, row)
-        self._df = self._df.drop(row).reset_index(drop=True)
-        self.endRemoveRows()
-        # store inverse action for undo
-        self._undo_stack.append(('delete_row', row, deleted_row_data))
-        self._redo_stack.clear()
+        deleted = self._row_tuples(self._df.iloc[rows])
+        self._remove_rows(rows)
+        self._history.push(('delete_rows', rows, deleted))
+
+    def _remove_rows(self, rows):
+        # rows sorted; one rebuild of the frame, announced run by run from
+        # the bottom so earlier ranges stay valid. The old frame serves reads
+        # until the last run, the new one is in place before its
+        # rowsRemoved, so listeners of the last signal see the final rows.
+        keep = np.ones(len(self._df.index), dtype=bool)
+        keep[rows] = False
+        remaining = self._df.iloc[np.flatnonzero(keep)].reset_index(drop=True)
+        self._unindex_rows(rows)
+        self._announced_rows = len(self._df.index)
+        runs = list(reversed(row_runs(rows)))
+        for i, (first, last) in enumerate(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self._announced_rows -= last - first + 1
+            if i == len(runs) - 1:
+                self._df = remaining
+                self._positions = None
+                self._announced_rows = None
+            self.endRemoveRows()
+
+    def _insert_rows(self, positions, rows):
+        # positions: sorted final positions of the new rows; one rebuild,
+        # announced run by run from the top, so every announced row is
+        # already where the new frame has it
+        total = len(self._df.index) + len(positions)
+        is_new = np.zeros(total, dtype=bool)
+        is_new[positions] = True
+        order = np.empty(total, dtype=np.intp)
+        order[~is_new] = np.arange(len(self._df.index))
+        order[is_new] = len(self._df.index) + np.arange(len(positions))
+        self._announced_rows = len(self._df.index)
+        self._df = concat_rows([self._df, rows.reset_index(drop=True)]).iloc[order].reset_index(drop=True)
+        self._positions = None
+        self._index_rows(rows)
+        for first, last in row_runs(positions):
+            self.beginInsertRows(QModelIndex(), first, last)
+            self._announced_rows += last - first + 1
+            self.endInsertRows()
+        self._announced_rows = None
+
+    def _push_edit(self, col_name, rows, old_values, new_values):
+        row_ids = self._df["_id"].to_numpy()[rows]
+        self._history.push(('edit', col_name, row_ids, list(old_values), list(new_values)))
+
+    def _row_tuples(self, rows):
+        # Plain tuples in column order are far smaller than frame slices
+        return list(rows.itertuples(index=False, name=None))
+
+    def _rows_frame_from(self, tuples):
+        rows = pd.DataFrame(tuples, columns=self._df.columns)
+        return rows.astype(self._df.dtypes.to_dict())
 
     def undo(self):
         if self._locked:
             return False
-        if not self._undo_stack:
+        action = self._history.pop_undo()
+        if action is None:
             return
-        action = self._undo_stack.pop()
         self._apply_action(action, undo=True)
+        self._history.push_redo(action)
 
     def redo(self):
         if self._locked:
             return False
-        if not self._redo_stack:
+        action = self._history.pop_redo()
+        if action is None:
             return
-        action = self._redo_stack.pop()
         self._apply_action(action, undo=False)
+        self._history.push_undo(action)
 
     def _apply_action(self, action, undo=True):
-        if self._locked:
-            return False
         atype = action[0]
 
-        if atype == 'edit':
-            row, col_name, old_value, new_value = action[1], action[2], action[3], action[4]
-            if undo:
-                self._df.at[row, col_name] = old_value
-                self._redo_stack.append(('edit', row, col_name, old_value, new_value))
-            else:
-                self._df.at[row, col_name] = new_value
-                self._undo_stack.append(('edit', row, col_name, old_value, new_value))
-            index = self.index(row, [c for c in self._df.columns if c != "_id"].index(col_name))
-            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+        if atype == 'group':
+            for child in (reversed(action[1]) if undo else action[1]):
+                self._apply_action(child, undo)
 
-        elif atype == "insert_row":
-            row, row_data = action[1], action[2]
-            if undo:
-                self.beginRemoveRows(QModelIndex(), row, row)
-                row_id = row_data["_id"]
-                self._df = self._df[self._df['_id'] != row_id].reset_index(drop=True)
-                self.endRemoveRows()
-                self._redo_stack.append(("insert_row", row, row_data))
-            else:
-                self.beginInsertRows(QModelIndex(), row, row)
-                self._df = pd.concat([
-                    self._df.iloc[:row],
-                    pd.DataFrame([row_data]),
-                    self._df.iloc[row:]
-                ]).reset_index(drop=True)
-                self._original_df = pd.concat([
-                    self._original_df,
-                    pd.DataFrame([row_data])],
-                    ignore_index=True)
-                self.endInsertRows()
-                self._undo_stack.append(("insert_row", row, row_data))
-
-        elif atype == "delete_row":
-            row, row_data = action[1], action[2]
-            if undo:
-                self.beginInsertRows(QModelIndex(), row, row)
-                self._df = pd.concat([
-                    self._df.iloc[:row],
-                    pd.DataFrame([row_data]),
-                    self._df.iloc[row:]
-                ]).reset_index(drop=True)
-                self.endInsertRows()
-                self._redo_stack.append(("delete_row", row, row_data))
-            else:
-                self.beginRemoveRows(QModelIndex(), row, row)
-                self._df = self._df.drop(row).reset_index(drop=True)
-                self.endRemoveRows()
-                self._undo_stack.append(("delete_row", row, row_data))
+        elif atype == 'edit':
+            _, col_name, row_ids, old_values, new_values = action
+            rows = self.rows_of(row_ids)
+            found = rows >= 0
+            values = old_values if undo else new_values
+            rows = rows[found]
+            if len(rows):
+                self._assign(col_name, rows, [v for v, f in zip(values, found) if f])
+                col = [c for c in self._df.columns if c != "_id"].index(col_name)
+                self.dataChanged.emit(
+                    self.index(int(rows.min()), col), self.index(int(rows.max()), col), [Qt.DisplayRole]
+                )
+
+        elif (atype == "insert_rows") != undo:
+            # Redo an insert or undo a delete: put the rows back in place
+            _, positions, tuples = action
+            rows = self._rows_frame_from(tuples)
+            # Positions may be past the end if rows were deleted since
+            positions = np.minimum(positions, len(self._df.index) + np.arange(len(positions)))
+            if atype == "insert_rows":
+                self._original_df = concat_rows([self._original_df, rows])
+            self._insert_rows(positions, rows)
+
+        else:
+            # Undo an insert or redo a delete: find the rows by id, they may
+            # have been sorted since
+            id_col = self._df.columns.get_loc("_id")
+            rows = self.rows_of([t[id_col] for t in action[2]])
+            rows = np.sort(rows[rows >= 0])
+            if len(rows):
+                self._remove_rows(rows)
 
+
+def row_runs(rows):
+    # Sorted row positions as (first, last) pairs of consecutive rows
+    rows = np.asarray(rows)
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(rows)]]) - 1
+    return [(int(rows[a]), int(rows[b])) for a, b in zip(starts, ends)]
+
+
+def plain_index(table):
+    # Categorical index levels do not survive concat with new categories
+    names = list(table.index.names)
+    flat = table.reset_index()
+    for name in names:
+        flat[name] = flat[name].astype(object)
+    return flat.set_index(names)
+
+
+def replace_groups(table, fresh, keys):
+    kept = table[~table.index.get_level_values(0).isin(list(keys))]
+    return pd.concat([kept, plain_index(fresh)]).sort_index()
+
+
+class FleetSummary:
+    # Fleet aggregates cached off a PandasModel. Edits only recompute the
+    # vehicles and drivers of the rows they touch, once per operation: the
+    # model's signals mark groups dirty and a zero timer refreshes them
+    # after the operation returns. Only followed while a window listens.
+    def __init__(self, model):
+        self.model = model
+        self.listeners = []
+        self._dirty_vehicles, self._dirty_drivers = set(), set()
+        self._rows_changed = False
+        self._scheduled = False
+
+    def add_listener(self, listener):
+        if not self.listeners:
+            self.rebuild()
+            self.model.dataChanged.connect(self._on_data_changed)
+            self.model.rowsInserted.connect(self._on_rows_changed)
+            self.model.rowsRemoved.connect(self._on_rows_changed)
+            self.model.modelReset.connect(self.rebuild)
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener not in self.listeners:
+            return
+        self.listeners.remove(listener)
+        if not self.listeners:
+            self.model.dataChanged.disconnect(self._on_data_changed)
+            self.model.rowsInserted.disconnect(self._on_rows_changed)
+            self.model.rowsRemoved.disconnect(self._on_rows_changed)
+            self.model.modelReset.disconnect(self.rebuild)
+
+    def _row_groups(self, df):
+        return (
+            df["_id"].to_numpy(),
+            np.array(df["Pojazd"].astype(object), dtype=object),
+            np.array(df["Kierowca"].astype(object), dtype=object),
+        )
+
+    def rebuild(self):
+        from raport_generation import vehicle_month_km, driver_trip_counts, vehicle_km_per_day
+        df = self.model._df
+        # Vehicle and driver each row id is counted under, to find the
+        # groups an edit moves a row out of
+        ids, self._vehicle_of, self._driver_of = self._row_groups(df)
+        self._ids = pd.Index(ids)
+        self._dirty_vehicles, self._dirty_drivers = set(), set()
+        self._rows_changed = False
+        self.vehicle_months = plain_index(vehicle_month_km(df))
+        self.drivers = plain_index(driver_trip_counts(df))
+        self.vehicles = plain_index(vehicle_km_per_day(df))
+        self._notify()
+
+    def refresh(self, vehicles, drivers):
+        from raport_generation import vehicle_month_km, driver_trip_counts, vehicle_km_per_day
+        df = self.model._df
+        vehicles = [v for v in vehicles if not pd.isna(v)]
+        drivers = [d for d in drivers if not pd.isna(d)]
+        if vehicles:
+            part = df[df["Pojazd"].isin(vehicles)]
+            self.vehicle_months = replace_groups(self.vehicle_months, vehicle_month_km(part), vehicles)
+            self.vehicles = replace_groups(self.vehicles, vehicle_km_per_day(part), vehicles)
+        if drivers:
+            part = df[df["Kierowca"].isin(drivers)]
+            self.drivers = replace_groups(self.drivers, driver_trip_counts(part), drivers)
+        self._notify()
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            QTimer.singleShot(0, self._update)
+
+    def _on_data_changed(self, top_left, bottom_right, roles=None):
+        rows = self.model._df.iloc[top_left.row():bottom_right.row() + 1]
+        ids, vehicles, drivers = self._row_groups(rows)
+        positions = self._ids.get_indexer(ids)
+        # Rows added since the last update are not known yet, the row diff
+        # counts them under their current groups
+        known = positions >= 0
+        positions, vehicles, drivers = positions[known], vehicles[known], drivers[known]
+        self._dirty_vehicles |= set(vehicles) | set(self._vehicle_of[positions])
+        self._dirty_drivers |= set(drivers) | set(self._driver_of[positions])
+        self._vehicle_of[positions] = vehicles
+        self._driver_of[positions] = drivers
+        self._schedule()
+
+    def _on_rows_changed(self, parent=None, first=None, last=None):
+        self._rows_changed = True
+        self._schedule()
+
+    def _update(self):
+        self._scheduled = False
+        if not self.listeners:
+            return
+        if self._rows_changed:
+            self._rows_changed = False
+            ids, vehicles, drivers = self._row_groups(self.model._df)
+            known = self._ids.get_indexer(ids)
+            added = known < 0
+            removed = np.ones(len(self._ids), dtype=bool)
+            removed[known[~added]] = False
+            self._dirty_vehicles |= set(vehicles[added]) | set(self._vehicle_of[removed])
+            self._dirty_drivers |= set(drivers[added]) | set(self._driver_of[removed])
+            self._ids = pd.Index(ids)
+            self._vehicle_of, self._driver_of = vehicles, drivers
+        vehicles, drivers = self._dirty_vehicles, self._dirty_drivers
+        self._dirty_vehicles, self._dirty_drivers = set(), set()
+        self.refresh(vehicles, drivers)
+
+
+class InboxWatcher(QObject):
+    # Follows the CSV files in a folder that other tools append to into the
+    # open log, target (the path it is saved to, None while it has none).
+    # The byte offset reached in each file is kept in QSettings per target
+    # and only once the log has been saved with the rows read, so rows that
+    # were never saved are read again the next time that log is opened.
+    # Files already in the folder when a log first watches it start at
+    # their current size, those rows are not the log's.
+    POLL_INTERVAL_MS = 5000
+
+    def __init__(self, folder, model, settings, target=None):
+        super().__init__()
+        self.folder = folder
+        self.model = model
+        self.settings = settings
+        self.target = target
+        self.offsets = dict(self.saved_offsets(target))
+        self.start = {}  # where each file seen this session was first read from
+        self.accepted = {}  # path -> whether its header has the log columns
+
+        self.watcher = QFileSystemWatcher([folder])
+        self.watcher.directoryChanged.connect(self.schedule_scan)
+        self.watcher.fileChanged.connect(self.schedule_scan)
+
+        self.scan_timer = QTimer()
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.setInterval(200)  # coalesce bursts of writes
+        self.scan_timer.timeout.connect(self.scan)
+
+        # Change notifications are unreliable on network shares
+        self.poll_timer = QTimer()
+        self.poll_timer.setInterval(self.POLL_INTERVAL_MS)
+        self.poll_timer.timeout.connect(self.scan)
+        self.poll_timer.start()
+
+        self.scan(first=True)
+
+    def schedule_scan(self, *args):
+        self.scan_timer.start()
+
+    def stop(self):
+        self.poll_timer.stop()
+        self.scan_timer.stop()
+        self.watcher.removePaths(self.watcher.files() + self.watcher.directories())
+
+    def stored_offsets(self):
+        stored = self.settings.value("inboxOffsets", {})
+        return stored if isinstance(stored, dict) else {}
+
+    def saved_offsets(self, target):
+        offsets = self.stored_offsets().get(target, {}) if target else {}
+        return {f: int(o) for f, o in offsets.items()} if isinstance(offsets, dict) else {}
+
+    def snapshot(self):
+        # Offsets of the rows the model holds now, taken when a save starts
+        return dict(self.offsets)
+
+    def commit(self, offsets, target):
+        # The log was saved to target with the rows up to offsets
+        if not target:
+            return
+        stored = self.stored_offsets()
+        stored[target] = {**self.start, **self.saved_offsets(target), **offsets}
+        self.settings.setValue("inboxOffsets", stored)
+
+    def check_header(self, path):
+        # Files that are not logs are reported once and then left alone
+        if path not in self.accepted:
+            try:
+                with open(path, "rb") as f:
+                    header = f.readline()
+                if not header.endswith(b"\n"):
+                    return False  # the header is not fully written yet
+                check_log_columns(pd.read_csv(io.BytesIO(header)), os.path.basename(path))
+            except OSError:
+                return False
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                self.accepted[path] = False
+                return False
+            self.accepted[path] = True
+        return self.accepted[path]
+
+    def scan(self, first=False):
+        if not os.path.isdir(self.folder):
+            return
+        appended = discovered = False
+        for path in expand_log_paths([self.folder], archives=False):
+            if path not in self.watcher.files():
+                self.watcher.addPath(path)
+            if not self.check_header(path):
+                continue
+            if path not in self.offsets:
+                try:
+                    self.start[path] = os.path.getsize(path) if first else 0
+                except OSError:
+                    continue
+                self.offsets[path] = self.start[path]
+                discovered = True
+            offset = self.offsets[path]
+            try:
+                if os.path.getsize(path) == offset:
+                    continue
+                rows, new_offset = read_appended_rows(path, offset)
+            except Exception as e:
+                print(f"Failed to read {path}: {e}")
+                continue
+            if rows is not None and not rows.empty:
+                rows, parse_errors = normalize_log(rows)
+                self.model.append_rows(rows, parse_errors)
+                appended = True
+                print(f"Added {len(rows.index)} rows from {os.path.basename(path)}")
+            self.offsets[path] = new_offset
+        if appended and self.model.writes_through:
+            # The database stores appended rows as they come
+            self.commit(self.snapshot(), self.target)
+        elif discovered:
+            # Nothing read from a new file yet, its start is safe to keep
+            self.commit({}, self.target)
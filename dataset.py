@@ -0,0 +1,190 @@
+# A dataset is a directory of logs split by vehicle, year and month:
+#
+#   <root>/<plate>/<yyyy>/<mm>/log.csv
+#   <root>/manifest.json   rows, odometer min/max and time span per partition
+#
+# Plates with lower case letters get a hash of the plate after a "+" in
+# their directory name, so plates that differ only in case do not share a
+# directory on case-insensitive filesystems.
+# Rows without a date are kept under month 0000/00 of their vehicle. Which
+# partitions a plate and date range need is decided from the manifest
+# alone, only those files are read.
+import calendar
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+from urllib.parse import quote
+
+import pandas as pd
+
+from file_io import DATE_FORMAT, normalize_log, repeated_rows, row_hashes, with_raw_text, write_csv
+
+MANIFEST_NAME = "manifest.json"
+PARTITION_FILE = "log.csv"
+NO_VEHICLE = "(brak)"  # directory of rows without a plate; a real "(brak)" plate is quoted
+
+
+def partition_path(vehicle, year, month):
+    directory = quote(vehicle, safe=" ").replace(".", "%2E") or NO_VEHICLE
+    if vehicle != vehicle.upper():
+        # quote never leaves a "+", the name can not be another plate's
+        directory += "+" + hashlib.sha1(vehicle.encode("utf-8")).hexdigest()[:10]
+    return f"{directory}/{year:04d}/{month:02d}/{PARTITION_FILE}"
+
+
+def partition_keys(df):
+    dates = df["Data i Godzina"]
+    return (
+        df["Pojazd"].astype(object).where(df["Pojazd"].notna(), "").astype(str),
+        dates.dt.year.fillna(0).astype(int),
+        dates.dt.month.fillna(0).astype(int),
+    )
+
+
+def partition_entry(rows, vehicle, year, month):
+    odometer = rows["Stan Licznika"].dropna()
+    dates = rows["Data i Godzina"].dropna()
+    return {
+        "vehicle": vehicle,
+        "year": int(year),
+        "month": int(month),
+        "rows": len(rows.index),
+        "odometer_min": int(odometer.min()) if not odometer.empty else None,
+        "odometer_max": int(odometer.max()) if not odometer.empty else None,
+        "first": dates.min().strftime(DATE_FORMAT) if not dates.empty else "",
+        "last": dates.max().strftime(DATE_FORMAT) if not dates.empty else "",
+    }
+
+
+def read_manifest(root):
+    # {partition path: entry}, empty for a new directory
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["partitions"]
+
+
+def write_manifest(root, manifest):
+    # Replaced in one step, like write_csv, so readers never see half of it
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".flag-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "partitions": manifest}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(root, MANIFEST_NAME))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_dataset(df, root, replace=(), parse_errors=(), merged=None):
+    # Writes every vehicle-month in the typed log df to its partition and
+    # updates the manifest. Partitions in replace (those the log was read
+    # from) hold exactly the log's rows, so they are rewritten, or removed
+    # when no rows are left in them. Any other partition the rows land in,
+    # for example after a plate or date edit, is merged with what is
+    # already stored and repeated rows are dropped. merged lists the rows
+    # an earlier save of the same log merged in, {path: row hashes}; those
+    # are dropped first, the log's current rows win. Values in
+    # parse_errors are written as the text they were read from. Returns
+    # the partitions that now hold the log's rows and nothing else, the
+    # replace set for the next save, and merged for the next save.
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root)
+    replace = set(replace)
+    merged = merged or {}
+    # Partitions written before the directory names took a hash keep theirs
+    stored_paths = {(e["vehicle"], e["year"], e["month"]): path for path, e in manifest.items()}
+    parts = {}
+    for (vehicle, year, month), part in df.groupby(list(partition_keys(df)), sort=True):
+        path = stored_paths.get((vehicle, year, month)) or partition_path(vehicle, year, month)
+        parts[path] = (vehicle, year, month, part)
+    # Rows merged earlier may have moved on, leaving nothing to add
+    for path in set(merged) - set(parts) - replace:
+        if path in manifest:
+            entry = manifest[path]
+            parts[path] = (entry["vehicle"], entry["year"], entry["month"], df.iloc[:0])
+    written, exact, merged_now = [], [], {}
+    for path, (vehicle, year, month, part) in sorted(parts.items()):
+        target = os.path.join(root, path)
+        text = with_raw_text(part, parse_errors)
+        merging = path not in replace and os.path.isfile(target)
+        if merging:
+            stored, stored_errors = normalize_log(pd.read_csv(target))
+            stored_text = with_raw_text(stored, stored_errors)
+            kept = ~row_hashes(stored_text).isin(merged.get(path, ())).to_numpy()
+            stored, stored_text = stored[kept], stored_text[kept]
+            part = pd.concat([stored, part], ignore_index=True)
+            text = pd.concat([stored_text, text], ignore_index=True)
+            new = ~repeated_rows(text)
+            part, text = part[new], text[new]
+            added = text.iloc[new[:len(stored.index)].sum():]
+            if not added.empty:
+                merged_now[path] = set(row_hashes(added).tolist())
+        if part.empty:
+            if os.path.isfile(target):
+                os.unlink(target)
+            manifest.pop(path, None)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_csv(text, target)
+        manifest[path] = partition_entry(part, vehicle, year, month)
+        written.append(path)
+        if not merging:
+            exact.append(path)
+    for path in replace - set(written):
+        if os.path.isfile(os.path.join(root, path)):
+            os.unlink(os.path.join(root, path))
+        manifest.pop(path, None)
+    write_manifest(root, manifest)
+    return exact, merged_now
+
+
+def month_span(year, month):
+    return (datetime.date(year, month, 1),
+            datetime.date(year, month, calendar.monthrange(year, month)[1]))
+
+
+def select_partitions(manifest, vehicle=None, start=None, end=None):
+    # Paths of the partitions that can hold rows of the plate between start
+    # and end (datetime.date values, inclusive). Undated rows always match
+    # the dates, as they do in the table's date filter.
+    selected = []
+    for path, entry in manifest.items():
+        if vehicle and entry["vehicle"].lower() != vehicle.lower():
+            continue
+        if start is not None and end is not None and entry["year"]:
+            first, last = month_span(entry["year"], entry["month"])
+            if last < start or first > end:
+                continue
+        selected.append(path)
+    return sorted(selected)
+
+
+def read_dataset(root, vehicle=None, start=None, end=None):
+    # The typed log of the matching partitions, whole months of them, with
+    # its parse errors and the partition paths read
+    manifest = read_manifest(root)
+    if not manifest:
+        raise ValueError(f"{root} is not a dataset, {MANIFEST_NAME} is missing.")
+    paths = select_partitions(manifest, vehicle, start, end)
+    if not paths:
+        raise ValueError("No partitions match the plate and dates.")
+    df = pd.concat([pd.read_csv(os.path.join(root, path)) for path in paths], ignore_index=True)
+    print(f"Read {len(paths)} of {len(manifest)} partitions, {len(df.index)} rows")
+    df, parse_errors = normalize_log(df, report=bool(os.environ.get("FLAG_MEMORY_REPORT")))
+    return df, parse_errors, paths
+
+
+def dataset_overview(root):
+    # Plates and time span listed in the manifest, for the open dialog
+    manifest = read_manifest(root)
+    vehicles = sorted({entry["vehicle"] for entry in manifest.values() if entry["vehicle"]})
+    dates = [
+        pd.to_datetime(entry[key], format=DATE_FORMAT)
+        for entry in manifest.values() for key in ("first", "last") if entry[key]
+    ]
+    return vehicles, (min(dates) if dates else None), (max(dates) if dates else None)
@@ -0,0 +1,343 @@
+import os
+import io
+import bz2
+import gzip
+import lzma
+import zipfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+REQUIRED_COLUMNS = [
+    "Pojazd", "Kierowca", "Data i Godzina",
+    "Cel Trasy", "Stan Licznika", "Tankowanie"
+]
+LOG_EXTENSIONS = (".csv",)
+ARCHIVE_EXTENSIONS = (".csv.gz", ".csv.bz2", ".csv.xz", ".zip")
+LOG_FILE_FILTER = "Log Files (*.csv *.csv.gz *.csv.bz2 *.csv.xz *.zip)"
+DECOMPRESSORS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+EXPORT_CHUNK_ROWS = 50_000
+LOG_CHUNK_ROWS = 200_000
+CATEGORY_COLUMNS = ["Pojazd", "Kierowca", "Cel Trasy"]
+PARSED_COLUMNS = ["Data i Godzina", "Stan Licznika"]
+REFUEL_VALUES = {"true", "prawda", "tak", "1"}
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def memory_report(before, after):
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+    lines = ["Memory footprint (bytes):"]
+    for col in before.columns:
+        lines.append(f"  {col}: {before_usage[col]:,} -> {after_usage.get(col, 0):,}")
+    total_before, total_after = before_usage.sum(), after_usage.sum()
+    lines.append(
+        f"  total: {total_before:,} -> {total_after:,} "
+        f"({100 * total_after / max(total_before, 1):.0f}%)"
+    )
+    return "\n".join(lines)
+
+
+def compact_log(df, report=False):
+    # Typed columns: repeated names as categoricals, timestamps as
+    # datetime64 and odometer readings as nullable integers
+    compact = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in compact.columns and not isinstance(compact[col].dtype, pd.CategoricalDtype):
+            compact[col] = compact[col].astype("category")
+    if "Data i Godzina" in compact.columns and not pd.api.types.is_datetime64_any_dtype(compact["Data i Godzina"]):
+        compact["Data i Godzina"] = pd.to_datetime(
+            compact["Data i Godzina"], format=DATE_FORMAT, errors="coerce"
+        )
+    if "Stan Licznika" in compact.columns and compact["Stan Licznika"].dtype != "Int64":
+        if pd.api.types.is_integer_dtype(compact["Stan Licznika"]):
+            compact["Stan Licznika"] = compact["Stan Licznika"].astype("Int64")
+        else:
+            # A reading with a fractional part is a typo, not a rounding
+            # case, it is left empty so normalize_log reports it
+            readings = pd.to_numeric(
+                compact["Stan Licznika"].astype(str).str.replace(" ", ""),
+                errors="coerce"
+            )
+            compact["Stan Licznika"] = readings.where(readings == readings.round()).astype("Int64")
+    if report:
+        print(memory_report(df, compact))
+    return compact
+
+
+def refuel_flags(values):
+    # "Tankowanie" as booleans. Logs write True/Fałsz, spreadsheets Prawda
+    # or 1; the few distinct values are checked once each.
+    codes, uniques = pd.factorize(values)
+    known = [str(value).strip().lower() in REFUEL_VALUES for value in uniques]
+    return np.array(known + [False], dtype=bool)[codes]
+
+
+def has_row_ids(df):
+    # Ids index the model's position array, they must be unique and not negative
+    if "_id" not in df.columns or not pd.api.types.is_integer_dtype(df["_id"]):
+        return False
+    ids = df["_id"]
+    return ids.is_unique and (ids.empty or ids.min() >= 0)
+
+
+def normalize_log(df, report=False):
+    # The one place where log text is parsed. Returns the typed frame
+    # with row ids and the (row id, column, text) of values that did not
+    # parse, downstream code reads the typed columns only.
+    if not has_row_ids(df):
+        df = df.assign(_id=np.arange(len(df.index), dtype=np.int64))
+    typed = compact_log(df, report=report)
+    parse_errors = []
+    for col in PARSED_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        failed = typed[col].isna() & raw.notna() & raw.astype(str).str.strip().ne("")
+        for row_id, value in zip(typed.loc[failed, "_id"], raw[failed]):
+            parse_errors.append((int(row_id), col, str(value)))
+    return typed, parse_errors
+
+
+def with_raw_text(df, parse_errors):
+    # The typed frame as it is written out: values that did not parse go
+    # back as the text they were read from, so saving never empties them
+    if not parse_errors:
+        return df
+    out = df.copy()
+    ids = pd.Index(df["_id"])
+    for col in {col for _, col, _ in parse_errors}:
+        failed = [(row_id, text) for row_id, c, text in parse_errors if c == col]
+        rows = ids.get_indexer([row_id for row_id, _ in failed])
+        found = rows >= 0
+        column = out[col]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            column = column.dt.strftime(DATE_FORMAT)
+        values = column.astype(object).to_numpy(copy=True)
+        values[rows[found]] = np.array([text for _, text in failed], dtype=object)[found]
+        out[col] = values
+    return out
+
+
+def log_streams(path):
+    # (name, binary stream) of each CSV log in a file: the file itself,
+    # a .gz, .bz2 or .xz file decompressed as it is read, or every .csv
+    # member of a zip bundle in turn. Nothing is unpacked to disk and only
+    # what the parser is reading is held decompressed.
+    name = os.path.basename(path)
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as bundle:
+            members = [
+                m for m in bundle.namelist()
+                if m.lower().endswith(".csv") and not m.startswith("__MACOSX/")
+            ]
+            if not members:
+                raise ValueError(f"{name} contains no CSV files.")
+            for member in members:
+                with bundle.open(member) as stream:
+                    yield f"{name}/{member}", stream
+        return
+    opener = DECOMPRESSORS.get(os.path.splitext(path.lower())[1], open)
+    with opener(path, "rb") as stream:
+        yield name, stream
+
+
+def read_log_parts(path, **kwargs):
+    # One raw frame per log in the file, more than one for zip bundles.
+    # Row ids written by older saves are dropped, normalize_log numbers rows.
+    return [
+        (name, pd.read_csv(stream, **kwargs).drop(columns="_id", errors="ignore"))
+        for name, stream in log_streams(path)
+    ]
+
+
+def read_log(path):
+    parts = read_log_parts(path)
+    if len(parts) == 1:
+        return parts[0][1]
+    # Bundled logs overlap like separate exports do
+    merged, _, _ = merge_logs(parts)
+    return merged
+
+
+def load_log(path):
+    return normalize_log(read_log(path), report=bool(os.environ.get("FLAG_MEMORY_REPORT")))
+
+
+def read_log_chunks(path, chunksize=LOG_CHUNK_ROWS):
+    # Raw frames of chunksize rows, for logs too large to load at once.
+    # The members of a zip bundle follow each other.
+    for _, stream in log_streams(path):
+        with pd.read_csv(stream, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def log_metadata(df, path):
+    mtime, size = file_signature(path)
+    metadata = {
+        "mtime": mtime,
+        "size": size,
+        "rows": len(df.index),
+        "vehicles": int(df["Pojazd"].nunique()) if "Pojazd" in df.columns else 0,
+        "first": "",
+        "last": "",
+    }
+    if "Data i Godzina" in df.columns:
+        dates = pd.to_datetime(df["Data i Godzina"], format=DATE_FORMAT, errors="coerce").dropna()
+        if not dates.empty:
+            metadata["first"] = dates.min().strftime("%d.%m.%Y")
+            metadata["last"] = dates.max().strftime("%d.%m.%Y")
+    return metadata
+
+
+def preload_log(path):
+    df, parse_errors = load_log(path)
+    return path, (df, parse_errors), log_metadata(df, path)
+
+
+def read_log_metadata(path):
+    if path.lower().endswith(".zip"):
+        # Bundled logs are deduplicated on load, count their rows the same way
+        df = read_log(path)
+    else:
+        [(_, df)] = read_log_parts(path, usecols=lambda c: c in ("Pojazd", "Data i Godzina"))
+    return path, None, log_metadata(df, path)
+
+
+def is_log_file(path, archives=True):
+    return path.lower().endswith(LOG_EXTENSIONS + (ARCHIVE_EXTENSIONS if archives else ()))
+
+
+def expand_log_paths(paths, archives=True):
+    # Folders contribute every log file directly inside them. Without
+    # archives only plain CSV files count, for readers that seek in them.
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if is_log_file(name, archives) and os.path.isfile(os.path.join(path, name))
+            )
+        elif is_log_file(path, archives):
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def check_log_columns(df, name=""):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        prefix = f"{name} " if name else "CSV "
+        raise ValueError(f"{prefix}is missing columns: {', '.join(missing)}")
+
+
+def row_hashes(df):
+    return pd.util.hash_pandas_object(df[REQUIRED_COLUMNS].astype(str), index=False)
+
+
+def repeated_rows(df):
+    # Overlapping exports repeat whole rows, hash them to find the repeats
+    return row_hashes(df).duplicated().to_numpy()
+
+
+def merge_logs(frames):
+    # Returns the merged rows numbered afresh, the count of repeated rows
+    # dropped and {old id: new id} of the kept rows of parts that had ids,
+    # which must not collide between parts
+    for name, df in frames:
+        check_log_columns(df, name)
+    columns = list(REQUIRED_COLUMNS)
+    for _, df in frames:
+        columns.extend(c for c in df.columns if c not in columns and c != "_id")
+    merged = pd.concat(
+        [df.reindex(columns=columns) for _, df in frames],
+        ignore_index=True
+    )
+    keep = ~repeated_rows(merged)
+    new_ids = np.cumsum(keep) - 1
+    ids = {}
+    start = 0
+    for _, df in frames:
+        end = start + len(df.index)
+        if "_id" in df.columns:
+            kept = keep[start:end]
+            ids.update(zip(df["_id"].to_numpy()[kept].tolist(), new_ids[start:end][kept].tolist()))
+        start = end
+    deduplicated = merged[keep].reset_index(drop=True)
+    deduplicated["_id"] = np.arange(len(deduplicated.index), dtype=np.int64)
+    return deduplicated, len(merged.index) - len(deduplicated.index), ids
+
+
+def read_logs(paths, max_workers=None):
+    paths = expand_log_paths(paths)
+    if not paths:
+        raise ValueError("No CSV files found.")
+    if len(paths) == 1:
+        parts = [read_log_parts(paths[0])]
+    else:
+        # spawn keeps the workers clear of the GUI process' Qt threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            parts = list(pool.map(read_log_parts, paths))
+    merged, duplicates, _ = merge_logs([part for file_parts in parts for part in file_parts])
+    merged, parse_errors = normalize_log(merged, report=bool(os.environ.get("FLAG_MEMORY_REPORT")))
+    return paths, merged, parse_errors, duplicates
+
+
+def sanitize_header(col):
+    if isinstance(col, str):
+        return col.replace('\n', ' ').replace('\r', ' ')
+    return col
+
+
+def write_csv(df, path, chunksize=EXPORT_CHUNK_ROWS):
+    # Rows go to a temp file in chunks and replace the target only once
+    # complete, a failed write never leaves a half-written file behind.
+    # A .gz path is written gzip compressed. Row ids stay in the app.
+    df = df.drop(columns="_id", errors="ignore")
+    header = [sanitize_header(c) for c in df.columns]
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".flag-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            stream = gzip.GzipFile(fileobj=raw, mode="wb") if path.lower().endswith(".gz") else raw
+            with io.TextIOWrapper(stream, encoding="utf-8", newline="") as out:
+                for start in range(0, max(len(df.index), 1), chunksize):
+                    df.iloc[start:start + chunksize].to_csv(
+                        out, index=False, header=header if start == 0 else False,
+                        date_format=DATE_FORMAT
+                    )
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path
+
+
+def read_appended_rows(path, offset=0):
+    # Parses only the complete lines written after offset. Returns the
+    # rows and the offset to resume from; a trailing partial line is left
+    # for the next call. A file smaller than offset was replaced, so it
+    # is read again from the start.
+    with open(path, "rb") as f:
+        header = f.readline()
+        if offset > os.fstat(f.fileno()).st_size:
+            offset = 0
+        start = max(offset, len(header))
+        f.seek(start)
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    if end == 0 or not header.endswith(b"\n"):
+        return None, max(offset, 0)
+    rows = pd.read_csv(io.BytesIO(header + chunk[:end])).drop(columns="_id", errors="ignore")
+    return rows, start + end
@@ -0,0 +1,134 @@
+import pickle
+import tempfile
+from contextlib import contextmanager
+
+DEFAULT_UNDO_LIMIT = 64 * 1024 * 1024  # bytes
+SPILL_LIMIT_FACTOR = 4  # the spill file holds at most this many times max_bytes
+SPILL_COPY_BYTES = 1024 * 1024
+
+
+def entry_size(entry):
+    # The pickled size, close enough to what an entry keeps alive
+    return len(pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+
+
+def same_cell(a, b):
+    return (
+        a is not None and a[0] == 'edit' and b[0] == 'edit' and a[1] == b[1]
+        and len(a[2]) == 1 and len(b[2]) == 1 and a[2][0] == b[2][0]
+    )
+
+
+class UndoHistory:
+    # Undo and redo stacks of compact entries:
+    #   ('edit', column, row_ids, old_values, new_values)
+    #   ('insert_rows' | 'delete_rows', positions, rows as tuples)
+    #   ('group', [entries])  several entries undone as one step
+    # Once the stacks hold more than max_bytes the oldest undo entries are
+    # written to a temporary file and read back when undo gets to them.
+    # Past SPILL_LIMIT_FACTOR times max_bytes there the oldest are dropped.
+    def __init__(self, max_bytes=DEFAULT_UNDO_LIMIT):
+        self.max_bytes = max_bytes
+        self._undo = []  # (entry, size)
+        self._redo = []
+        self._bytes = 0
+        self._spilled = []  # (offset, length) in _spill_file, oldest first
+        self._spilled_bytes = 0
+        self._spill_file = None
+        self._group = None
+
+    def push(self, entry):
+        # A new edit: clears redo and folds repeated edits of one cell together
+        if self._group is not None:
+            self._group.append(entry)
+            return
+        self._bytes -= sum(size for _, size in self._redo)
+        self._redo.clear()
+        if self._undo and same_cell(self._undo[-1][0], entry):
+            previous, size = self._undo.pop()
+            self._bytes -= size
+            entry = entry[:3] + (previous[3],) + entry[4:]
+        self.push_undo(entry)
+
+    def push_undo(self, entry):
+        size = entry_size(entry)
+        self._undo.append((entry, size))
+        self._bytes += size
+        self._trim()
+
+    def push_redo(self, entry):
+        size = entry_size(entry)
+        self._redo.append((entry, size))
+        self._bytes += size
+
+    def pop_undo(self):
+        if self._undo:
+            entry, size = self._undo.pop()
+            self._bytes -= size
+            return entry
+        if self._spilled:
+            return self._unspill()
+        return None
+
+    def pop_redo(self):
+        if not self._redo:
+            return None
+        entry, size = self._redo.pop()
+        self._bytes -= size
+        return entry
+
+    @contextmanager
+    def group(self):
+        if self._group is not None:
+            yield
+            return
+        self._group = []
+        try:
+            yield
+        finally:
+            entries, self._group = self._group, None
+            if len(entries) == 1:
+                self.push(entries[0])
+            elif entries:
+                self.push(('group', entries))
+
+    def _trim(self):
+        while self._bytes > self.max_bytes and len(self._undo) > 1:
+            entry, size = self._undo.pop(0)
+            self._bytes -= size
+            self._spill(entry)
+
+    def _spill(self, entry):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="fleetlog-undo-")
+        data = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        self._spill_file.seek(0, 2)
+        self._spilled.append((self._spill_file.tell(), len(data)))
+        self._spill_file.write(data)
+        self._spilled_bytes += len(data)
+        while self._spilled_bytes > self.max_bytes * SPILL_LIMIT_FACTOR and len(self._spilled) > 1:
+            _, length = self._spilled.pop(0)
+            self._spilled_bytes -= length
+        self._compact()
+
+    def _compact(self):
+        # Dropped entries leave a gap at the start of the file. Once it is
+        # as large as the entries after it they are moved down over it.
+        start = self._spilled[0][0]
+        if start < self._spilled_bytes:
+            return
+        for done in range(0, self._spilled_bytes, SPILL_COPY_BYTES):
+            self._spill_file.seek(start + done)
+            chunk = self._spill_file.read(SPILL_COPY_BYTES)
+            self._spill_file.seek(done)
+            self._spill_file.write(chunk)
+        self._spill_file.truncate(self._spilled_bytes)
+        self._spilled = [(offset - start, length) for offset, length in self._spilled]
+
+    def _unspill(self):
+        offset, length = self._spilled.pop()
+        self._spilled_bytes -= length
+        self._spill_file.seek(offset)
+        data = self._spill_file.read(length)
+        self._spill_file.truncate(offset if self._spilled else 0)
+        return pickle.loads(data)
@@ -1,30 +1,24 @@
+import time
+_START_TIME = time.perf_counter()
+
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QPushButton, QFileDialog, QMainWindow, QTableView,
-    QMenu, QMessageBox, QSplitter, QSizePolicy
+    QMenu, QMessageBox, QSplitter, QSizePolicy, QStyle
 )
 from PySide6.QtGui import (
     QAction, QPixmap, QIcon, QKeySequence, QShortcut
 )
 from PySide6.QtCore import (
     Qt, QDate, QSettings, QSize,
-    QStandardPaths, QCoreApplication
+    QStandardPaths, QCoreApplication, QTimer
 )
 import sys
 import os
-import pandas as pd
 
-from raport_generation import (
-    aggregate_trips, raport_generate
-)
-from windows import (
-    DropArea, FormArea, DragDropWindow,
-    ManageIDPersonWindow, ManualExport,
-    ConfigManagement
-)
-from backend import (
-    proxy_to_df, IDFilterProxyModel, PandasModel
-)
+# pandas, ReportLab and the window/model modules are imported where they are
+# first used, so the recent-files screen appears without paying for them.
+_IMPORTS_DONE = time.perf_counter()
 
 
 class MainWindow(QMainWindow):
@@ -34,10 +28,27 @@ class MainWindow(QMainWindow):
         QCoreApplication.setApplicationName("FleetLogAutoGenerator")
         self.settings = QSettings()
         self.recent_files = self.load_recent_files()
-        self.id_person_map = self.load_id_person_map()
+        self.recent_metadata = self.load_recent_metadata()
+        self.column_widths = self.load_column_widths()
+        self._id_person_map = None
+        self._file_icon = None
+        self._recent_labels = {}
+        self._preloaded = {}  # path -> (file signature, (DataFrame, parse errors))
+        self._loading = {}  # path -> running background worker
+        self._pending_open = None
 
         self.df = df
+        self.parse_errors = []
         self.filename = None  # Name of most recently saved file
+        self.current_path = None  # File the open log was read from, if it is one file
+        # (dataset folder, partitions the open log was read from, rows it merged into others)
+        self.dataset = None
+        self._generating = None  # running Generate worker
+        self._generation = 0  # bumped per Generate, older results are dropped
+        self._regenerate_timer = QTimer(self)
+        self._regenerate_timer.setSingleShot(True)
+        self._regenerate_timer.setInterval(300)
+        self._regenerate_timer.timeout.connect(self.generate_action)
 
         self.setWindowTitle("FLAG")
         self.child_windows = []
@@ -49,6 +60,8 @@ class MainWindow(QMainWindow):
 
         if df is None:
             self.show_recent_files()
+            # Start reading once the first frame is on screen
+            QTimer.singleShot(0, self.preload_recent_files)
 
         menu_bar = self.menuBar()
         file_menu = menu_bar.addMenu("File")
@@ -73,6 +86,26 @@ class MainWindow(QMainWindow):
         export_pdf_action.triggered.connect(self.export_as_pdf)
         file_menu.addAction(export_pdf_action)
 
+        export_bundle_action = QAction("Export All Vehicles to One PDF", self)
+        export_bundle_action.triggered.connect(self.export_bundle_pdf)
+        file_menu.addAction(export_bundle_action)
+
+        open_db_action = QAction("Open Database", self)
+        open_db_action.triggered.connect(self.open_database)
+        file_menu.addAction(open_db_action)
+
+        save_db_action = QAction("Save to Database", self)
+        save_db_action.triggered.connect(self.save_to_database)
+        file_menu.addAction(save_db_action)
+
+        open_dataset_action = QAction("Open Dataset", self)
+        open_dataset_action.triggered.connect(self.open_dataset)
+        file_menu.addAction(open_dataset_action)
+
+        save_dataset_action = QAction("Save to Dataset", self)
+        save_dataset_action.triggered.connect(self.save_to_dataset)
+        file_menu.addAction(save_dataset_action)
+
         export_pdf_man_action = QAction("Export to PDF Manually", self)
         export_pdf_man_action.triggered.connect(self.manual_export)
         file_menu.addAction(export_pdf_man_action)
@@ -87,32 +120,119 @@ class MainWindow(QMainWindow):
         manage_action.triggered.connect(self.manage_id_person_window)
         data_menu.addAction(manage_action)
 
+        self.find_replace_action = QAction("Find and Replace", self)
+        self.find_replace_action.triggered.connect(self.find_replace_window)
+        data_menu.addAction(self.find_replace_action)
+
+        aggregate_file_action = QAction("Aggregate Large File", self)
+        aggregate_file_action.triggered.connect(self.aggregate_large_file)
+        data_menu.addAction(aggregate_file_action)
+
+        summary_action = QAction("Summary", self)
+        summary_action.triggered.connect(self.summary_window)
+        data_menu.addAction(summary_action)
+
         config_menu = menu_bar.addMenu("Config")
 
         manage_config_action = QAction("Manage", self)
         manage_config_action.triggered.connect(self.manage_config)
         config_menu.addAction(manage_config_action)
 
+    @property
+    def id_person_map(self):
+        if self._id_person_map is None:
+            self._id_person_map = self.load_id_person_map()
+        return self._id_person_map
+
+    @id_person_map.setter
+    def id_person_map(self, value):
+        self._id_person_map = value
+
+    def find_replace_window(self):
+        from windows import FindReplace
+        if not hasattr(self, "model") or self.model is None:
+            print("No data loaded.")
+            return
+        new_window = FindReplace(self)
+        new_window.show()
+        self.child_windows.append(new_window)
+
+    def copy_cells(self):
+        # Selected cells as tab separated lines, the way spreadsheets copy
+        indexes = self.table_view.selectionModel().selectedIndexes()
+        if not indexes:
+            return
+        rows = sorted({i.row() for i in indexes})
+        cols = sorted({i.column() for i in indexes})
+        text = "\n".join(
+            "\t".join(self.proxy_model.index(row, col).data() or "" for col in cols) for row in rows
+        )
+        QApplication.clipboard().setText(text)
+
+    def paste_cells(self):
+        index = self.table_view.currentIndex()
+        text = QApplication.clipboard().text()
+        if not index.isValid() or not text:
+            return
+        block = [line.rstrip("\r").split("\t") for line in text.rstrip("\r\n").split("\n")]
+        last = min(index.row() + len(block), self.proxy_model.rowCount())
+        rows = [
+            self.proxy_model.mapToSource(self.proxy_model.index(row, 0)).row()
+            for row in range(index.row(), last)
+        ]
+        self.model.set_block(rows, index.column(), block)
+
+    def selected_source_rows(self, index):
+        # Rows of the selection, or the clicked row if it is not selected
+        indexes = self.table_view.selectionModel().selectedIndexes()
+        if index not in indexes:
+            indexes = [index]
+        return sorted({self.proxy_model.mapToSource(i).row() for i in indexes})
+
+    def fill_down(self):
+        rows_by_col = {}
+        indexes = sorted(self.table_view.selectionModel().selectedIndexes(), key=lambda i: i.row())
+        for index in indexes:
+            rows_by_col.setdefault(index.column(), []).append(self.proxy_model.mapToSource(index).row())
+        self.model.fill_down(rows_by_col)
+
     def manage_config(self):
+        from windows import ConfigManagement
         config_window = ConfigManagement(self)
         config_window.show()
         self.child_windows.append(config_window)
 
     def import_csv_window(self):
+        from windows import DragDropWindow
         new_window = DragDropWindow(self, "data")
         new_window.show()
         self.child_windows.append(new_window)
 
     def manage_id_person_window(self):
+        from windows import ManageIDPersonWindow
         manage_window = ManageIDPersonWindow(self)
         manage_window.show()
         self.child_windows.append(manage_window)
 
+    def summary_window(self):
+        from windows import SummaryWindow
+        from backend import FleetSummary, PandasModel
+        if not isinstance(getattr(self, "model", None), PandasModel):
+            print("The summary needs a log file opened.")
+            return
+        # One cached summary per loaded model, shared by all summary windows
+        if getattr(self, "fleet_summary", None) is None or self.fleet_summary.model is not self.model:
+            self.fleet_summary = FleetSummary(self.model)
+        summary_window = SummaryWindow(self, self.fleet_summary)
+        summary_window.show()
+        self.child_windows.append(summary_window)
+
     def save_id_person_map(self):
         csv_file = self.get_drivers_data_path()
         self.id_person_map.to_csv(csv_file, index=False)
 
     def load_id_person_map(self):
+        import pandas as pd
         csv_file = self.get_drivers_data_path()
         if os.path.exists(csv_file):
             return pd.read_csv(csv_file)
@@ -131,6 +251,7 @@ class MainWindow(QMainWindow):
         return os.path.join(path, "id_person_map.csv")
 
     def new_file(self):
+        from windows import DragDropWindow
         new_window = DragDropWindow(self)
         new_window.show()
         self.child_windows.append(new_window)
@@ -142,11 +263,7 @@ class MainWindow(QMainWindow):
         if self.filename is None:
             self.save_file_as()
         else:
-            try:
-                self.model._df.to_csv(self.filename, index=False)
-                print(f"Saved to {self.filename}")
-            except Exception as e:
-                print(f"Failed to save: {e}")
+            self.write_in_background(self.model.export_frame(), self.filename, "Saved to", self.inbox_snapshot())
 
     def save_file_as(self, export=False):
         # Decide which DataFrame to save
@@ -159,31 +276,181 @@ class MainWindow(QMainWindow):
             if not hasattr(self, "model") or self.model is None:
                 print("No data to save.")
                 return
-            df_to_save = self.model._df
+            df_to_save = self.model.export_frame()
+            inbox = self.inbox_snapshot()
 
         # Ask user for file path
-        path, _ = QFileDialog.getSaveFileName(
+        path, selected_filter = QFileDialog.getSaveFileName(
             self,
             "Save CSV",
             "",
-            "CSV Files (*.csv);;All Files (*)"
+            "CSV Files (*.csv);;Compressed CSV Files (*.csv.gz);;All Files (*)"
         )
 
         if path:
-            try:
-                df_to_save.columns = [col.replace('\n', ' ').replace('\r', ' ') if isinstance(col, str) else col
-                      for col in df_to_save.columns]
-
-                df_to_save.to_csv(path, index=False)
-                if not export:
-                    self.filename = path
-                    print(f"Saved as {path}")
-                else:
-                    print(f"Exported as {path}")
-            except Exception as e:
-                print(f"Failed to save: {e}")
+            if selected_filter.startswith("Compressed") and not path.lower().endswith(".gz"):
+                path += ".gz"
+            if not export:
+                self.filename = path
+            self.write_in_background(df_to_save, path, "Exported as" if export else "Saved as",
+                                     None if export else inbox)
+
+    def write_in_background(self, df, path, done_message, inbox=None):
+        from workers import run_in_background
+        from file_io import write_csv
+
+        def saved(p):
+            self.inbox_saved(inbox, p)
+            print(f"{done_message} {p}")
+        # Snapshot, so edits made during the write do not race with it
+        run_in_background(
+            write_csv, df.copy(), path,
+            on_finished=saved,
+            on_failed=lambda error: print(f"Failed to save: {error}")
+        )
+
+    def inbox_target(self):
+        # Where the open log is saved, inbox offsets are kept per target
+        if getattr(self.model, "writes_through", False):
+            return os.path.abspath(self.store.path)
+        if self.dataset is not None:
+            return os.path.abspath(self.dataset[0])
+        path = self.filename or self.current_path
+        return os.path.abspath(path) if path else None
+
+    def inbox_snapshot(self):
+        # Inbox rows the model holds when a save starts, (watcher, offsets)
+        watcher = getattr(self, "inbox_watcher", None)
+        return (watcher, watcher.snapshot()) if watcher is not None else None
+
+    def inbox_saved(self, inbox, target):
+        if inbox is None:
+            return
+        watcher, offsets = inbox
+        watcher.commit(offsets, os.path.abspath(target))
+        if watcher is self.inbox_watcher:
+            watcher.target = self.inbox_target()
+
+    def refuel_appendix(self):
+        return self.settings.value("refuel_appendix", False, type=bool)
+
+    def undo_limit(self):
+        return int(self.settings.value("undo_memory_mb", 64)) * 1024 * 1024
+
+    def get_database_path(self):
+        from storage import STORE_FILENAME
+        # Same default as the drivers map: the QSettings directory
+        path = self.settings.value("database_path", "")
+        if not path:
+            path = QStandardPaths.writableLocation(QStandardPaths.AppConfigLocation)
+            os.makedirs(path, exist_ok=True)
+        return os.path.join(path, STORE_FILENAME)
+
+    def get_store(self):
+        from storage import LogStore
+        path = self.get_database_path()
+        if getattr(self, "store", None) is None or self.store.path != path:
+            self.store = LogStore(path)
+        return self.store
+
+    def open_database(self):
+        from storage import SqlLogModel
+        try:
+            store = self.get_store()
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Could not open database:\n{e}")
+            return
+        self.df = None
+        self.parse_errors = []
+        self.filename = None
+        self.current_path = None
+        self.dataset = None
+        self.reload_window(SqlLogModel(store, undo_limit=self.undo_limit()))
+
+    def save_to_database(self):
+        if not hasattr(self, "model") or self.model is None:
+            print("No data to save.")
+            return
+        if self.model.parse_errors:
+            # The database keeps typed values only, the unread text is lost
+            answer = QMessageBox.question(
+                self, "Save to Database",
+                f"{len(self.model.parse_errors)} values could not be read and will be saved empty.\n"
+                "Save anyway?"
+            )
+            if answer != QMessageBox.Yes:
+                return
+        inbox = self.inbox_snapshot()
+        try:
+            added = self.get_store().import_log(self.model.to_frame())
+            self.inbox_saved(inbox, self.store.path)
+            print(f"Added {added} rows to {self.store.path}")
+        except Exception as e:
+            print(f"Failed to save: {e}")
+
+    def open_dataset(self):
+        from windows import OpenDataset
+        new_window = OpenDataset(self)
+        new_window.show()
+        self.child_windows.append(new_window)
+
+    def load_dataset(self, folder, vehicle, start, end):
+        # Only the partitions of the plate and the months around the dates
+        # are read. Whole months come back; the table filters narrow them
+        # to the dates, so saving back never cuts a month short.
+        from dataset import read_dataset
+        from workers import run_in_background
+        run_in_background(
+            read_dataset, folder, vehicle, start.toPython(), end.toPython(),
+            on_finished=lambda result: self.on_dataset_loaded(folder, vehicle, start, end, result),
+            on_failed=lambda error: QMessageBox.warning(self, "Error", f"Could not open dataset:\n{error}")
+        )
+
+    def on_dataset_loaded(self, folder, vehicle, start, end, result):
+        df, parse_errors, paths = result
+        self.df = df
+        self.parse_errors = parse_errors
+        self.filename = None
+        self.current_path = None
+        self.dataset = (folder, paths, {})
+        self.reload_window()
+        if vehicle:
+            self.form_area.id_input.setText(vehicle)
+        self.form_area.start_date.setDate(start)
+        self.form_area.finish_date.setDate(end)
+
+    def save_to_dataset(self):
+        from dataset import write_dataset
+        from workers import run_in_background
+        if not hasattr(self, "model") or self.model is None:
+            print("No data to save.")
+            return
+        if self.dataset is not None:
+            folder, paths, merged = self.dataset
+        else:
+            folder = QFileDialog.getExistingDirectory(
+                self, "Save to Dataset", self.settings.value("dataset_path", "")
+            )
+            paths, merged = [], {}
+            if not folder:
+                return
+            self.settings.setValue("dataset_path", folder)
+
+        inbox = self.inbox_snapshot()
+
+        def saved(result):
+            self.dataset = (folder, *result)
+            self.inbox_saved(inbox, folder)
+            print(f"Saved to {folder}")
+        # Snapshot, so edits made during the write do not race with it
+        run_in_background(
+            write_dataset, self.model.to_frame().copy(), folder, paths, self.model.parse_error_list(), merged,
+            on_finished=saved,
+            on_failed=lambda error: print(f"Failed to save: {error}")
+        )
 
     def export_as_pdf(self):
+        from raport_generation import raport_generate
         id_val = self.form_area.get_id()
         user_val = self.form_area.get_user()
         start_date_qdate = self.form_area.get_start_date()
@@ -198,9 +465,47 @@ class MainWindow(QMainWindow):
 
         path = self.settings.value("export_location_path", "")
 
-        raport_generate(self.aggregated_df, args, path)
+        try:
+            raport_generate(self.aggregated_df, args, path, refuel_appendix=self.refuel_appendix())
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Could not export the report:\n{e}")
+
+    def export_bundle_pdf(self):
+        from raport_generation import raport_generate_bundle, vehicle_reports
+        from backend import proxy_to_df
+        from workers import run_in_background
+        if not hasattr(self, "proxy_model"):
+            print("No data loaded.")
+            return
+        filtered_df = proxy_to_df(self.proxy_model)
+        drivers = {}
+        if not self.id_person_map.empty:
+            drivers = dict(zip(self.id_person_map["Pojazd"], self.id_person_map["Kierowca"]))
+
+        start_date_qdate = self.form_area.get_start_date()
+        finish_date_qdate = self.form_area.get_finish_date()
+        start_date = finish_date = None
+        if start_date_qdate.isValid() and finish_date_qdate.isValid():
+            start_date = start_date_qdate.toString("dd.MM.yyyy")
+            finish_date = finish_date_qdate.toString("dd.MM.yyyy")
+
+        path = self.settings.value("export_location_path", "")
+        refuel_appendix = self.refuel_appendix()
+
+        def export():
+            return raport_generate_bundle(
+                vehicle_reports(filtered_df, drivers, start_date, finish_date), path,
+                refuel_appendix=refuel_appendix
+            )
+
+        run_in_background(
+            export,
+            on_finished=lambda filename: print(f"Saved {filename}"),
+            on_failed=lambda error: print(f"Failed to export: {error}")
+        )
 
     def manual_export(self):
+        from windows import ManualExport
         new_window = ManualExport(self)
         new_window.show()
         self.child_windows.append(new_window)
@@ -217,9 +522,71 @@ class MainWindow(QMainWindow):
         self.lock_button.setText("Unlock" if new_state else "Lock")
 
     def generate_action(self):
-        filtered_df = proxy_to_df(self.proxy_model)
-        self.aggregated_df = aggregate_trips(filtered_df)
+        from raport_generation import generate_trips
+        from backend import report_frame
+        from workers import run_in_background
+        # The worker gets its own copy of the filtered rows, edits and filter
+        # changes made meanwhile do not reach it. A newer request supersedes
+        # a running one and only the latest result is shown.
+        self.cancel_generate()
+        filtered_df = report_frame(self.proxy_model)
+        self._generation += 1
+        generation = self._generation
+        self._generating = run_in_background(
+            generate_trips, filtered_df, bool(os.environ.get("FLAG_SHARDED_AGGREGATE")),
+            cancellable=True,
+            on_finished=lambda trips: self.on_generated(generation, trips),
+            on_failed=lambda error: self.on_generate_failed(generation, error)
+        )
+        self.generate_button.setText("Generating...")
+
+    def cancel_generate(self):
+        self._regenerate_timer.stop()
+        if self._generating is not None:
+            self._generating.cancel()
+            self._generating = None
+        self._generation += 1
+
+    def regenerate_if_running(self):
+        # The filter changed under a running Generate, redo it for the new
+        # filter once typing pauses
+        if self._generating is not None:
+            self.cancel_generate()
+            self._regenerate_timer.start()
+
+    def on_generated(self, generation, trips):
+        if generation != self._generation:
+            return
+        self._generating = None
+        self.generate_button.setText("Generate")
+        self.show_generated(trips)
+
+    def on_generate_failed(self, generation, error):
+        if generation != self._generation:
+            return
+        self._generating = None
+        self.generate_button.setText("Generate")
+        print(f"Failed to generate: {error}")
+
+    def aggregate_large_file(self):
+        # Trips straight from a log too large to open, read in chunks
+        from raport_generation import aggregate_log_file
+        from workers import run_in_background
+        from file_io import LOG_FILE_FILTER
+        file_path, _ = QFileDialog.getOpenFileName(self, "Aggregate Large File", "", LOG_FILE_FILTER)
+        if not file_path:
+            return
+        vehicle = self.form_area.id_input.text().strip() or None
+        print(f"Aggregating {file_path}...")
+        run_in_background(
+            aggregate_log_file, file_path, vehicle,
+            on_finished=self.show_generated,
+            on_failed=lambda error: print(f"Failed to aggregate: {error}")
+        )
 
+    def show_generated(self, aggregated_df):
+        from backend import PandasModel
+        self.aggregated_df = aggregated_df
         self.generated_model = PandasModel(self.aggregated_df, locked=True)
 
         if hasattr(self, "generated_table"):
@@ -231,7 +598,53 @@ class MainWindow(QMainWindow):
 
         self.right_layout.addWidget(self.generated_table)
 
-    def reload_window(self):
+    def fit_columns(self, table_view):
+        # resizeColumnsToContents measures the cells row by row, on a large
+        # log that holds up the first paint. Widths come from the header, a
+        # sample of rows and the longest value of each column instead, and
+        # are kept per file for the next time it is opened.
+        from backend import sample_rows
+        from file_io import file_signature
+        model = self.model
+        signature = None
+        if self.current_path is not None and os.path.isfile(self.current_path):
+            signature = file_signature(self.current_path)
+            cached = self.column_widths.get(self.current_path)
+            if (cached and (float(cached["mtime"]), int(cached["size"])) == signature
+                    and len(cached["widths"]) == model.columnCount()):
+                for col, width in enumerate(cached["widths"]):
+                    table_view.setColumnWidth(col, int(width))
+                return
+
+        header = table_view.horizontalHeader()
+        metrics = table_view.fontMetrics()
+        # The delegate's text margins on both sides, the grid line and a pixel
+        # for rounding
+        margin = 2 * (table_view.style().pixelMetric(QStyle.PM_FocusFrameHMargin, None, table_view) + 1) + 2
+        rows = sample_rows(model.rowCount())
+        longest = model.longest_values()
+        widths = []
+        for col in range(model.columnCount()):
+            texts = [model.data(model.index(row, col)) for row in rows] + [longest[col]]
+            cells = max(metrics.horizontalAdvance(text) for text in texts) + margin
+            widths.append(max(cells, header.sectionSizeHint(col)))
+        for col, width in enumerate(widths):
+            table_view.setColumnWidth(col, width)
+
+        if signature is not None:
+            self.column_widths[self.current_path] = {
+                "mtime": signature[0], "size": signature[1], "widths": widths
+            }
+            self.save_column_widths()
+
+    def reload_window(self, model=None):
+        from windows import FormArea
+        from backend import IDFilterProxyModel, PandasModel
+        self.cancel_generate()
+        self._recent_labels = {}
+        self._pending_open = None
+        # A log is open now, frames read ahead for the start screen are stale
+        self._preloaded = {}
         central_widget = QWidget()
         main_layout = QVBoxLayout(central_widget)
 
@@ -247,13 +660,19 @@ class MainWindow(QMainWindow):
         left_widget = QWidget()
         left_layout = QVBoxLayout(left_widget)
 
-        if self.df is not None:
+        if model is None and self.df is not None:
+            model = PandasModel(self.df, parse_errors=self.parse_errors, undo_limit=self.undo_limit())
+            if self.parse_errors:
+                print(f"{len(self.parse_errors)} values could not be read, see the cell tooltips")
+
+        if model is not None:
             table_view = QTableView()
-            self.model = PandasModel(self.df)
+            self.table_view = table_view
+            self.model = model
             self.proxy_model = IDFilterProxyModel()
             self.proxy_model.setSourceModel(self.model)
-            self.proxy_model.date_col_index = self.df.columns.get_loc("Data i Godzina")
-            filtered_df = proxy_to_df(self.proxy_model)
+            columns = [model.headerData(i, Qt.Horizontal) for i in range(model.columnCount())]
+            self.proxy_model.date_col_index = columns.index("Data i Godzina")
 
             undo_shortcut = QShortcut(QKeySequence("Ctrl+Z"), table_view)
             undo_shortcut.activated.connect(self.model.undo)
@@ -261,12 +680,30 @@ class MainWindow(QMainWindow):
             redo_shortcut = QShortcut(QKeySequence("Ctrl+Y"), table_view)
             redo_shortcut.activated.connect(self.model.redo)
 
-            id_col_index = self.df.columns.get_loc("Pojazd")
+            copy_shortcut = QShortcut(QKeySequence("Ctrl+C"), table_view)
+            copy_shortcut.activated.connect(self.copy_cells)
+
+            # The database model takes single cell edits only
+            self.find_replace_action.setEnabled(self.model.edits_rows)
+            if self.model.edits_rows:
+                paste_shortcut = QShortcut(QKeySequence("Ctrl+V"), table_view)
+                paste_shortcut.activated.connect(self.paste_cells)
+
+                fill_down_shortcut = QShortcut(QKeySequence("Ctrl+D"), table_view)
+                fill_down_shortcut.activated.connect(self.fill_down)
+
+                find_replace_shortcut = QShortcut(QKeySequence("Ctrl+H"), table_view)
+                find_replace_shortcut.activated.connect(self.find_replace_window)
+
+            id_col_index = columns.index("Pojazd")
             self.proxy_model.setFilterKeyColumn(id_col_index)
             self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
 
             table_view.setModel(self.proxy_model)
-            table_view.resizeColumnsToContents()
+            # No indicator, so enabling sorting keeps the file order
+            table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            table_view.setSortingEnabled(True)
+            self.fit_columns(table_view)
             table_view.setContextMenuPolicy(Qt.CustomContextMenu)
 
             self.form_area.id_input.textChanged.connect(self.update_id_filter)
@@ -275,14 +712,23 @@ class MainWindow(QMainWindow):
 
             def open_menu(pos):
                 index = table_view.indexAt(pos)
-                if index.isValid():
+                if index.isValid() and self.model.edits_rows:
                     menu = QMenu()
                     revert_action = QAction("Revert cell", self)
+                    source_index = self.proxy_model.mapToSource(index)
                     revert_action.triggered.connect(
-                        lambda: self.model.revert_cell(index.row(), index.column())
+                        lambda: self.model.revert_cell(source_index.row(), source_index.column())
                     )
                     menu.addAction(revert_action)
 
+                    paste_action = QAction("Paste", self)
+                    paste_action.triggered.connect(self.paste_cells)
+                    menu.addAction(paste_action)
+
+                    fill_down_action = QAction("Fill down", self)
+                    fill_down_action.triggered.connect(self.fill_down)
+                    menu.addAction(fill_down_action)
+
                     insert_above_action = QAction("Insert row above", self)
                     insert_above_action.triggered.connect(
                         lambda: self.model.insert_row(
@@ -300,9 +746,15 @@ class MainWindow(QMainWindow):
                     )
                     menu.addAction(insert_below_action)
 
-                    delete_action = QAction("Delete row", self)
+                    duplicate_action = QAction("Duplicate selected rows", self)
+                    duplicate_action.triggered.connect(
+                        lambda: self.model.duplicate_rows(self.selected_source_rows(index))
+                    )
+                    menu.addAction(duplicate_action)
+
+                    delete_action = QAction("Delete selected rows", self)
                     delete_action.triggered.connect(
-                        lambda: self.model.delete_row(index.row())
+                        lambda: self.model.delete_rows(self.selected_source_rows(index))
                     )
                     menu.addAction(delete_action)
 
@@ -338,36 +790,39 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(central_widget)
         self.update_date_range()
+        self.start_inbox_watcher()
+
+    def start_inbox_watcher(self):
+        from backend import InboxWatcher
+        if getattr(self, "inbox_watcher", None) is not None:
+            self.inbox_watcher.stop()
+            self.inbox_watcher = None
+        folder = self.settings.value("inbox_path", "")
+        if folder and getattr(self, "model", None) is not None:
+            self.inbox_watcher = InboxWatcher(folder, self.model, self.settings, self.inbox_target())
 
     def update_date_filter(self):
         start = self.form_area.start_date.date()
         end = self.form_area.finish_date.date()
         self.proxy_model.set_date_range(start, end)
+        self.regenerate_if_running()
 
     def update_id_filter(self, text):
-        self.proxy_model.filter_text = text
-        self.proxy_model.invalidateFilter()
+        self.proxy_model.set_filter_text(text)
+        self.regenerate_if_running()
 
     def update_date_range(self):
-        if self.df is None or self.proxy_model.rowCount() == 0:
+        from backend import proxy_rows
+        if getattr(self, "model", None) is None or self.proxy_model.rowCount() == 0:
             return
 
-        date_col_index = self.df.columns.get_loc("Data i Godzina")
-        visible_dates = []
-
-        for row in range(self.proxy_model.rowCount()):
-            index = self.proxy_model.index(row, date_col_index)
-            value = self.proxy_model.data(index)
-            if value:
-                dt = pd.to_datetime(value, format="%d.%m.%Y %H:%M", errors='coerce')
-                if dt is not pd.NaT:
-                    visible_dates.append(dt.date())
+        min_date, max_date = self.model.date_span(proxy_rows(self.proxy_model))
 
-        if not visible_dates:
+        if min_date is None:
             return
 
-        min_date = min(visible_dates)
-        max_date = max(visible_dates)
+        min_date = min_date.date()
+        max_date = max_date.date()
 
         self.form_area.start_date.blockSignals(True)
         self.form_area.finish_date.blockSignals(True)
@@ -399,6 +854,105 @@ class MainWindow(QMainWindow):
     def save_recent_files(self):
         self.settings.setValue("recentFiles", self.recent_files)
 
+    def load_recent_metadata(self):
+        metadata = self.settings.value("recentFilesMetadata", {})
+        if not isinstance(metadata, dict):
+            return {}
+        return {f: m for f, m in metadata.items() if f in self.recent_files}
+
+    def save_recent_metadata(self):
+        self.recent_metadata = {
+            f: m for f, m in self.recent_metadata.items() if f in self.recent_files
+        }
+        self.settings.setValue("recentFilesMetadata", self.recent_metadata)
+
+    def load_column_widths(self):
+        widths = self.settings.value("recentFilesColumnWidths", {})
+        if not isinstance(widths, dict):
+            return {}
+        return {f: w for f, w in widths.items() if f in self.recent_files}
+
+    def save_column_widths(self):
+        self.column_widths = {
+            f: w for f, w in self.column_widths.items() if f in self.recent_files
+        }
+        self.settings.setValue("recentFilesColumnWidths", self.column_widths)
+
+    def has_fresh_metadata(self, file_path):
+        metadata = self.recent_metadata.get(file_path)
+        if not metadata:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return (float(metadata.get("mtime", 0)) == stat.st_mtime
+                and int(metadata.get("size", -1)) == stat.st_size)
+
+    def preload_recent_files(self):
+        from workers import run_in_background
+        from file_io import preload_log, read_log_metadata
+
+        for i, file_path in enumerate(self.recent_files):
+            if file_path in self._loading:
+                continue
+            # The most recent file is the likely next open, read all of it
+            if i == 0 and self.df is None:
+                fn = preload_log
+            elif not self.has_fresh_metadata(file_path):
+                fn = read_log_metadata
+            else:
+                continue
+            self._loading[file_path] = run_in_background(
+                fn, file_path,
+                on_finished=self.on_file_preloaded,
+                on_failed=lambda error, f=file_path: self.on_preload_failed(f, error)
+            )
+
+    def on_file_preloaded(self, result):
+        file_path, loaded, metadata = result
+        self._loading.pop(file_path, None)
+        self.recent_metadata[file_path] = metadata
+        self.save_recent_metadata()
+        if loaded is not None and (self._pending_open == file_path or not hasattr(self, "model")):
+            self._preloaded[file_path] = ((metadata["mtime"], metadata["size"]), loaded)
+
+        label = self._recent_labels.get(file_path)
+        if label is not None:
+            label.setText(self.recent_file_caption(file_path))
+
+        if self._pending_open == file_path:
+            self._pending_open = None
+            self.open_recent_file(file_path)
+
+    def on_preload_failed(self, file_path, error):
+        self._loading.pop(file_path, None)
+        print(f"Failed to preload {file_path}: {error}")
+        if self._pending_open == file_path:
+            self._pending_open = None
+            QMessageBox.warning(self, "Error", f"Could not open file:\n{error}")
+
+    def recent_file_caption(self, file_path):
+        from datetime import datetime
+        lines = [os.path.basename(file_path)]
+        metadata = self.recent_metadata.get(file_path)
+        if metadata and self.has_fresh_metadata(file_path):
+            lines.append(f"{metadata['rows']} rows, {metadata['vehicles']} vehicles")
+            if metadata["first"]:
+                lines.append(f"{metadata['first']} - {metadata['last']}")
+        try:
+            modified = datetime.fromtimestamp(os.path.getmtime(file_path))
+            lines.append(f"Modified {modified:%d.%m.%Y %H:%M}")
+        except OSError:
+            pass
+        return "\n".join(lines)
+
+    def file_icon(self):
+        if self._file_icon is None:
+            pixmap = QPixmap("file_icon.png").scaled(128, 128, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self._file_icon = QIcon(pixmap)
+        return self._file_icon
+
     def add_recent_file(self, file_path):
         if not os.path.isfile(file_path):
             return
@@ -408,9 +962,11 @@ class MainWindow(QMainWindow):
         self.recent_files = self.recent_files[:5]  # keep max 5
         self.save_recent_files()
         self.show_recent_files()
+        self.preload_recent_files()
 
     def show_recent_files(self):
         container_layout = QVBoxLayout()
+        self._recent_labels = {}
 
         if not self.recent_files:
             container_layout.addWidget(QLabel("No recent files"))
@@ -423,16 +979,16 @@ class MainWindow(QMainWindow):
                 file_layout = QVBoxLayout()
 
                 icon_btn = QPushButton()
-                pixmap = QPixmap("file_icon.png").scaled(128, 128, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                icon_btn.setIcon(QIcon(pixmap))
+                icon_btn.setIcon(self.file_icon())
                 icon_btn.setIconSize(QSize(128, 128))
                 icon_btn.setFlat(True)
                 icon_btn.clicked.connect(lambda _, f=file_path: self.open_recent_file(f))
                 file_layout.addWidget(icon_btn, alignment=Qt.AlignHCenter)
 
-                file_label = QLabel(os.path.basename(file_path))
+                file_label = QLabel(self.recent_file_caption(file_path))
                 file_label.setAlignment(Qt.AlignHCenter)
                 file_layout.addWidget(file_label)
+                self._recent_labels[file_path] = file_label
 
                 row_layout.addLayout(file_layout)
 
@@ -443,15 +999,28 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(container)
 
     def open_recent_file(self, file_path):
+        from file_io import file_signature, load_log
         try:
-            df = pd.read_csv(file_path)
+            preloaded = self._preloaded.pop(file_path, None)
+            if preloaded is not None and preloaded[0] == file_signature(file_path):
+                df, parse_errors = preloaded[1]
+            elif file_path in self._loading:
+                # Already being read in the background, open it when it lands
+                self._pending_open = file_path
+                return
+            else:
+                df, parse_errors = load_log(file_path)
             self.df = df
+            self.parse_errors = parse_errors
+            self.current_path = file_path
+            self.dataset = None
             self.reload_window()
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Could not open file:\n{e}")
 
 
 def update_date_range(self):
+    import pandas as pd
     if self.df is None or self.proxy_model.rowCount() == 0:
         return
 
@@ -487,5 +1056,12 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.showMaximized()
+    if os.environ.get("FLAG_STARTUP_TIMING"):
+        import_time = _IMPORTS_DONE - _START_TIME
+        # Fires once the event loop has painted the first frame
+        QTimer.singleShot(0, lambda: print(
+            f"Startup: imports {import_time * 1000:.0f} ms, "
+            f"first frame {(time.perf_counter() - _START_TIME) * 1000:.0f} ms"
+        ))
     sys.exit(app.exec())
 
@@ -0,0 +1,146 @@
+from reportlab.platypus import Flowable
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+TRIP_COLUMNS = [
+    "Data wyjazdu", "Cel trasy", "Liczba faktycznie przejechanych kilometrów",
+    "Kierowca", "Stan licznika\nwyjazd", "Stan licznika\nprzyjazd"
+]
+
+
+class TripTable(Flowable):
+    # Draws the trip table straight onto the canvas. Every row has the same
+    # height, so splitting across pages is plain arithmetic; the header row
+    # is the platypus table the regular path uses, drawn again on each page.
+    def __init__(self, header, rows, col_widths, header_height=100, row_height=60,
+                 font_name="DejaVu", font_size=8, leading=12, padding=6, wraps=None):
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.col_widths = col_widths
+        self.header_height = header_height
+        self.row_height = row_height
+        self.font_name = font_name
+        self.font_size = font_size
+        self.leading = leading
+        self.padding = padding
+        self.wraps = {} if wraps is None else wraps  # shared by the pages of one table
+        self.hAlign = "CENTER"
+
+    @classmethod
+    def from_frame(cls, header, df, col_widths, **kwargs):
+        # Missing readings are left blank, as in the platypus table
+        rows = list(zip(*(df[c].astype(object).where(df[c].notna(), "").astype(str).tolist()
+                          for c in TRIP_COLUMNS)))
+        return cls(header, rows, col_widths, **kwargs)
+
+    def _piece(self, rows):
+        return TripTable(
+            self.header, rows, self.col_widths, self.header_height, self.row_height,
+            self.font_name, self.font_size, self.leading, self.padding, self.wraps
+        )
+
+    def wrap(self, availWidth, availHeight):
+        self.width = sum(self.col_widths)
+        self.height = self.header_height + self.row_height * len(self.rows)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        fit = int((availHeight - self.header_height) // self.row_height)
+        if fit < 1 or fit >= len(self.rows):
+            return []
+        return [self._piece(self.rows[:fit]), self._piece(self.rows[fit:])]
+
+    def _lines(self, text, width):
+        # Wrapped lines of a cell with their widths, worked out once per text
+        key = (text, width)
+        lines = self.wraps.get(key)
+        if lines is None:
+            lines = [
+                (line, stringWidth(line, self.font_name, self.font_size))
+                for line in simpleSplit(text, self.font_name, self.font_size, width)
+            ]
+            self.wraps[key] = lines
+        return lines
+
+    def _draw_text(self, text_object, text, x, width, y, height):
+        # Centred both ways, with the baselines a Paragraph would use
+        lines = self._lines(text, width - 2 * self.padding)
+        baseline = y + (height + len(lines) * self.leading) / 2 - self.font_size
+        centre = x + width / 2
+        for line, line_width in lines:
+            text_object.setTextOrigin(centre - line_width / 2, baseline)
+            text_object.textOut(line)
+            baseline -= self.leading
+
+    def _draw_header(self, canv, y):
+        # The header is the same on every page, so it is written to the
+        # file once as a form and only referenced after that
+        name = "TripHeader%d" % abs(hash((tuple(self.col_widths), self.header_height)))
+        if not canv.hasForm(name):
+            canv.beginForm(name, 0, 0, self.width, self.header_height)
+            self.header.wrapOn(canv, self.width, self.header_height)
+            self.header.drawOn(canv, 0, 0)
+            canv.endForm()
+        canv.saveState()
+        canv.translate(0, y)
+        canv.doForm(name)
+        canv.restoreState()
+
+    def draw(self):
+        canv = self.canv
+        body = self.row_height * len(self.rows)
+
+        self._draw_header(canv, body)
+
+        xs = [0]
+        for width in self.col_widths:
+            xs.append(xs[-1] + width)
+        odometer_x = xs[4]
+        odometer_width = self.col_widths[4]
+        half = self.row_height / 2
+
+        canv.saveState()
+        canv.setLineWidth(0.5)
+        canv.setLineCap(1)
+        path = canv.beginPath()
+        for x in xs:
+            path.moveTo(x, 0)
+            path.lineTo(x, body)
+        for i in range(len(self.rows)):
+            y = body - i * self.row_height
+            path.moveTo(0, y - self.row_height)
+            path.lineTo(self.width, y - self.row_height)
+            path.moveTo(odometer_x, y - half)
+            path.lineTo(odometer_x + odometer_width, y - half)
+        canv.drawPath(path, stroke=1, fill=0)
+
+        text_object = canv.beginText()
+        text_object.setFont(self.font_name, self.font_size, self.leading)
+        for i, row in enumerate(self.rows):
+            y = body - (i + 1) * self.row_height
+            for col in range(4):
+                self._draw_text(text_object, row[col], xs[col], self.col_widths[col], y, self.row_height)
+            self._draw_text(text_object, row[4], odometer_x, odometer_width, y + half, half)
+            self._draw_text(text_object, row[5], odometer_x, odometer_width, y, half)
+        canv.drawText(text_object)
+        canv.restoreState()
+
+
+class Bookmark(Flowable):
+    # Takes no space; adds an outline entry pointing at the page it lands on
+    # and appends that page to starts, if given
+    def __init__(self, title, key, starts=None):
+        super().__init__()
+        self.title = title
+        self.key = key
+        self.starts = starts
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+        if self.starts is not None:
+            self.starts.append(self.canv.getPageNumber())
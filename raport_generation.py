@@ -1,72 +1,452 @@
+import numpy as np
 import pandas as pd
+import io
 import locale
 import calendar
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle,
-    Paragraph, Spacer, KeepTogether
-)
 
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.pagesizes import landscape, A4
+from file_io import LOG_CHUNK_ROWS, compact_log, read_log_chunks, refuel_flags
+
+PAGE_MARGIN = 20
+HEADER_ROW_HEIGHT = 100
+DATA_ROW_HEIGHT = 60
+# Trips from which a report is laid out by a process pool; below this it
+# is done before the workers have started
+REPORT_ENGINES = ("platypus", "canvas")
+PARALLEL_MIN_ROWS = {"platypus": 2000, "canvas": 20000}
+
+
+def format_days(times):
+    # dd.mm.yyyy of each timestamp; trips share days, so each day is
+    # formatted once
+    codes, days = pd.factorize(times.dt.floor("D"))
+    text = [f"{d:02d}.{m:02d}.{y}" for d, m, y in zip(days.day, days.month, days.year)]
+    return np.array(text + [np.nan], dtype=object)[codes]
+
+
+def pair_trips(df, state=None):
+    # Pairs time ordered log rows into trips: the first departure after a
+    # return opens a trip, the next "Powrót" closes it, anything in between
+    # is ignored. Refuels ("Tankowanie") are counted per trip in the same
+    # pass, together with the km from the refuel before to the trip's last
+    # one. state is (open trip, odometer at the last refuel) left by the
+    # rows before df; returns the trips and the state after df.
+    open_trip, last_refuel = state or (None, pd.NA)
+    n = len(df.index)
+    purpose = df["Cel Trasy"].to_numpy(dtype=object)
+    returns = np.flatnonzero(purpose == "Powrót")
+    starts = np.concatenate([[0], returns[:-1] + 1])
+    closes = starts < returns
+    if open_trip is not None and len(returns):
+        closes[0] = False
+    starts, ends = starts[closes], returns[closes]
+
+    tacho = df["Stan Licznika"].astype("Int64").array
+    refuels = refuel_flags(df["Tankowanie"]) if "Tankowanie" in df.columns else np.zeros(n, dtype=bool)
+    refuel_tacho = tacho[np.flatnonzero(refuels)]
+    previous_tacho = pd.concat(
+        [pd.Series([last_refuel], dtype="Int64"), pd.Series(refuel_tacho[:-1])], ignore_index=True
+    ).array
+    refuel_km = refuel_tacho - previous_tacho
+    seen = np.concatenate([[0], np.cumsum(refuels)])  # refuels before each row
+
+    def refuel_stats(lo, hi):
+        # Refuels in rows lo..hi and the km up to the last of them
+        count = seen[hi + 1] - seen[lo]
+        if not len(refuel_km):
+            return count, pd.array([pd.NA] * len(count), dtype="Int64")
+        km = refuel_km[np.maximum(seen[hi + 1] - 1, 0)]
+        km[count == 0] = pd.NA
+        return count, km
+
+    refuel_count, km_between = refuel_stats(starts, ends)
+    trips = pd.DataFrame({
+        "Data wyjazdu": format_days(df["Data i Godzina"].iloc[starts]),
+        "Cel trasy": purpose[starts],
+        "Stan licznika\nwyjazd": tacho[starts],
+        "Stan licznika\nprzyjazd": tacho[ends],
+        "Liczba faktycznie przejechanych kilometrów": tacho[ends] - tacho[starts],
+        "Kierowca": df["Kierowca"].to_numpy(dtype=object)[ends],
+        "Tankowania": refuel_count,
+        "Km między tankowaniami": km_between,
+    })
+
+    if open_trip is not None and n:
+        # Carried in: closed by the first return, or still open after df
+        end = returns[0] if len(returns) else n - 1
+        count, km = refuel_stats(np.array([0]), np.array([end]))
+        open_trip = dict(open_trip)
+        open_trip["Tankowania"] += count[0]
+        if count[0]:
+            open_trip["Km między tankowaniami"] = km[0]
+        if len(returns):
+            first = dict(open_trip)
+            first["Stan licznika\nprzyjazd"] = tacho[end]
+            first["Liczba faktycznie przejechanych kilometrów"] = tacho[end] - open_trip["Stan licznika\nwyjazd"]
+            first["Kierowca"] = df["Kierowca"].iloc[end]
+            first = pd.DataFrame([first], columns=trips.columns).astype(trips.dtypes.to_dict())
+            trips = pd.concat([first, trips], ignore_index=True)
+            open_trip = None
+
+    last_return = returns[-1] if len(returns) else -1
+    if open_trip is None and last_return + 1 < n:
+        start = last_return + 1
+        count, km = refuel_stats(np.array([start]), np.array([n - 1]))
+        open_trip = {
+            "Data wyjazdu": format_days(df["Data i Godzina"].iloc[[start]])[0],
+            "Cel trasy": purpose[start],
+            "Stan licznika\nwyjazd": tacho[start],
+            "Tankowania": count[0],
+            "Km między tankowaniami": km[0],
+        }
+    if len(refuel_tacho):
+        last_refuel = refuel_tacho[-1]
+    return trips, (open_trip, last_refuel)
+
+
+def refuel_month_stats(trips):
+    # Per month of departure, from the trip table alone
+    months = pd.to_datetime(trips["Data wyjazdu"], format="%d.%m.%Y", errors="coerce").dt.to_period("M")
+    grouped = trips.groupby(months.rename("Miesiąc"))
+    result = grouped.agg(
+        trips=("Cel trasy", "size"),
+        km=("Liczba faktycznie przejechanych kilometrów", "sum"),
+        refuels=("Tankowania", "sum"),
+        between=("Km między tankowaniami", "mean"),
+    )
+    return pd.DataFrame({
+        "Liczba tras": result["trips"].astype("int64"),
+        "Kilometry": result["km"].astype("Int64"),
+        "Tankowania": result["refuels"].astype("int64"),
+        "Średnio km między tankowaniami": result["between"].astype("Float64").round(1),
+    })
+
 
 def aggregate_trips(file):
-    df = file
+    # Logs are typed on import, compact_log only converts leftover text
+    df = compact_log(file)
+
+    df = df.sort_values("Data i Godzina", kind="stable").reset_index(drop=True)
+
+    trips, _ = pair_trips(df)
+    return trips
+
+
+def generate_trips(df, sharded=False, cancelled=None):
+    # aggregate_trips for the Generate button, run on a worker thread over a
+    # snapshot of the filtered rows. A superseded run stops at the next
+    # step once cancelled (a threading.Event) is set.
+    if sharded:
+        # Trips paired per vehicle, split over a process pool
+        from shards import aggregate_trips_sharded
+        return aggregate_trips_sharded(df, cancelled=cancelled)
+    df = compact_log(df)
+    if cancelled is not None and cancelled.is_set():
+        return None
+    df = df.sort_values("Data i Godzina", kind="stable").reset_index(drop=True)
+    if cancelled is not None and cancelled.is_set():
+        return None
+    trips, _ = pair_trips(df)
+    return trips
+
+
+def iter_trips(chunks, vehicle=None):
+    # Trips from the chunks of a log in time order, for example
+    # pd.read_csv(chunksize=...). A trip still open at the end of a chunk
+    # is carried into the next one, so only one chunk is held at a time.
+    # Undated rows may only come last, where aggregate_trips sorts them.
+    # Raises ValueError at the first row out of order, the trips would
+    # not be those of aggregate_trips.
+    state = None
+    last = np.iinfo(np.int64).min
+    rows = 0
+    for chunk in chunks:
+        if vehicle:
+            chunk = chunk[chunk["Pojazd"].astype(str).str.lower() == vehicle.lower()]
+        if chunk.empty:
+            continue
+        df = compact_log(chunk).reset_index(drop=True)
+        times = df["Data i Godzina"]
+        keys = times.to_numpy(dtype="int64", copy=True)
+        keys[times.isna().to_numpy()] = np.iinfo(np.int64).max
+        backwards = keys < np.concatenate([[last], keys[:-1]])
+        if backwards.any():
+            row = rows + int(np.flatnonzero(backwards)[0])
+            raise ValueError(
+                f"The log is not in time order at data row {row + 1}, open it and use Generate instead."
+            )
+        last = keys[-1]
+        rows += len(df.index)
+        trips, state = pair_trips(df, state)
+        if not trips.empty:
+            yield trips
+
+
+def aggregate_log_file(path, vehicle=None, chunksize=LOG_CHUNK_ROWS):
+    # aggregate_trips for a log too large to load, read chunk by chunk
+    frames = list(iter_trips(read_log_chunks(path, chunksize), vehicle))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def vehicle_month_km(df):
+    # Odometer span per vehicle and calendar month
+    months = df["Data i Godzina"].dt.to_period("M").rename("Miesiąc")
+    departures = (df["Cel Trasy"] != "Powrót").rename("Liczba tras")
+    grouped = pd.concat([df[["Pojazd", "Stan Licznika"]], months, departures], axis=1).groupby(
+        ["Pojazd", "Miesiąc"], observed=True
+    )
+    result = grouped.agg(
+        od=("Stan Licznika", "min"), do=("Stan Licznika", "max"), trips=("Liczba tras", "sum")
+    )
+    return pd.DataFrame({
+        "Kilometry": (result["do"] - result["od"]).astype("Int64"),
+        "Liczba tras": result["trips"].astype("int64"),
+    })
 
-    df["Stan Licznika"] = df["Stan Licznika"].astype(str).str.replace(" ", "").astype(int)
 
-    df["Data i Godzina"] = pd.to_datetime(
-        df["Data i Godzina"],
-        format="%d.%m.%Y %H:%M",
-        errors="coerce"
+def driver_trip_counts(df):
+    departures = df["Cel Trasy"] != "Powrót"
+    counts = departures.groupby(df["Kierowca"], observed=True).sum()
+    return counts.astype("int64").rename("Liczba tras").to_frame()
+
+
+def vehicle_km_per_day(df):
+    # Same measure as the report header: odometer span over the days covered
+    grouped = df.groupby("Pojazd", observed=True)
+    result = grouped.agg(
+        od=("Stan Licznika", "min"), do=("Stan Licznika", "max"),
+        first=("Data i Godzina", "min"), last=("Data i Godzina", "max")
+    )
+    km = (result["do"] - result["od"]).astype("Int64")
+    days = (result["last"].dt.normalize() - result["first"].dt.normalize()).dt.days.clip(lower=1)
+    return pd.DataFrame({
+        "Kilometry": km,
+        "Dni": days.astype("Int64"),
+        "Km na dzień": (km / days).round(1),
+    })
+
+
+def cell_text(value):
+    # A reading that did not parse is left blank, not printed as <NA>
+    return "" if pd.isna(value) else str(value)
+
+
+def report_filename(registration_plate, month_name, year):
+    # The plate comes from the log or a request, it must not leave save_path
+    plate = "".join("_" if c in '\\/:*?"<>|' or ord(c) < 32 else c for c in str(registration_plate))
+    return f"{plate.lstrip('.') or 'raport'}_{month_name}_{year}.pdf"
+
+
+def report_engine(engine=None):
+    # "canvas" draws the trip rows directly instead of laying out a Table
+    if engine is None:
+        engine = "canvas" if os.environ.get("FLAG_CANVAS_PDF") else "platypus"
+    if engine not in REPORT_ENGINES:
+        raise ValueError(f"Unknown report engine {engine!r}, use one of: {', '.join(REPORT_ENGINES)}.")
+    return engine
+
+
+def report_doc(target):
+    # ReportLab is only needed for export, keep it out of the startup path
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.pagesizes import A4
+    return SimpleDocTemplate(
+        target, pagesize=A4, rightMargin=PAGE_MARGIN, leftMargin=PAGE_MARGIN,
+        topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN
     )
 
-    df = df.sort_values("Data i Godzina").reset_index(drop=True)
 
-    df = df.sort_values("Data i Godzina").reset_index(drop=True)
+def number_pages(offset=0, starts=None):
+    # "Strona N" under each page; offset continues the count for a report
+    # built in parts, starts holds the first page of each report of a
+    # bundle so every report counts from 1
+    def draw(canv, doc):
+        page = offset + canv.getPageNumber() - (starts[-1] - 1 if starts else 0)
+        canv.saveState()
+        canv.setFont("DejaVu", 8)
+        canv.drawCentredString(doc.pagesize[0] / 2, PAGE_MARGIN / 2, f"Strona {page}")
+        canv.restoreState()
+    return draw
 
-    df["Data i Godzina_display"] = df["Data i Godzina"].dt.strftime("%d.%m.%Y")
 
-    trips = []
-    current_trip = None
+def pdf_writer():
+    # pypdf is optional, without it large reports are built in one process
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return None
+    return PdfWriter
 
-    for _, row in df.iterrows():
-        if row["Cel Trasy"] != "Powrót" and current_trip is None:
-            start_tacho = row["Stan Licznika"]
-            current_trip = {
-                "Data wyjazdu": row["Data i Godzina_display"],
-                "Cel trasy": row["Cel Trasy"],
-                "Stan licznika\nwyjazd": row["Stan Licznika"],
-            }
-        elif row["Cel Trasy"] == "Powrót" and current_trip is not None:
-            current_trip["Stan licznika\nprzyjazd"] = row["Stan Licznika"]
-            current_trip["Liczba faktycznie przejechanych kilometrów"] = row["Stan Licznika"] - start_tacho
-            current_trip["Kierowca"] = row["Kierowca"]
-            trips.append(current_trip)
-            current_trip = None
 
-    result = pd.DataFrame(trips)
+def raport_generate(df, other_data=[], save_path="", engine=None, refuel_appendix=False, max_workers=None):
+    os.makedirs(save_path, exist_ok=True)
+    engine = report_engine(engine)
+    workers = max_workers or os.cpu_count() or 1
+    if len(df.index) >= PARALLEL_MIN_ROWS[engine] and workers > 1 and pdf_writer() is not None:
+        filename = raport_generate_parallel(df, other_data, save_path, engine, refuel_appendix, workers)
+        if filename is not None:
+            return
+    filename, story = report_story(df, other_data, engine, refuel_appendix)
+    filename = os.path.join(save_path, filename)
+    report_doc(filename).build(story, onFirstPage=number_pages(), onLaterPages=number_pages())
+
+
+def report_page_rows(head):
+    # Trip rows that fit on the first page, under the header block, and on
+    # each later page. Every row has the same height, so these two numbers
+    # give all of the table's page breaks.
+    from reportlab.platypus import Frame
+    from reportlab.lib.pagesizes import A4
+    frame = Frame(PAGE_MARGIN, PAGE_MARGIN, A4[0] - 2 * PAGE_MARGIN, A4[1] - 2 * PAGE_MARGIN)
+    width = frame.width - frame.leftPadding - frame.rightPadding
+    height = frame.height - frame.topPadding - frame.bottomPadding
+    # Laid out the way a frame stacks them, no space above the first
+    free = height
+    for i, flowable in enumerate(head):
+        _, h = flowable.wrap(width, free)
+        free -= h + flowable.getSpaceAfter() + (flowable.getSpaceBefore() if i else 0)
+
+    def fit(height):
+        return max(int((height - HEADER_ROW_HEIGHT) // DATA_ROW_HEIGHT), 0)
+    return fit(free), fit(height)
+
+
+def report_chunks(rows, first, later, count):
+    # (first row, end row, first page) of up to count runs of whole pages
+    bounds = [0, min(first, rows)]
+    while bounds[-1] < rows:
+        bounds.append(min(bounds[-1] + later, rows))
+    pages = len(bounds) - 1
+    per_chunk = -(-pages // count)
+    return [
+        (bounds[page], bounds[min(page + per_chunk, pages)], page)
+        for page in range(0, pages, per_chunk)
+    ]
 
-    return result
 
-def raport_generate(df, other_data=[], save_path=""):
+def render_report_chunk(df, other_data, engine, refuel_appendix, start, end, page, first, last):
+    # Pages of one chunk as PDF bytes, numbered from page + 1
+    _, head, table, tail = report_parts(df, other_data, engine, refuel_appendix, rows=slice(start, end))
+    story = (head if first else []) + [table] + (tail if last else [])
+    buffer = io.BytesIO()
+    report_doc(buffer).build(story, onFirstPage=number_pages(page), onLaterPages=number_pages(page))
+    return buffer.getvalue()
+
+
+def raport_generate_parallel(df, other_data, save_path, engine, refuel_appendix, workers):
+    # The trip table is cut at known page breaks, the chunks are laid out
+    # in worker processes and their pages joined in order. Returns None
+    # when the table does not start on the first page.
+    filename, head, _, _ = report_parts(df, other_data, engine, refuel_appendix, rows=slice(0, 0))
+    first, later = report_page_rows(head)
+    if first < 1 or later < 1:
+        return None
+    chunks = report_chunks(len(df.index), first, later, workers)
+    # spawn keeps the workers clear of the GUI process' Qt threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+        parts = list(pool.map(
+            render_report_chunk,
+            *zip(*(
+                (df, other_data, engine, refuel_appendix, start, end, page, i == 0, i == len(chunks) - 1)
+                for i, (start, end, page) in enumerate(chunks)
+            ))
+        ))
+    writer = pdf_writer()()
+    for part in parts:
+        writer.append(io.BytesIO(part))
+    filename = os.path.join(save_path, filename)
+    with open(filename, "wb") as f:
+        writer.write(f)
+    return filename
+
+
+def raport_generate_bundle(reports, save_path="", filename="raporty.pdf", engine="canvas", refuel_appendix=False):
+    # Many reports in one document: the fonts are embedded once and every
+    # report starts on a new page under its own bookmark
+    from reportlab.platypus import PageBreak
+    from raport_canvas import Bookmark
+
+    story = []
+    starts = []
+    for i, (df, other_data) in enumerate(reports):
+        name, section = report_story(df, other_data, engine, refuel_appendix)
+        if story:
+            story.append(PageBreak())
+        story.append(Bookmark(os.path.splitext(name)[0].replace("_", " "), f"report{i}", starts))
+        story.extend(section)
+
+    os.makedirs(save_path, exist_ok=True)
+    filename = os.path.join(save_path, filename)
+    doc = report_doc(filename)
+    # Numbered once the page is drawn, a report's bookmark is on its first page
+    footer = number_pages(starts=starts)
+    doc.afterPage = lambda: footer(doc.canv, doc)
+    doc.build(story, onFirstPage=lambda canv, doc: canv.showOutline())
+    return filename
+
+
+def vehicle_reports(df, drivers={}, start_date=None, end_date=None):
+    # (trips, header data) for every vehicle in df, ready for raport_generate_bundle
+    reports = []
+    for vehicle, rows in df.groupby("Pojazd", observed=True, sort=True):
+        trips = aggregate_trips(rows)
+        if trips.empty:
+            continue
+        reports.append((trips, [
+            vehicle, drivers.get(vehicle, ""),
+            start_date or trips.iloc[0]["Data wyjazdu"],
+            end_date or trips.iloc[-1]["Data wyjazdu"]
+        ]))
+    return reports
+
+
+def report_story(df, other_data=[], engine=None, refuel_appendix=False):
+    filename, head, table, tail = report_parts(df, other_data, engine, refuel_appendix)
+    return filename, head + [table] + tail
+
+
+def report_parts(df, other_data=[], engine=None, refuel_appendix=False, rows=None):
+    # The report as (filename, header block, trip table, what follows the
+    # table). rows limits the table to a slice of df; the header, totals
+    # and appendix still describe all of it.
+    from reportlab.platypus import (
+        Table, TableStyle,
+        Paragraph, Spacer, KeepTogether
+    )
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.lib.pagesizes import A4
+
+    engine = report_engine(engine)
+
     locale.setlocale(locale.LC_TIME, 'pl_PL.UTF-8')
     styles = getSampleStyleSheet()
-    pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuSerif.ttf'))
+    if 'DejaVu' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont('DejaVu', 'DejaVuSerif.ttf'))
 
+    month_names = ["styczeń","luty","marzec","kwiecień","maj",
+        "czerwiec","lipiec","sierpień","wrzesień",
+        "październik","listopad","grudzień"]
+    tacho_start = tacho_end = pd.NA
     if not df.empty:
         first_date = pd.to_datetime(df.iloc[0]["Data wyjazdu"], format="%d.%m.%Y", errors="coerce")
-        month_names = ["styczeń","luty","marzec","kwiecień","maj",
-            "czerwiec","lipiec","sierpień","wrzesień",
-            "październik","listopad","grudzień"]
         month_name = month_names[first_date.month - 1]
         year = first_date.year
-        tacho_start = df.iloc[0]["Stan licznika\nwyjazd"]
-        tacho_end = df.iloc[-1]["Stan licznika\nprzyjazd"]
+        # Readings that did not parse are empty, the first and last known ones count
+        departures = df["Stan licznika\nwyjazd"].dropna()
+        arrivals = df["Stan licznika\nprzyjazd"].dropna()
+        if not departures.empty:
+            tacho_start = departures.iloc[0]
+        if not arrivals.empty:
+            tacho_end = arrivals.iloc[-1]
     else:
         month_name = "_" * 8
         year = "_" * 8
@@ -76,11 +456,14 @@ def raport_generate(df, other_data=[], save_path=""):
         driver_assigned = other_data[1]
         start_date = other_data[2]
         end_date = other_data[3]
-        filename = f"{registration_plate}_{month_name}_{year}.pdf"
-        kilometers = round((tacho_end - tacho_start) / max((
-            datetime.strptime(end_date, "%d.%m.%Y"
-        ) - datetime.strptime(start_date, "%d.%m.%Y")).days, 1), 1)
-        kilometers = str(kilometers).replace('.', ',')
+        filename = report_filename(registration_plate, month_name, year)
+        if pd.isna(tacho_start) or pd.isna(tacho_end):
+            kilometers = ""
+        else:
+            kilometers = round((tacho_end - tacho_start) / max((
+                datetime.strptime(end_date, "%d.%m.%Y"
+            ) - datetime.strptime(start_date, "%d.%m.%Y")).days, 1), 1)
+            kilometers = str(kilometers).replace('.', ',')
     elif len(other_data) > 4:  # manual mode
         registration_plate = other_data[0]
         driver_assigned = other_data[1]
@@ -89,7 +472,7 @@ def raport_generate(df, other_data=[], save_path=""):
         tacho_start = other_data[4]
         tacho_end = other_data[5]
         kilometers = other_data[6]
-        filename = f"{registration_plate}_{month_name}_{year}.pdf"
+        filename = report_filename(registration_plate, month_name, year)
     else:
         filename = "raport.pdf"
         len_of_line = 40
@@ -100,6 +483,7 @@ def raport_generate(df, other_data=[], save_path=""):
         tacho_start = "_" * len_of_line
         tacho_end = "_" * len_of_line
         kilometers = "_" * len_of_line
+    tacho_start, tacho_end = ("" if pd.isna(value) else value for value in (tacho_start, tacho_end))
 
     l_style = ParagraphStyle(
         'left_style',
@@ -151,7 +535,7 @@ def raport_generate(df, other_data=[], save_path=""):
         alignment=1  # center
     )
 
-    header_row_height = 100
+    header_row_height = HEADER_ROW_HEIGHT
     last_col_width = col_widths[4]
 
     last_header_table = Table(
@@ -177,33 +561,44 @@ def raport_generate(df, other_data=[], save_path=""):
         Paragraph("Sprawdzenie stanu technicznego pojazdu", wrap_style)
     ]
 
-    data = [header_row]
+    style = TableStyle([
+        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+        ("ALIGN", (0,0), (-1,-1), "CENTER"),
+        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+        ("BACKGROUND", (0,0), (-1,0), colors.Color(0.95, 0.95, 0.95)),
+        ("BOTTOMPADDING", (0,0), (-1,-1), 6),
+        ("TOPPADDING", (0,0), (-1,-1), 6)
+    ])
 
-    data_row_height = 60
+    data = [header_row]
 
-    for _, row in df.iterrows():
-        last_col_table = Table(
-            [
-                [Paragraph(str(row['Stan licznika\nwyjazd']), wrap_style)],
-                [Paragraph(str(row['Stan licznika\nprzyjazd']), wrap_style)]
-            ],
-            colWidths=last_col_width,
-            rowHeights=[data_row_height/2]*2,
-            style=TableStyle([
-                ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-                ("ALIGN", (0,0), (-1,-1), "CENTER"),
-                ("VALIGN", (0,0), (-1,-1), "MIDDLE")
+    data_row_height = DATA_ROW_HEIGHT
+    table_rows = df if rows is None else df.iloc[rows]
+
+    if engine == "platypus":
+        for _, row in table_rows.iterrows():
+            last_col_table = Table(
+                [
+                    [Paragraph(cell_text(row['Stan licznika\nwyjazd']), wrap_style)],
+                    [Paragraph(cell_text(row['Stan licznika\nprzyjazd']), wrap_style)]
+                ],
+                colWidths=last_col_width,
+                rowHeights=[data_row_height/2]*2,
+                style=TableStyle([
+                    ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+                    ("ALIGN", (0,0), (-1,-1), "CENTER"),
+                    ("VALIGN", (0,0), (-1,-1), "MIDDLE")
+                ])
+            )
+
+            data.append([
+                Paragraph(cell_text(row["Data wyjazdu"]), wrap_style),
+                Paragraph(cell_text(row["Cel trasy"]), wrap_style),
+                Paragraph(cell_text(row["Liczba faktycznie przejechanych kilometrów"]), wrap_style),
+                Paragraph(cell_text(row["Kierowca"]), wrap_style),
+                last_col_table,
+                Paragraph("", wrap_style)
             ])
-        )
-
-        data.append([
-            Paragraph(str(row["Data wyjazdu"]), wrap_style),
-            Paragraph(str(row["Cel trasy"]), wrap_style),
-            Paragraph(str(row["Liczba faktycznie przejechanych kilometrów"]), wrap_style),
-            Paragraph(str(row["Kierowca"]), wrap_style),
-            last_col_table,
-            Paragraph("", wrap_style)
-        ])
 
     title_text = f"EWIDENCJA PRZEBIEGU POJAZDU<br/>za miesiąc {month_name} roku {year}"
     title_style = ParagraphStyle(
@@ -217,20 +612,16 @@ def raport_generate(df, other_data=[], save_path=""):
 
     title_para = Paragraph(title_text, title_style)
     spacer = Spacer(1, 20)
-    os.makedirs(save_path, exist_ok=True)
-    filename = os.path.join(save_path, filename)
-    doc = SimpleDocTemplate(filename, pagesize=A4, rightMargin=20, leftMargin=20, topMargin=20, bottomMargin=20)
-    table = Table(data, colWidths=col_widths, repeatRows=1, rowHeights=[header_row_height] + [data_row_height]*(len(data)-1))
-
-    style = TableStyle([
-        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-        ("ALIGN", (0,0), (-1,-1), "CENTER"),
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-        ("BACKGROUND", (0,0), (-1,0), colors.Color(0.95, 0.95, 0.95)),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 6),
-        ("TOPPADDING", (0,0), (-1,-1), 6)
-    ])
-    table.setStyle(style)
+    if engine == "platypus":
+        table = Table(data, colWidths=col_widths, repeatRows=1, rowHeights=[header_row_height] + [data_row_height]*(len(data)-1))
+        table.setStyle(style)
+    else:
+        from raport_canvas import TripTable
+        header_table = Table(data, colWidths=col_widths, rowHeights=[header_row_height], style=style)
+        table = TripTable.from_frame(
+            header_table, table_rows, col_widths,
+            header_height=header_row_height, row_height=data_row_height
+        )
 
     additional_para = Paragraph(
     "Cotygodniowe i comiesięczne sprawdzenie stanu technicznego",
@@ -275,8 +666,41 @@ def raport_generate(df, other_data=[], save_path=""):
     additional_content = KeepTogether([spacer, additional_para,
     small_spacer, weekly_table, small_spacer, monthly_table])
 
-    doc.build([
-        borderless_table, spacer, title_para,
-        spacer, table, spacer, additional_content
+    head = [borderless_table, spacer, title_para, spacer]
+    tail = [spacer, additional_content]
+
+    if refuel_appendix and "Tankowania" in df.columns and not df.empty:
+        stats = refuel_month_stats(df)
+        refuel_data = [[Paragraph(text, wrap_style) for text in [
+            "Miesiąc", "Liczba tras", "Przejechane kilometry",
+            "Liczba tankowań", "Średnio km między tankowaniami"
+        ]]]
+        for month, row in stats.iterrows():
+            refuel_data.append([
+                f"{month_names[month.month - 1]} {month.year}" if not pd.isna(month) else "",
+                str(row["Liczba tras"]),
+                "" if pd.isna(row["Kilometry"]) else str(row["Kilometry"]),
+                str(row["Tankowania"]),
+                "" if pd.isna(row["Średnio km między tankowaniami"])
+                else str(row["Średnio km między tankowaniami"]).replace('.', ',')
+            ])
+        refuel_table = Table(
+            refuel_data,
+            colWidths=[(A4[0]-40)/5]*5,
+            repeatRows=1,
+            style=TableStyle([
+                ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+                ("FONTNAME", (0,0), (-1,-1), "DejaVu"),
+                ("FONTSIZE", (0,0), (-1,-1), 8),
+                ("ALIGN", (0,0), (-1,-1), "CENTER"),
+                ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+                ("BACKGROUND", (0,0), (-1,0), colors.Color(0.95, 0.95, 0.95)),
+            ])
+        )
+        tail.extend([
+            spacer, Paragraph("Zestawienie tankowań", additional_para.style),
+            small_spacer, refuel_table
         ])
 
+    return filename, head, table, tail
+
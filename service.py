@@ -0,0 +1,310 @@
+# Local report service for tools that can not drive the GUI.
+#
+#   python service.py [--port 8765] [--workers N] [--output DIR]
+#
+#   POST /jobs               CSV (text/csv) or JSON log, returns 202 and a job id.
+#                            Report parameters go in the query string, or as
+#                            keys next to "rows" in a JSON body: vehicle, driver,
+#                            start, end (dd.mm.yyyy), engine, refuel_appendix.
+#   GET  /jobs/<id>          job state and timings
+#   GET  /jobs/<id>/pdf      the finished report
+#   GET  /metrics            queue depth, throughput and latency
+#
+# Binds to 127.0.0.1 only and needs no network access.
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, urlparse
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+MAX_QUEUED_JOBS = 64  # queued or running; further uploads get 503
+MAX_KEPT_JOBS = 1000  # finished jobs kept for polling, oldest are dropped with their PDF
+MAX_UPLOAD_BYTES = 256 * 1024 * 1024
+REPORT_PARAMS = ("vehicle", "driver", "start", "end", "engine", "refuel_appendix")
+
+
+def read_upload(data, content_type):
+    # The log and any parameters that came with it
+    import pandas as pd
+    if content_type == "application/json":
+        payload = json.loads(data)
+        if isinstance(payload, list):
+            return pd.DataFrame(payload), {}
+        params = {key: payload[key] for key in REPORT_PARAMS if key in payload}
+        return pd.DataFrame(payload.get("rows", [])), params
+    return pd.read_csv(io.BytesIO(data)), {}
+
+
+def run_report_job(data, content_type, params, out_dir):
+    # Runs in a pool process: parse, pair trips and write the PDF
+    started = time.time()
+    from file_io import check_log_columns, normalize_log
+    from raport_generation import aggregate_trips, raport_generate
+
+    df, body_params = read_upload(data, content_type)
+    params = {**params, **body_params}
+    check_log_columns(df)
+    df, _ = normalize_log(df)
+    vehicle = str(params.get("vehicle") or "")
+    if vehicle:
+        df = df[df["Pojazd"].astype(str).str.lower() == vehicle.lower()]
+    trips = aggregate_trips(df.drop(columns="_id"))
+    if trips.empty:
+        raise ValueError("No complete trips in the log.")
+
+    other_data = []
+    if vehicle and params.get("driver"):
+        other_data = [
+            vehicle, params["driver"],
+            params.get("start") or trips.iloc[0]["Data wyjazdu"],
+            params.get("end") or trips.iloc[-1]["Data wyjazdu"]
+        ]
+    refuel_appendix = str(params.get("refuel_appendix", "")).lower() in ("1", "true", "tak")
+    # One process per job already, the report is not split further
+    raport_generate(trips, other_data, out_dir, engine=params.get("engine") or None,
+                    refuel_appendix=refuel_appendix, max_workers=1)
+    pdfs = [name for name in os.listdir(out_dir) if name.endswith(".pdf")]
+    if not pdfs:
+        raise ValueError("The report was not written.")
+    return {
+        "path": os.path.join(out_dir, pdfs[0]),
+        "trips": len(trips.index),
+        "started": started,
+        "finished": time.time(),
+    }
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+    return {"mean": round(sum(ordered) / len(ordered), 3), "p50": at(0.5), "p95": at(0.95), "max": at(1.0)}
+
+
+class ReportService:
+    # Jobs go onto a process pool of fixed size; their state lives in
+    # memory and is read by the request handlers under one lock.
+    def __init__(self, workers=None, output_dir=None, max_queued=MAX_QUEUED_JOBS):
+        self.workers = workers or os.cpu_count() or 1
+        # spawn keeps the workers clear of the server's threads
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="fleetlog-reports-")
+        self.max_queued = max_queued
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.completed = 0
+        self.failed = 0
+
+    def pending(self):
+        return sum(1 for job in self.jobs.values() if job["state"] == "pending")
+
+    def submit(self, data, content_type, params):
+        # Returns the job, or None when the queue is full
+        with self.lock:
+            if self.pending() >= self.max_queued:
+                return None
+            job_id = uuid.uuid4().hex
+            out_dir = os.path.join(self.output_dir, job_id)
+            os.makedirs(out_dir)
+            job = {"id": job_id, "state": "pending", "submitted": time.time(), "dir": out_dir}
+            self.jobs[job_id] = job
+        job["future"] = self.pool.submit(run_report_job, data, content_type, params, out_dir)
+        job["future"].add_done_callback(lambda future: self.finished(job_id, future))
+        return job
+
+    def finished(self, job_id, future):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["done"] = time.time()
+            error = future.exception()
+            if error is not None:
+                job["state"] = "failed"
+                job["error"] = str(error)
+                self.failed += 1
+            else:
+                job.update(future.result(), state="done")
+                self.completed += 1
+            self.trim()
+
+    def trim(self):
+        finished = [job for job in self.jobs.values() if job["state"] in ("done", "failed")]
+        for job in sorted(finished, key=lambda job: job["done"])[:max(len(self.jobs) - MAX_KEPT_JOBS, 0)]:
+            del self.jobs[job["id"]]
+            shutil.rmtree(job["dir"], ignore_errors=True)
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            state = self.status_state(job)
+            result = {"id": job_id, "state": state, "submitted": job["submitted"]}
+            if "error" in job:
+                result["error"] = job["error"]
+            if state == "done":
+                result.update(
+                    trips=job["trips"], filename=os.path.basename(job["path"]),
+                    queue_wait_s=round(job["started"] - job["submitted"], 3),
+                    run_s=round(job["finished"] - job["started"], 3),
+                    latency_s=round(job["done"] - job["submitted"], 3),
+                    download=f"/jobs/{job_id}/pdf",
+                )
+            return result
+
+    def report_path(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return None if job is None else job.get("path")
+
+    def metrics(self):
+        with self.lock:
+            now = time.time()
+            done = [job for job in self.jobs.values() if job["state"] == "done"]
+            states = [self.status_state(job) for job in self.jobs.values()]
+            uptime = now - self.started
+            return {
+                "workers": self.workers,
+                "uptime_s": round(uptime, 1),
+                "jobs": {
+                    "queued": states.count("queued"), "running": states.count("running"),
+                    "done": self.completed, "failed": self.failed,
+                },
+                "throughput_per_min": round(60 * self.completed / max(uptime, 1e-9), 2),
+                "throughput_last_min": sum(1 for job in done if now - job["done"] <= 60),
+                "latency_s": percentiles([job["done"] - job["submitted"] for job in done]),
+                "run_s": percentiles([job["finished"] - job["started"] for job in done]),
+                "queue_wait_s": percentiles([job["started"] - job["submitted"] for job in done]),
+            }
+
+    def status_state(self, job):
+        if job["state"] != "pending":
+            return job["state"]
+        future = job.get("future")
+        return "running" if future is not None and future.running() else "queued"
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    service = None  # the ReportService, set by make_server
+
+    def send_json(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route(self):
+        url = urlparse(self.path)
+        return [part for part in url.path.split("/") if part], dict(parse_qsl(url.query))
+
+    def do_POST(self):
+        parts, query = self.route()
+        if parts != ["jobs"]:
+            self.send_json(404, {"error": "Not found."})
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.send_json(411, {"error": "Content-Length is required."})
+            return
+        if not length.strip().isdecimal():
+            self.send_json(400, {"error": "Content-Length must be a number of bytes."})
+            return
+        length = int(length)
+        if length > MAX_UPLOAD_BYTES:
+            self.send_json(413, {"error": f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes."})
+            return
+        data = self.rfile.read(length)
+        content_type = (self.headers.get("Content-Type") or "text/csv").split(";")[0].strip()
+        params = {key: value for key, value in query.items() if key in REPORT_PARAMS}
+        from raport_generation import REPORT_ENGINES
+        if params.get("engine") and params["engine"] not in REPORT_ENGINES:
+            self.send_json(400, {"error": f"engine must be one of: {', '.join(REPORT_ENGINES)}."})
+            return
+        job = self.service.submit(data, content_type, params)
+        if job is None:
+            self.send_json(503, {"error": "Too many queued jobs, try again later."})
+            return
+        self.send_json(202, {"id": job["id"], "status": f"/jobs/{job['id']}", "download": f"/jobs/{job['id']}/pdf"})
+
+    def do_GET(self):
+        parts, _ = self.route()
+        if parts == ["metrics"]:
+            self.send_json(200, self.service.metrics())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            status = self.service.status(parts[1])
+            if status is None:
+                self.send_json(404, {"error": "Unknown job."})
+            else:
+                self.send_json(200, status)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "pdf":
+            self.send_report(parts[1])
+        else:
+            self.send_json(404, {"error": "Not found."})
+
+    def send_report(self, job_id):
+        status = self.service.status(job_id)
+        if status is None:
+            self.send_json(404, {"error": "Unknown job."})
+            return
+        if status["state"] != "done":
+            self.send_json(409, {"error": f"Job is {status['state']}.", **status})
+            return
+        path = self.service.report_path(job_id)
+        with open(path, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(data)))
+        filename = os.path.basename(path)
+        fallback = filename.encode("ascii", "replace").decode("ascii").replace('"', "")
+        self.send_header(
+            "Content-Disposition", f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+        )
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(port=SERVICE_PORT, workers=None, output_dir=None):
+    service = ReportService(workers, output_dir)
+    handler = type("Handler", (ReportRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((SERVICE_HOST, port), handler)
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local report generation service")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Directory for finished reports")
+    args = parser.parse_args()
+    server = make_server(args.port, args.workers, args.output)
+    print(f"Serving reports on http://{SERVICE_HOST}:{server.server_address[1]} "
+          f"with {server.service.workers} workers, output in {server.service.output_dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
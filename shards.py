@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from file_io import compact_log, refuel_flags
+from raport_generation import pair_trips
+
+SHARD_MIN_ROWS = 2_000_000  # a spawned worker takes about as long to start as pairing this many rows
+SHARDS_PER_WORKER = 4  # a few shards each, so one busy vehicle does not hold up the rest
+CANCEL_POLL_SECONDS = 0.1
+
+
+def share_columns(columns):
+    # Copies the arrays into one shared memory block. Workers rebuild them
+    # as views from the layout, nothing but the layout is pickled.
+    size = sum(values.nbytes for values in columns.values())
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    layout = {}
+    offset = 0
+    for name, values in columns.items():
+        view = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf, offset=offset)
+        view[:] = values
+        layout[name] = (values.dtype.str, offset, len(values))
+        offset += values.nbytes
+    del view
+    return block, layout
+
+
+def column_views(block, layout, lo, hi):
+    return {
+        name: np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)[lo:hi]
+        for name, (dtype, offset, length) in layout.items()
+    }
+
+
+def shard_ranges(vehicle_codes, workers):
+    # Shards of vehicle sorted rows, each a list of per vehicle row ranges.
+    # A vehicle is never split, its trips depend on the rows before them.
+    n = len(vehicle_codes)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(vehicle_codes)) + 1]).tolist()
+    ranges = list(zip(starts, starts[1:] + [n])) if n else []
+    target = max(n // (workers * SHARDS_PER_WORKER), 1)
+    shards, shard, rows = [], [], 0
+    for lo, hi in ranges:
+        shard.append((lo, hi))
+        rows += hi - lo
+        if rows >= target:
+            shards.append(shard)
+            shard, rows = [], 0
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def aggregate_shard(block_name, layout, categories, ranges):
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        parts = []
+        for lo, hi in ranges:
+            views = column_views(block, layout, lo, hi)
+            df = pd.DataFrame({
+                "Data i Godzina": pd.Series(views["Data i Godzina"], copy=False),
+                "Cel Trasy": pd.Categorical.from_codes(views["Cel Trasy"], categories["Cel Trasy"]),
+                "Stan Licznika": pd.arrays.IntegerArray(views["Stan Licznika"], views["Stan Licznika_mask"]),
+                "Kierowca": pd.Categorical.from_codes(views["Kierowca"], categories["Kierowca"]),
+                "Tankowanie": pd.Series(views["Tankowanie"], copy=False),
+            }, copy=False)
+            trips, _ = pair_trips(df)
+            parts.append(trips)
+            del df, views
+        return pd.concat(parts, ignore_index=True)
+    finally:
+        block.close()
+
+
+def is_cancelled(cancelled):
+    return cancelled is not None and cancelled.is_set()
+
+
+def aggregate_trips_sharded(df, max_workers=None, cancelled=None):
+    # aggregate_trips with the log split by vehicle over a process pool.
+    # Trips are paired per vehicle and come back grouped by vehicle, the
+    # typed columns reach the workers through shared memory. Returns None
+    # once cancelled (a threading.Event) is set: shards not started yet
+    # are dropped and running ones are not waited for.
+    df = compact_log(df)
+    workers = max_workers or os.cpu_count() or 1
+    vehicles = pd.Categorical(df["Pojazd"]).codes
+    times = df["Data i Godzina"].to_numpy()
+    order = np.lexsort((times, vehicles))
+
+    odometer = df["Stan Licznika"].array
+    columns = {
+        "Data i Godzina": times[order],
+        "Cel Trasy": df["Cel Trasy"].cat.codes.to_numpy()[order],
+        "Kierowca": df["Kierowca"].cat.codes.to_numpy()[order],
+        "Stan Licznika": odometer.to_numpy(dtype="int64", na_value=0)[order],
+        "Stan Licznika_mask": odometer.isna()[order],
+        "Tankowanie": refuel_flags(df["Tankowanie"])[order] if "Tankowanie" in df.columns
+        else np.zeros(len(order), dtype=bool),
+    }
+    categories = {
+        "Cel Trasy": df["Cel Trasy"].cat.categories,
+        "Kierowca": df["Kierowca"].cat.categories,
+    }
+    shards = shard_ranges(vehicles[order], workers)
+
+    block, layout = share_columns(columns)
+    del columns
+    try:
+        if workers == 1 or len(shards) == 1 or len(df.index) < SHARD_MIN_ROWS:
+            parts = []
+            for ranges in shards:
+                if is_cancelled(cancelled):
+                    return None
+                parts.append(aggregate_shard(block.name, layout, categories, ranges))
+        else:
+            # spawn keeps the workers clear of the GUI process' Qt threads
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context)
+            try:
+                futures = [
+                    pool.submit(aggregate_shard, block.name, layout, categories, ranges)
+                    for ranges in shards
+                ]
+                pending = set(futures)
+                while pending and not is_cancelled(cancelled):
+                    _, pending = wait(pending, timeout=CANCEL_POLL_SECONDS)
+                if pending:
+                    return None
+                parts = [future.result() for future in futures]
+            finally:
+                pool.shutdown(wait=not is_cancelled(cancelled), cancel_futures=True)
+    finally:
+        block.close()
+        block.unlink()
+
+    if not parts:
+        trips, _ = pair_trips(df.iloc[:0])
+        return trips
+    return pd.concat(parts, ignore_index=True)
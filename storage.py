@@ -0,0 +1,388 @@
+from PySide6.QtCore import (
+    Qt, QAbstractTableModel
+)
+import sqlite3
+from collections import OrderedDict
+import pandas as pd
+
+from file_io import DATE_FORMAT, REQUIRED_COLUMNS, compact_log
+from backend import format_value
+from history import UndoHistory, DEFAULT_UNDO_LIMIT
+
+STORE_FILENAME = "fleet_log.sqlite"
+STORE_DATE_FORMAT = "%Y-%m-%d %H:%M"  # sorts like the timestamps it holds
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class LogStore:
+    # Log rows in a local SQLite file. The (Pojazd, Data i Godzina) index
+    # turns a vehicle and date range into an index range scan, so queries
+    # cost the same however much history is stored.
+    def __init__(self, path):
+        self.path = path
+        self._vehicles = None
+        self.connection = sqlite3.connect(path)
+        columns = ", ".join(
+            f"{quote(c)} {'INTEGER' if c == 'Stan Licznika' else 'TEXT'}" for c in REQUIRED_COLUMNS
+        )
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS log (_id INTEGER PRIMARY KEY, {columns});
+            CREATE INDEX IF NOT EXISTS log_vehicle_time
+                ON log ("Pojazd" COLLATE NOCASE, "Data i Godzina");
+            CREATE UNIQUE INDEX IF NOT EXISTS log_row
+                ON log ({", ".join(quote(c) for c in REQUIRED_COLUMNS)});
+            CREATE TABLE IF NOT EXISTS longest (name TEXT PRIMARY KEY, value);
+        """)
+        if self.connection.execute("SELECT COUNT(*) FROM longest").fetchone()[0] == 0:
+            # Stores written before the table existed are scanned once
+            with self.connection:
+                for c in REQUIRED_COLUMNS:
+                    row = self.connection.execute(
+                        f"SELECT {quote(c)} FROM log ORDER BY LENGTH({quote(c)}) DESC LIMIT 1"
+                    ).fetchone()
+                    self.connection.execute(
+                        "INSERT INTO longest VALUES (?, ?)", (c, None if row is None else row[0])
+                    )
+
+    def close(self):
+        self.connection.close()
+
+    def _to_rows(self, df):
+        df = compact_log(df)
+        out = pd.DataFrame({c: df[c].astype(object) for c in REQUIRED_COLUMNS})
+        out["Data i Godzina"] = df["Data i Godzina"].dt.strftime(STORE_DATE_FORMAT).astype(object)
+        return out.astype(object).where(out.notna(), None)
+
+    def _remember_longest(self, values):
+        # Raise the kept longest value of each column a new value outgrows.
+        # Edits that shorten a value leave the kept one, column widths only
+        # come out a little wide.
+        stored = dict(self.connection.execute("SELECT name, value FROM longest"))
+        for c, value in values.items():
+            if value is not None and (stored.get(c) is None or len(str(value)) > len(str(stored[c]))):
+                self.connection.execute("UPDATE longest SET value = ? WHERE name = ?", (value, c))
+
+    def _to_frame(self, rows):
+        df = pd.DataFrame(rows, columns=["_id"] + REQUIRED_COLUMNS)
+        df["Data i Godzina"] = pd.to_datetime(df["Data i Godzina"], format=STORE_DATE_FORMAT)
+        df = compact_log(df)
+        return df[REQUIRED_COLUMNS + ["_id"]]
+
+    def import_log(self, df):
+        # Rows already stored are skipped by the unique row index
+        placeholders = ", ".join("?" * len(REQUIRED_COLUMNS))
+        names = ", ".join(quote(c) for c in REQUIRED_COLUMNS)
+        before = self.count()
+        self._vehicles = None
+        rows = self._to_rows(df)
+        longest = {}
+        for c in REQUIRED_COLUMNS:
+            lengths = rows[c].dropna().astype(str).str.len()
+            if len(lengths):
+                longest[c] = rows.at[lengths.idxmax(), c]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR IGNORE INTO log ({names}) VALUES ({placeholders})",
+                rows.itertuples(index=False, name=None)
+            )
+            self._remember_longest(longest)
+        return self.count() - before
+
+    def vehicles(self):
+        if self._vehicles is None:
+            self._vehicles = [r[0] for r in self.connection.execute(
+                'SELECT DISTINCT "Pojazd" FROM log WHERE "Pojazd" IS NOT NULL'
+            )]
+        return self._vehicles
+
+    def is_vehicle(self, text):
+        return bool(text) and text.lower() in (v.lower() for v in self.vehicles())
+
+    def where(self, text="", start=None, end=None):
+        # start and end are datetime.date values, both inclusive
+        clauses, params = [], []
+        if text:
+            if self.is_vehicle(text):
+                clauses.append('"Pojazd" = ? COLLATE NOCASE')
+                params.append(text)
+            else:
+                # Wildcards the user typed match themselves
+                clauses.append("(" + " OR ".join(
+                    f"{quote(c)} LIKE ? ESCAPE '\\'" for c in ("Pojazd", "Kierowca", "Cel Trasy")
+                ) + ")")
+                escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.extend([f"%{escaped}%"] * 3)
+        if start is not None and end is not None:
+            clauses.append('"Data i Godzina" >= ? AND "Data i Godzina" < ?')
+            params.extend([
+                start.strftime("%Y-%m-%d"),
+                (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+            ])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, text="", start=None, end=None):
+        where, params = self.where(text, start, end)
+        return self.connection.execute(f"SELECT COUNT(*) FROM log{where}", params).fetchone()[0]
+
+    def query(self, text="", start=None, end=None, order_by="_id", limit=-1, offset=0):
+        where, params = self.where(text, start, end)
+        names = ", ".join(["_id"] + [quote(c) for c in REQUIRED_COLUMNS])
+        rows = self.connection.execute(
+            f"SELECT {names} FROM log{where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return self._to_frame(rows)
+
+    def vehicle_range(self, vehicle, start, end):
+        # One vehicle over a date range straight off the index, in time order
+        return self.query(vehicle, start, end, order_by='"Data i Godzina", _id')
+
+    def date_span(self, text="", start=None, end=None):
+        where, params = self.where(text, start, end)
+        low, high = self.connection.execute(
+            f'SELECT MIN("Data i Godzina"), MAX("Data i Godzina") FROM log{where}', params
+        ).fetchone()
+        if low is None:
+            return None, None
+        return (pd.to_datetime(low, format=STORE_DATE_FORMAT),
+                pd.to_datetime(high, format=STORE_DATE_FORMAT))
+
+    def longest_values(self):
+        # Per column the stored value with the most characters, kept up to
+        # date on every write so opening a store needs no table scan
+        stored = dict(self.connection.execute("SELECT name, value FROM longest"))
+        values = []
+        for c in REQUIRED_COLUMNS:
+            value = stored.get(c)
+            if c == "Data i Godzina" and value is not None:
+                value = pd.to_datetime(value, format=STORE_DATE_FORMAT)
+            values.append(format_value(value))
+        return values
+
+    def update_values(self, changes):
+        # (row id, column, value) written in one transaction. An edit that
+        # makes a row repeat a stored one raises sqlite3.IntegrityError and
+        # none of the changes are kept.
+        with self.connection:
+            for row_id, col_name, value in changes:
+                if isinstance(value, pd.Timestamp):
+                    value = value.strftime(STORE_DATE_FORMAT)
+                elif value is not None and pd.isna(value):
+                    value = None
+                elif hasattr(value, "item"):
+                    value = value.item()
+                if col_name == "Pojazd":
+                    self._vehicles = None
+                self.connection.execute(
+                    f"UPDATE log SET {quote(col_name)} = ? WHERE _id = ?", (value, int(row_id))
+                )
+                self._remember_longest({col_name: value})
+
+
+class SqlLogModel(QAbstractTableModel):
+    # Table model over a LogStore. Rows are fetched a page at a time and
+    # the proxy's vehicle and date filters are pushed into the SQL query.
+    PAGE_SIZE = 500
+    writes_through = True  # edits and appended rows go straight to the store
+    edits_rows = False  # single cell edits only, the window hides the rest
+    CACHED_PAGES = 8
+
+    def __init__(self, store, locked=False, undo_limit=DEFAULT_UNDO_LIMIT):
+        super().__init__()
+        self.store = store
+        self._locked = locked
+        self._filter = ("", None, None)
+        self._order_by = "_id"
+        self._pages = OrderedDict()
+        self._history = UndoHistory(undo_limit)
+        self.parse_errors = {}
+        self._row_count = self.store.count()
+
+    def set_locked(self, locked: bool):
+        self._locked = locked
+
+    def is_locked(self):
+        return self._locked
+
+    def set_query_filter(self, text="", start=None, end=None):
+        self.beginResetModel()
+        self._filter = (text, start, end)
+        self._reload()
+        self.endResetModel()
+
+    def _reload(self):
+        self._pages.clear()
+        self._row_count = self.store.count(*self._filter)
+
+    def _page(self, page):
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+        frame = self.store.query(
+            *self._filter, order_by=self._order_by,
+            limit=self.PAGE_SIZE, offset=page * self.PAGE_SIZE
+        )
+        self._pages[page] = frame
+        if len(self._pages) > self.CACHED_PAGES:
+            self._pages.popitem(last=False)
+        return frame
+
+    def rowCount(self, parent=None):
+        return self._row_count
+
+    def columnCount(self, parent=None):
+        return len(REQUIRED_COLUMNS)
+
+    def typed_value(self, row, col):
+        page = self._page(row // self.PAGE_SIZE)
+        return page.iat[row % self.PAGE_SIZE, col]
+
+    def row_id(self, row):
+        page = self._page(row // self.PAGE_SIZE)
+        return page["_id"].iat[row % self.PAGE_SIZE]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return format_value(self.typed_value(index.row(), index.column()))
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return REQUIRED_COLUMNS[section]
+        return str(section)
+
+    def flags(self, index):
+        base_flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if not self._locked:
+            base_flags |= Qt.ItemIsEditable
+        return base_flags
+
+    def _write(self, changes):
+        try:
+            self.store.update_values(changes)
+        finally:
+            self._pages.clear()
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if self._locked or not index.isValid() or role != Qt.EditRole:
+            return False
+        col_name = REQUIRED_COLUMNS[index.column()]
+        old_value = self.typed_value(index.row(), index.column())
+        if isinstance(value, str) and value == format_value(old_value):
+            return False
+        try:
+            value = self._coerce(col_name, value)
+        except (TypeError, ValueError) as e:
+            print(f"Rejected edit: {e}")
+            return False
+        row_id = self.row_id(index.row())
+        try:
+            self._write([(row_id, col_name, value)])
+        except sqlite3.IntegrityError:
+            print("Rejected edit: the row would repeat a stored row")
+            return False
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+        self._history.push(('edit', col_name, [row_id], [old_value], [value]))
+        return True
+
+    def _coerce(self, col_name, value):
+        if isinstance(value, str) and value.strip() == "":
+            return None
+        if col_name == "Data i Godzina":
+            parsed = pd.to_datetime(value, format=DATE_FORMAT, errors="coerce")
+            if parsed is pd.NaT:
+                raise ValueError(f"Expected a date like 01.03.2025 08:00, got {value!r}")
+            return parsed
+        if col_name == "Stan Licznika":
+            return int(str(value).replace(" ", ""))
+        return value
+
+    def _changes(self, action, undo=True):
+        if action[0] == 'group':
+            return [
+                change for child in (reversed(action[1]) if undo else action[1])
+                for change in self._changes(child, undo)
+            ]
+        _, col_name, row_ids, old_values, new_values = action
+        return [(row_id, col_name, value) for row_id, value in zip(row_ids, old_values if undo else new_values)]
+
+    def _apply_action(self, action, undo=True):
+        # All of the action or, when a row would repeat a stored one, none
+        try:
+            self._write(self._changes(action, undo))
+        except sqlite3.IntegrityError:
+            print(f"Could not {'undo' if undo else 'redo'}: a row would repeat a stored row")
+            return False
+        self.dataChanged.emit(
+            self.index(0, 0), self.index(max(self._row_count - 1, 0), self.columnCount() - 1)
+        )
+        return True
+
+    def undo(self):
+        action = None if self._locked else self._history.pop_undo()
+        if action is None:
+            return
+        if self._apply_action(action, undo=True):
+            self._history.push_redo(action)
+        else:
+            self._history.push_undo(action)
+
+    def redo(self):
+        action = None if self._locked else self._history.pop_redo()
+        if action is None:
+            return
+        if self._apply_action(action, undo=False):
+            self._history.push_undo(action)
+        else:
+            self._history.push_redo(action)
+
+    def append_rows(self, rows, parse_errors=()):
+        if rows is None or rows.empty:
+            return
+        self.beginResetModel()
+        self.store.import_log(rows)
+        self._reload()
+        self.endResetModel()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0:
+            return
+        direction = "DESC" if order == Qt.DescendingOrder else "ASC"
+        self.layoutAboutToBeChanged.emit()
+        self._order_by = f"{quote(REQUIRED_COLUMNS[column])} {direction}, _id"
+        self._pages.clear()
+        self.layoutChanged.emit()
+
+    def vehicle_frame(self):
+        # The filtered rows in time order straight off the (Pojazd, Data i
+        # Godzina) index when the filter is one plate, for Generate; None
+        # when it is not
+        text, start, end = self._filter
+        if not self.store.is_vehicle(text):
+            return None
+        return self.store.vehicle_range(text, start, end).drop(columns="_id")
+
+    def rows_frame(self, rows):
+        # Proxy rows are all rows here, the filter already ran in SQL
+        frame = self.store.query(*self._filter, order_by=self._order_by)
+        return frame.iloc[rows].drop(columns="_id").reset_index(drop=True)
+
+    def to_frame(self):
+        return self.store.query(order_by="_id")
+
+    def parse_error_list(self):
+        return []
+
+    def export_frame(self):
+        return self.to_frame()
+
+    def longest_values(self):
+        return self.store.longest_values()
+
+    def date_span(self, rows):
+        return self.store.date_span(*self._filter)
@@ -0,0 +1,257 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import QCoreApplication, QDate, Qt
+
+from conftest import LOG_PATH
+from backend import FleetSummary, IDFilterProxyModel, PandasModel, PartitionIndex
+from file_io import load_log
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def test_fleet_summary_drops_deleted_vehicle():
+    df, parse_errors = load_log(LOG_PATH)
+    model = PandasModel(df, parse_errors=parse_errors)
+    summary = FleetSummary(model)
+    updates = []
+    summary.add_listener(lambda: updates.append(1))
+    vehicle = model._df["Pojazd"].dropna().iloc[0]
+    assert vehicle in summary.vehicles.index
+
+    # Every other row of the vehicle: many runs, one update
+    rows = np.flatnonzero((model._df["Pojazd"] == vehicle).to_numpy())
+    model.delete_rows(rows[::2])
+    model.delete_rows(np.flatnonzero((model._df["Pojazd"] == vehicle).to_numpy()))
+    app.processEvents()
+    assert len(updates) == 1
+
+    assert model.rowCount() == len(df.index) - len(rows)
+    assert vehicle not in summary.vehicles.index
+    assert vehicle not in summary.vehicle_months.index.get_level_values(0)
+
+
+def test_inbox_offsets_wait_for_a_save(tmp_path):
+    from PySide6.QtCore import QSettings
+    from backend import InboxWatcher
+
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    lines = open(LOG_PATH, encoding="utf-8").read().splitlines(keepends=True)
+    old = inbox / "old.csv"
+    old.write_text("".join(lines[:4]), encoding="utf-8")
+    settings = QSettings(str(tmp_path / "settings.ini"), QSettings.IniFormat)
+    target = str(tmp_path / "log.csv")
+
+    def open_log():
+        df, _ = load_log(LOG_PATH)
+        model = PandasModel(df.iloc[:5].reset_index(drop=True))
+        return model, InboxWatcher(str(inbox), model, settings, target)
+
+    # Rows already in the folder are not the log's
+    model, watcher = open_log()
+    assert model.rowCount() == 5
+
+    with open(old, "a", encoding="utf-8") as f:
+        f.write(lines[4])
+    (inbox / "new.csv").write_text("".join(lines[:1] + lines[5:7]), encoding="utf-8")
+    watcher.scan()
+    assert model.rowCount() == 8
+    watcher.stop()
+
+    # Closed without saving: the rows are read again
+    model, watcher = open_log()
+    assert model.rowCount() == 8
+    watcher.commit(watcher.snapshot(), target)
+    watcher.stop()
+
+    model, watcher = open_log()
+    assert model.rowCount() == 5
+    watcher.stop()
+
+
+def test_inbox_skips_files_without_log_columns(tmp_path):
+    from PySide6.QtCore import QSettings
+    from backend import InboxWatcher
+
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    lines = open(LOG_PATH, encoding="utf-8").read().splitlines(keepends=True)
+    df, _ = load_log(LOG_PATH)
+    model = PandasModel(df.iloc[:5].reset_index(drop=True))
+    settings = QSettings(str(tmp_path / "settings.ini"), QSettings.IniFormat)
+    watcher = InboxWatcher(str(inbox), model, settings, str(tmp_path / "log.csv"))
+
+    (inbox / "other.csv").write_text("a,b\n1,2\n", encoding="utf-8")
+    (inbox / "new.csv").write_text("".join(lines[:3]), encoding="utf-8")
+    watcher.scan()
+    assert model.rowCount() == 7
+    assert watcher.accepted == {str(inbox / "other.csv"): False, str(inbox / "new.csv"): True}
+    watcher.stop()
+
+
+def test_fleet_summary_stops_following_without_listeners():
+    df, _ = load_log(LOG_PATH)
+    model = PandasModel(df)
+    summary = FleetSummary(model)
+    listener = lambda: None
+    summary.add_listener(listener)
+    summary.remove_listener(listener)
+    before = summary.vehicles.copy()
+    vehicle = model._df["Pojazd"].dropna().iloc[0]
+    model.delete_rows(np.flatnonzero((model._df["Pojazd"] == vehicle).to_numpy()))
+    app.processEvents()
+    assert summary.vehicles.equals(before)
+
+    # A new window gets figures of the current rows
+    summary.add_listener(listener)
+    assert vehicle not in summary.vehicles.index
+
+
+def log_with_gaps():
+    # Every seventh row without a plate, every eleventh without a date
+    df, _ = load_log(LOG_PATH)
+    df.loc[df.index % 7 == 3, "Pojazd"] = np.nan
+    df.loc[df.index % 11 == 5, "Data i Godzina"] = pd.NaT
+    return df
+
+
+def scanned_ids(df, text="", start=None, end=None):
+    keep = pd.Series(True, index=df.index)
+    if text:
+        keep &= df["Pojazd"].astype(str).str.lower().str.contains(text.lower(), regex=False) \
+            & df["Pojazd"].notna()
+    if start is not None:
+        dates = df["Data i Godzina"].dt.date
+        keep &= df["Data i Godzina"].isna() | ((dates >= start) & (dates <= end))
+    return sorted(df.loc[keep, "_id"])
+
+
+def proxy_ids(proxy):
+    model = proxy.sourceModel()
+    rows = [proxy.mapToSource(proxy.index(row, 0)).row() for row in range(proxy.rowCount())]
+    return sorted(model.to_frame()["_id"].iloc[rows])
+
+
+MARCH = (datetime.date(2025, 3, 1), datetime.date(2025, 3, 31))
+
+
+def test_partition_index_matches_a_scan():
+    df = log_with_gaps()
+    index = PartitionIndex(df)
+    for text, (start, end) in [("", (None, None)), ("", MARCH), ("honda civic", (None, None)),
+                               ("BMW M3", MARCH), ("honda civic", (datetime.date(2025, 4, 1),) * 2)]:
+        assert sorted(index.select(text, start, end)) == scanned_ids(df, text, start, end)
+    assert index.select("Kowalska") is None
+
+
+def test_filtered_proxy_follows_row_changes():
+    model = PandasModel(log_with_gaps())
+    proxy = IDFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_date_range(QDate(2025, 3, 1), QDate(2025, 3, 31))
+    assert proxy_ids(proxy) == scanned_ids(model.to_frame(), "", *MARCH)
+
+    # Scattered runs, undone and redone, and an edit that moves a row out of March
+    model.delete_rows(np.arange(0, model.rowCount(), 3))
+    assert proxy_ids(proxy) == scanned_ids(model.to_frame(), "", *MARCH)
+    model.undo()
+    assert proxy_ids(proxy) == scanned_ids(model.to_frame(), "", *MARCH)
+    model.redo()
+    row = int(np.flatnonzero(model.to_frame()["Data i Godzina"].dt.month.eq(3))[0])
+    model.setData(model.index(row, 2), "01.05.2025 08:00")
+    assert proxy_ids(proxy) == scanned_ids(model.to_frame(), "", *MARCH)
+
+    proxy.set_filter_text("BMW M3")
+    model.undo()
+    model.undo()
+    assert proxy_ids(proxy) == scanned_ids(model.to_frame(), "BMW M3", *MARCH)
+
+
+def test_multi_run_delete_and_duplicate_keep_views_consistent():
+    from PySide6.QtCore import qInstallMessageHandler
+    from PySide6.QtTest import QAbstractItemModelTester
+
+    df, _ = load_log(LOG_PATH)
+    model = PandasModel(df)
+    warnings = []
+    previous = qInstallMessageHandler(lambda mode, context, message: warnings.append(message))
+    try:
+        tester = QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning)
+        removed = []
+        model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last, model.rowCount())))
+        rows = [0, 1, 2, 10, 11, 40, 100, len(df.index) - 1]
+        model.delete_rows(rows)
+        expected = df.drop(index=rows).reset_index(drop=True)
+        pd.testing.assert_frame_equal(model.to_frame(), expected)
+        # One signal per run, from the bottom, each seeing the rows left so far
+        assert [(first, last) for first, last, _ in removed] == [
+            (len(df.index) - 1, len(df.index) - 1), (100, 100), (40, 40), (10, 11), (0, 2)
+        ]
+        assert [count for _, _, count in removed][-1] == len(expected.index)
+        model.undo()
+        pd.testing.assert_frame_equal(model.to_frame(), df)
+
+        model.duplicate_rows([3, 4, 20])
+        frame = model.to_frame()
+        assert len(frame.index) == len(df.index) + 3
+        columns = list(df.columns.drop("_id"))
+        for source, copy in [(3, 5), (4, 6), (22, 23)]:
+            assert frame.iloc[copy][columns].equals(frame.iloc[source][columns])
+        assert frame["_id"].is_unique
+        model.undo()
+        pd.testing.assert_frame_equal(model.to_frame(), df)
+        del tester
+    finally:
+        qInstallMessageHandler(previous)
+    assert not warnings
+
+
+def test_sort_puts_missing_values_last_both_ways():
+    df, _ = load_log(LOG_PATH)
+    df = df.iloc[:40].reset_index(drop=True)
+    for c in df.columns.drop("_id"):
+        df.loc[[3, 17], c] = None
+    model = PandasModel(df)
+    columns = list(df.columns.drop("_id"))
+    for col, name in enumerate(columns):
+        for order in (Qt.AscendingOrder, Qt.DescendingOrder):
+            model.sort(col, order)
+            values = model._df[name]
+            assert values.iloc[-2:].isna().all()
+            present = values.iloc[:-2]
+            if not pd.api.types.is_numeric_dtype(present) and not pd.api.types.is_datetime64_any_dtype(present):
+                present = present.astype(str)
+            present = pd.Series(list(present))
+            if order == Qt.AscendingOrder:
+                assert present.is_monotonic_increasing
+            else:
+                assert present.is_monotonic_decreasing
+
+
+def test_find_replace_changes_matching_cells_only():
+    df, _ = load_log(LOG_PATH)
+    model = PandasModel(df)
+    columns = list(df.columns.drop("_id"))
+    col = columns.index("Kierowca")
+    driver = str(df["Kierowca"].iloc[0])
+    rows = np.flatnonzero((df["Kierowca"] == driver).to_numpy())[:3]
+    others = list(np.flatnonzero((df["Kierowca"] != driver).to_numpy())[:5])
+
+    changed = model.find_replace(col, driver, "Jan Nowak", rows=list(rows) + others)
+    assert changed == len(rows)
+    frame = model.to_frame()
+    assert (frame["Kierowca"].iloc[rows] == "Jan Nowak").all()
+    untouched = frame["Kierowca"].drop(index=rows).astype(str)
+    assert untouched.equals(df["Kierowca"].drop(index=rows).astype(str))
+
+    # Typed columns are replaced in their displayed text
+    odometer = columns.index("Stan Licznika")
+    row = int(np.flatnonzero((df["Stan Licznika"] > 0).to_numpy())[0])
+    assert model.find_replace(odometer, r"^(\d+)$", r"\g<1>0", regex=True, rows=[row]) == 1
+    assert model.to_frame()["Stan Licznika"].iloc[row] == df["Stan Licznika"].iloc[row] * 10
+
+    model.undo()
+    model.undo()
+    pd.testing.assert_frame_equal(model.to_frame()[columns], df[columns], check_categorical=False)
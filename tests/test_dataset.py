@@ -0,0 +1,97 @@
+import pandas as pd
+
+from conftest import LOG_PATH
+from dataset import partition_path, read_dataset, read_manifest, write_dataset
+from file_io import load_log
+
+
+def partition_rows(root):
+    return {path: entry["rows"] for path, entry in read_manifest(root).items()}
+
+
+def test_vehicle_edit_merges_into_other_partition(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    write_dataset(df, tmp_path)
+    before = partition_rows(tmp_path)
+
+    honda, _, paths = read_dataset(tmp_path, "Honda Civic", pd.Timestamp("2025-03-01").date(),
+                                   pd.Timestamp("2025-03-31").date())
+    honda["Pojazd"] = honda["Pojazd"].cat.add_categories(["BMW M3"])
+    honda.loc[honda["Data i Godzina"].notna().idxmax(), "Pojazd"] = "BMW M3"
+    exact, merged = write_dataset(honda, tmp_path, replace=paths)
+
+    after = partition_rows(tmp_path)
+    honda_march = partition_path("Honda Civic", 2025, 3)
+    assert after["BMW M3/2025/03/log.csv"] == before["BMW M3/2025/03/log.csv"] + 1
+    assert after[honda_march] == before[honda_march] - 1
+    assert sum(after.values()) == sum(before.values())
+    assert "BMW M3/2025/03/log.csv" not in exact
+    assert list(merged) == ["BMW M3/2025/03/log.csv"]
+    whole, _, _ = read_dataset(tmp_path)
+    assert len(whole.index) == len(df.index)
+
+
+def test_month_edit_merges_into_other_partition(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    write_dataset(df, tmp_path)
+    before = partition_rows(tmp_path)
+
+    march, _, paths = read_dataset(tmp_path, "BMW M3", pd.Timestamp("2025-03-01").date(),
+                                   pd.Timestamp("2025-03-31").date())
+    moved = march["Data i Godzina"].notna().idxmax()
+    march.loc[moved, "Data i Godzina"] = march.loc[moved, "Data i Godzina"] + pd.DateOffset(months=1)
+    write_dataset(march, tmp_path, replace=paths)
+
+    after = partition_rows(tmp_path)
+    assert after["BMW M3/2025/04/log.csv"] == before["BMW M3/2025/04/log.csv"] + 1
+    assert after["BMW M3/2025/03/log.csv"] == before["BMW M3/2025/03/log.csv"] - 1
+
+    # Saving the same rows again does not repeat them
+    write_dataset(march, tmp_path, replace=paths)
+    assert partition_rows(tmp_path) == after
+
+
+def test_unread_date_is_kept_in_dataset(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    df.loc[0, "Data i Godzina"] = pd.NaT
+    vehicle = df.loc[0, "Pojazd"]
+    errors = [(int(df.loc[0, "_id"]), "Data i Godzina", "jutro")]
+    write_dataset(df, tmp_path, parse_errors=errors)
+    write_dataset(df.iloc[:1], tmp_path, parse_errors=errors)
+
+    stored = pd.read_csv(tmp_path / partition_path(vehicle, 0, 0))
+    assert stored["Data i Godzina"].tolist() == ["jutro"]
+
+
+def test_edit_after_merge_replaces_the_merged_row(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    write_dataset(df, tmp_path)
+    before = partition_rows(tmp_path)
+
+    march, _, paths = read_dataset(tmp_path, "BMW M3", pd.Timestamp("2025-03-01").date(),
+                                   pd.Timestamp("2025-03-31").date())
+    moved = march["Data i Godzina"].notna().idxmax()
+    march.loc[moved, "Data i Godzina"] = march.loc[moved, "Data i Godzina"] + pd.DateOffset(months=1)
+    exact, merged = write_dataset(march, tmp_path, replace=paths)
+
+    # Edited again in the other partition, then moved back
+    march.loc[moved, "Stan Licznika"] = march.loc[moved, "Stan Licznika"] + 1
+    exact, merged = write_dataset(march, tmp_path, replace=exact, merged=merged)
+    april = partition_rows(tmp_path)["BMW M3/2025/04/log.csv"]
+    assert april == before["BMW M3/2025/04/log.csv"] + 1
+    march.loc[moved, "Data i Godzina"] = march.loc[moved, "Data i Godzina"] - pd.DateOffset(months=1)
+    write_dataset(march, tmp_path, replace=exact, merged=merged)
+    assert partition_rows(tmp_path) == before
+
+
+def test_plates_differing_in_case_get_their_own_directories(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    rows = df.iloc[:2].copy()
+    rows["Pojazd"] = pd.Series(["ABC 123", "abc 123"], index=rows.index)
+    rows["Data i Godzina"] = rows["Data i Godzina"].iloc[0]
+    write_dataset(rows, tmp_path)
+    directories = [path.split("/")[0] for path in read_manifest(tmp_path)]
+    assert len({d.lower() for d in directories}) == 2
+    for vehicle in ("ABC 123", "abc 123"):
+        read, _, _ = read_dataset(tmp_path, vehicle)
+        assert set(read["Pojazd"].astype(str)) == {"ABC 123", "abc 123"}
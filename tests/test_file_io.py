@@ -0,0 +1,64 @@
+import pandas as pd
+
+from conftest import LOG_PATH
+from file_io import load_log, merge_logs, normalize_log, read_logs, with_raw_text, write_csv
+
+
+def test_saved_logs_merge_with_unique_ids(tmp_path):
+    df, _ = load_log(LOG_PATH)
+    half = len(df.index) // 2
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    write_csv(df.iloc[:half + 10], str(first))
+    write_csv(df.iloc[half:], str(second))
+    assert "_id" not in pd.read_csv(first, nrows=0).columns
+
+    # An older save that still carries row ids
+    old = pd.read_csv(second)
+    old.insert(len(old.columns), "_id", range(len(old.index)))
+    old.to_csv(second, index=False)
+
+    _, merged, _, duplicates = read_logs([str(first), str(second)], max_workers=1)
+    assert duplicates == 10
+    assert len(merged.index) == len(df.index)
+    assert merged["_id"].is_unique
+
+
+def test_unread_values_survive_a_save(tmp_path):
+    raw = pd.read_csv(LOG_PATH)
+    raw["Data i Godzina"] = raw["Data i Godzina"].astype(object)
+    raw["Stan Licznika"] = raw["Stan Licznika"].astype(object)
+    raw.loc[0, "Data i Godzina"] = "jutro"
+    raw.loc[1, "Stan Licznika"] = "12 345.6"
+    source = tmp_path / "source.csv"
+    raw.to_csv(source, index=False)
+
+    df, parse_errors = load_log(str(source))
+    assert {(col, text) for _, col, text in parse_errors} == {
+        ("Data i Godzina", "jutro"), ("Stan Licznika", "12 345.6")
+    }
+    saved = tmp_path / "saved.csv"
+    write_csv(with_raw_text(df, parse_errors), str(saved))
+    again = pd.read_csv(saved)
+    assert again.loc[0, "Data i Godzina"] == "jutro"
+    assert again.loc[1, "Stan Licznika"] == "12 345.6"
+    assert again.loc[2, "Data i Godzina"] == raw.loc[2, "Data i Godzina"]
+
+
+def test_merge_moves_parse_errors_with_their_rows(tmp_path):
+    raw = pd.read_csv(LOG_PATH, nrows=5)
+    raw["Stan Licznika"] = ["100", "abc", "120", "130", "140"]
+    source = tmp_path / "open.csv"
+    raw.iloc[:3].to_csv(source, index=False)
+    df, parse_errors = load_log(str(source))
+    # The open log sorted descending by odometer: its ids are no longer positions
+    df = df.iloc[[2, 0, 1]].reset_index(drop=True)
+    imported, _ = normalize_log(raw.iloc[3:].reset_index(drop=True))
+    imported = imported.assign(_id=imported["_id"] + 10)
+
+    merged, duplicates, ids = merge_logs([("Open log", df), ("Import", imported)])
+    merged, _ = normalize_log(merged)
+    parse_errors = [(ids[row_id], col, text) for row_id, col, text in parse_errors if row_id in ids]
+
+    out = with_raw_text(merged, parse_errors)
+    assert duplicates == 0
+    assert out["Stan Licznika"].tolist() == [120, 100, "abc", 130, 140]
@@ -0,0 +1,21 @@
+from history import SPILL_LIMIT_FACTOR, UndoHistory, entry_size
+
+
+def edit(i):
+    return ('edit', "Kierowca", [i], [f"old {i}" * 20], [f"new {i}" * 20])
+
+
+def test_spill_file_is_capped():
+    history = UndoHistory(max_bytes=10 * entry_size(edit(0)))
+    for i in range(2000):
+        history.push_undo(edit(i))
+    spill_file = history._spill_file
+    spill_file.seek(0, 2)
+    assert spill_file.tell() <= 2 * (SPILL_LIMIT_FACTOR + 1) * history.max_bytes
+
+    undone = []
+    while (entry := history.pop_undo()) is not None:
+        undone.append(entry[2][0])
+    # Newest first, without gaps, down to the oldest entry still kept
+    assert undone == list(range(1999, 1999 - len(undone), -1))
+    assert len(undone) > 2 * 10  # spilled entries came back too
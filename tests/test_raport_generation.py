@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from conftest import LOG_PATH
+from file_io import load_log
+from raport_generation import aggregate_log_file, aggregate_trips
+
+
+def test_chunked_aggregation_matches_in_memory(tmp_path):
+    raw = pd.read_csv(LOG_PATH)
+    times = pd.to_datetime(raw["Data i Godzina"], format="%d.%m.%Y %H:%M")
+    ordered = tmp_path / "ordered.csv"
+    raw.iloc[times.argsort(kind="stable")].to_csv(ordered, index=False)
+    expected = aggregate_trips(raw)
+    # Chunks concatenate text columns as object, the values must match
+    pd.testing.assert_frame_equal(aggregate_log_file(str(ordered), chunksize=25), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        aggregate_log_file(str(ordered), "BMW M3", chunksize=25),
+        aggregate_trips(raw[raw["Pojazd"] == "BMW M3"]), check_dtype=False
+    )
+
+
+def test_chunked_aggregation_refuses_unordered_log():
+    # raport.csv lists one vehicle after another, not in time order
+    with pytest.raises(ValueError, match="not in time order"):
+        aggregate_log_file(LOG_PATH, chunksize=25)
+
+
+def test_report_with_missing_odometer(tmp_path, monkeypatch):
+    import locale
+    from raport_generation import raport_generate
+    monkeypatch.setattr(locale, "setlocale", lambda *args, **kwargs: None)
+    raw = pd.read_csv(LOG_PATH)
+    trips = aggregate_trips(raw[raw["Pojazd"] == "BMW M3"])
+    trips.loc[0, "Stan licznika\nwyjazd"] = pd.NA
+    raport_generate(trips, ["BMW M3", "Karolina Wójcik", "01.03.2025", "31.03.2025"], str(tmp_path),
+                    max_workers=1)
+    trips["Stan licznika\nprzyjazd"] = pd.NA
+    raport_generate(trips, ["BMW M3", "Karolina Wójcik", "01.03.2025", "31.03.2025"], str(tmp_path),
+                    engine="canvas", max_workers=1)
+    assert [name for name in tmp_path.iterdir() if name.suffix == ".pdf"]
+
+
+def page_texts(path):
+    from pypdf import PdfReader
+    return [page.extract_text() for page in PdfReader(path).pages]
+
+
+def test_parallel_report_matches_single_build(tmp_path, monkeypatch):
+    import locale
+    from concurrent.futures import ThreadPoolExecutor
+    import raport_generation
+    pytest.importorskip("pypdf")
+    monkeypatch.setattr(locale, "setlocale", lambda *args, **kwargs: None)
+    # Threads stand in for the spawned workers, which would not see the patched locale
+    monkeypatch.setattr(
+        raport_generation, "ProcessPoolExecutor",
+        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)
+    )
+    monkeypatch.setattr(raport_generation, "PARALLEL_MIN_ROWS", {"platypus": 0, "canvas": 0})
+    trips = aggregate_trips(pd.read_csv(LOG_PATH))
+    other_data = ["BMW M3", "Karolina Wójcik", "01.03.2025", "31.03.2025"]
+    for engine in raport_generation.REPORT_ENGINES:
+        single, parallel = tmp_path / f"{engine}-single", tmp_path / f"{engine}-parallel"
+        raport_generation.raport_generate(trips, other_data, str(single), engine=engine, max_workers=1)
+        raport_generation.raport_generate(trips, other_data, str(parallel), engine=engine, max_workers=3)
+        expected = page_texts(next(single.iterdir()))
+        assert len(expected) > 3
+        assert page_texts(next(parallel.iterdir())) == expected
+
+
+def test_canvas_rows_match_platypus_table(tmp_path, monkeypatch):
+    import locale
+    from raport_generation import raport_generate
+    pytest.importorskip("pypdf")
+    monkeypatch.setattr(locale, "setlocale", lambda *args, **kwargs: None)
+    raw = pd.read_csv(LOG_PATH)
+    trips = aggregate_trips(raw[raw["Pojazd"] == "BMW M3"])
+    trips.loc[1, "Stan licznika\nwyjazd"] = pd.NA
+    other_data = ["BMW M3", "Karolina Wójcik", "01.03.2025", "31.03.2025"]
+    texts = {}
+    for engine in ("platypus", "canvas"):
+        raport_generate(trips, other_data, str(tmp_path / engine), engine=engine, max_workers=1)
+        texts[engine] = page_texts(next((tmp_path / engine).iterdir()))
+    assert len(texts["canvas"]) == len(texts["platypus"])
+    for canvas_page, platypus_page in zip(texts["canvas"], texts["platypus"]):
+        assert sorted(canvas_page.split()) == sorted(platypus_page.split())
+
+
+def test_bundle_numbers_each_report_from_one(tmp_path, monkeypatch):
+    import locale
+    from raport_generation import raport_generate_bundle, vehicle_reports
+    pytest.importorskip("pypdf")
+    monkeypatch.setattr(locale, "setlocale", lambda *args, **kwargs: None)
+    df, _ = load_log(LOG_PATH)
+    reports = vehicle_reports(df.drop(columns="_id"))
+    texts = page_texts(raport_generate_bundle(reports, str(tmp_path)))
+    numbers = [int(text.split("Strona ")[1].split()[0]) for text in texts]
+    assert numbers.count(1) == len(reports)
+    assert all(b in (1, a + 1) for a, b in zip(numbers, numbers[1:]))
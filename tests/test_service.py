@@ -0,0 +1,40 @@
+import http.client
+import locale
+import os
+import threading
+
+from conftest import LOG_PATH
+from service import make_server, run_report_job
+
+
+def test_vehicle_stays_inside_output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(locale, "setlocale", lambda *args, **kwargs: None)
+    out_dir = tmp_path / "job"
+    out_dir.mkdir()
+    with open(LOG_PATH, "rb") as f:
+        data = f.read().replace("Honda Civic".encode(), b"../x")
+    params = {"vehicle": "../x", "driver": "Anna Kowalska"}
+    result = run_report_job(data, "text/csv", params, str(out_dir))
+    assert sorted(os.listdir(tmp_path)) == ["job"]
+    assert os.path.dirname(result["path"]) == str(out_dir)
+
+
+def test_bad_content_length_is_rejected(tmp_path):
+    server = make_server(0, workers=1, output_dir=str(tmp_path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for length in ("abc", "-5"):
+            connection = http.client.HTTPConnection(*server.server_address)
+            connection.putrequest("POST", "/jobs")
+            connection.putheader("Content-Length", length)
+            connection.endheaders()
+            assert connection.getresponse().status == 400
+            connection.close()
+        connection = http.client.HTTPConnection(*server.server_address)
+        connection.request("POST", "/jobs?engine=latex", body=b"")
+        assert connection.getresponse().status == 400
+        connection.close()
+    finally:
+        server.shutdown()
+        server.service.shutdown()
@@ -0,0 +1,19 @@
+import threading
+
+import shards
+from conftest import LOG_PATH
+from file_io import load_log
+from raport_generation import generate_trips
+
+
+def test_cancelled_generate_stops_sharded_aggregation(monkeypatch):
+    df, _ = load_log(LOG_PATH)
+    cancelled = threading.Event()
+    trips = generate_trips(df, sharded=True, cancelled=cancelled)
+    assert trips is not None and not trips.empty
+
+    cancelled.set()
+    assert generate_trips(df, sharded=True, cancelled=cancelled) is None
+    # Through the pool as well
+    monkeypatch.setattr(shards, "SHARD_MIN_ROWS", 0)
+    assert shards.aggregate_trips_sharded(df, max_workers=2, cancelled=cancelled) is None
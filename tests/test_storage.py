@@ -0,0 +1,73 @@
+import datetime
+
+from PySide6.QtCore import QCoreApplication
+
+from conftest import LOG_PATH
+from file_io import REQUIRED_COLUMNS, load_log
+from raport_generation import aggregate_trips
+from storage import LogStore, SqlLogModel
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def open_store(tmp_path):
+    store = LogStore(str(tmp_path / "log.sqlite"))
+    df, _ = load_log(LOG_PATH)
+    store.import_log(df)
+    return store, df
+
+
+def test_edit_repeating_a_row_is_rejected(tmp_path):
+    store, _ = open_store(tmp_path)
+    model = SqlLogModel(store)
+    first = [model.data(model.index(0, col)) for col in range(model.columnCount())]
+    for col in range(model.columnCount()):
+        model.setData(model.index(1, col), first[col])
+    second = [model.data(model.index(1, col)) for col in range(model.columnCount())]
+    assert second != first
+    assert store.count() == model.rowCount()
+
+
+def test_vehicle_frame_reads_one_plate_in_time_order(tmp_path):
+    store, df = open_store(tmp_path)
+    model = SqlLogModel(store)
+    start, end = datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)
+    model.set_query_filter("honda civic", start, end)
+    frame = model.vehicle_frame()
+    assert len(frame.index) == model.rowCount()
+    assert frame["Data i Godzina"].is_monotonic_increasing
+    assert aggregate_trips(frame).equals(aggregate_trips(model.rows_frame(list(range(model.rowCount())))))
+
+    model.set_query_filter("Kowalska")
+    assert model.vehicle_frame() is None
+
+
+def scanned_lengths(store):
+    return [store.connection.execute(
+        f'SELECT MAX(LENGTH("{c}")) FROM log').fetchone()[0] for c in REQUIRED_COLUMNS]
+
+
+def test_longest_values_follow_imports_and_edits(tmp_path):
+    store, _ = open_store(tmp_path)
+    kept = dict(store.connection.execute("SELECT name, LENGTH(value) FROM longest"))
+    assert [kept[c] for c in REQUIRED_COLUMNS] == scanned_lengths(store)
+
+    model = SqlLogModel(store)
+    col = REQUIRED_COLUMNS.index("Kierowca")
+    model.setData(model.index(0, col), "x" * 80)
+    assert store.longest_values()[col] == "x" * 80
+    store.close()
+
+    reopened = LogStore(str(tmp_path / "log.sqlite"))
+    assert reopened.longest_values()[col] == "x" * 80
+
+
+def test_search_text_wildcards_match_themselves(tmp_path):
+    store, df = open_store(tmp_path)
+    assert store.count("%") == 0
+    assert store.count("_") == 0
+    row = df.iloc[[0]].copy()
+    row["Kierowca"] = "Nowak_50%"
+    store.import_log(row)
+    assert store.count("k_50%") == 1
+    assert store.count("k_5_%") == 0
@@ -2,7 +2,8 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QGraphicsOpacityEffect, QPushButton, QFileDialog, QFrame,
     QLineEdit, QFormLayout, QGroupBox, QDateEdit,
-    QTableWidget, QTableWidgetItem, QMessageBox
+    QTableWidget, QTableWidgetItem, QMessageBox,
+    QTabWidget, QTableView, QSpinBox, QComboBox, QCheckBox
 )
 from PySide6.QtGui import (
     QAction, QPixmap, QIcon, QKeySequence, QShortcut
@@ -10,17 +11,20 @@ from PySide6.QtGui import (
 from PySide6.QtCore import (
     Qt, QPropertyAnimation, QDate
 )
+import os
 import pandas as pd
 
-from raport_generation import raport_generate
+from file_io import LOG_FILE_FILTER, is_log_file, read_logs, merge_logs, normalize_log
+from workers import run_in_background
 
 
 class DropArea(QFrame):
-    def __init__(self, on_error):
+    def __init__(self, on_error, multiple=False):
         super().__init__()
         self.setObjectName("dropAreaFrame")
         self.setAcceptDrops(True)
         self.on_error = on_error
+        self.multiple = multiple
 
         self.setStyleSheet("""
             #dropAreaFrame {
@@ -32,7 +36,10 @@ class DropArea(QFrame):
         """)
 
         layout = QVBoxLayout()
-        self.label = QLabel("Drop a .csv file here or browse")
+        if multiple:
+            self.label = QLabel("Drop .csv files, compressed logs, .zip bundles\nor a folder here or browse")
+        else:
+            self.label = QLabel("Drop a .csv file here or browse")
         self.label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.label)
 
@@ -41,42 +48,82 @@ class DropArea(QFrame):
         self.browse_button.clicked.connect(self.open_file_dialog)
         layout.addWidget(self.browse_button, alignment=Qt.AlignCenter)
 
+        if multiple:
+            self.browse_folder_button = QPushButton("Browse Folder")
+            self.browse_folder_button.setObjectName("dropButton")
+            self.browse_folder_button.clicked.connect(self.open_folder_dialog)
+            layout.addWidget(self.browse_folder_button, alignment=Qt.AlignCenter)
+
         self.setLayout(layout)
         self.file_path = None
+        self.file_paths = []
 
     def set_file(self, file_path):
-        self.file_path = file_path
-        self.label.setText(file_path)
+        self.set_files([file_path])
+
+    def set_files(self, file_paths):
+        self.file_paths = list(file_paths)
+        self.file_path = self.file_paths[0] if self.file_paths else None
+        if len(self.file_paths) == 1:
+            self.label.setText(self.file_path)
+        else:
+            self.label.setText(f"{len(self.file_paths)} items selected")
+
+    def accepts_path(self, path):
+        # Logs may also come gzip, bz2 or xz compressed, or bundled in a zip
+        if self.multiple:
+            return os.path.isdir(path) or is_log_file(path)
+        return path.lower().endswith(".csv")
+
+    def extension_error(self):
+        if self.multiple:
+            self.on_error("Logs need a .csv, .csv.gz, .csv.bz2, .csv.xz or .zip extension!")
+        else:
+            self.on_error("The file needs to have .csv extension!")
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             urls = event.mimeData().urls()
-            if urls and urls[0].toLocalFile().lower().endswith(".csv"):
+            if not self.multiple:
+                urls = urls[:1]
+            if urls and all(self.accepts_path(url.toLocalFile()) for url in urls):
                 event.acceptProposedAction()
             else:
                 event.ignore()
-                self.on_error("The file needs to have .csv extension!")
+                self.extension_error()
         else:
             event.ignore()
 
     def dropEvent(self, event):
         urls = event.mimeData().urls()
-        if urls:
-            file_path = urls[0].toLocalFile()
-            if file_path.lower().endswith(".csv"):
-                self.set_file(file_path)
-            else:
-                self.on_error("The file needs to have .csv extension!")
+        if not self.multiple:
+            urls = urls[:1]
+        paths = [url.toLocalFile() for url in urls]
+        if paths and all(self.accepts_path(p) for p in paths):
+            self.set_files(paths)
+        elif paths:
+            self.extension_error()
 
     def open_file_dialog(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select CSV File", "", "CSV Files (*.csv)"
-        )
-        if file_path:
-            if file_path.lower().endswith(".csv"):
-                self.set_file(file_path)
+        if self.multiple:
+            file_paths, _ = QFileDialog.getOpenFileNames(
+                self, "Select Log Files", "", LOG_FILE_FILTER
+            )
+        else:
+            file_path, _ = QFileDialog.getOpenFileName(
+                self, "Select CSV File", "", "CSV Files (*.csv)"
+            )
+            file_paths = [file_path] if file_path else []
+        if file_paths:
+            if all(self.accepts_path(p) for p in file_paths):
+                self.set_files(file_paths)
             else:
-                self.on_error("The file needs to have .csv extension!")
+                self.extension_error()
+
+    def open_folder_dialog(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if folder:
+            self.set_files([folder])
 
 
 class FormArea(QGroupBox):
@@ -162,7 +209,7 @@ class DragDropWindow(QWidget):
 
         layout = QVBoxLayout()
 
-        self.drop_area = DropArea(self.show_toast)
+        self.drop_area = DropArea(self.show_toast, multiple=(mode == "file"))
         layout.addWidget(self.drop_area)
 
         self.submit_button = QPushButton("Submit")
@@ -201,32 +248,23 @@ class DragDropWindow(QWidget):
         self.anim.start()
 
     def on_submit(self):
-        path = self.drop_area.file_path
-        if not path:
+        paths = self.drop_area.file_paths
+        if not paths:
             self.show_toast("Please select a CSV file first.")
             return
+        if self.mode == "file":
+            # Files are parsed in worker processes, keep the GUI responsive
+            self.submit_button.setEnabled(False)
+            self.show_toast("Loading...")
+            self.worker = run_in_background(
+                read_logs, paths,
+                on_finished=self.on_logs_loaded,
+                on_failed=self.on_load_failed
+            )
+            return
         try:
-            df = pd.read_csv(path)
-            if (self.mode == "file"):
-                required_cols = {
-                "Pojazd", "Kierowca", "Data i Godzina",
-                "Cel Trasy", "Stan Licznika", "Tankowanie"
-                }
-
-                if not required_cols.issubset(df.columns):
-                    missing = required_cols - set(df.columns)
-                    self.show_toast(f"CSV is missing columns: {', '.join(missing)}")
-                    return
-
-                if getattr(self.main_window, "df", None) is not None:
-                    # The idea is to create new instance of main window
-                    self.show_toast("womp womp — MainWindow already has a DataFrame.")
-                    return
-                else:
-                    self.main_window.df = df
-                    self.main_window.add_recent_file(path)
-                    self.main_window.reload_window()
-            elif (self.mode == "data"):
+            df = pd.read_csv(paths[0])
+            if (self.mode == "data"):
                 required_cols = {"Pojazd", "Kierowca"}
                 if not required_cols.issubset(df.columns):
                     self.show_toast("CSV must contain 'Pojazd' and 'Kierowca' columns, dumbass.")
@@ -241,6 +279,42 @@ class DragDropWindow(QWidget):
             self.show_toast(f"Failed to load CSV: {e}")
             return
 
+    def on_logs_loaded(self, result):
+        paths, df, parse_errors, duplicates = result
+        try:
+            model = getattr(self.main_window, "model", None)
+            merged = getattr(self.main_window, "df", None) is not None and model is not None
+            if merged:
+                # Merge into the open log, the result no longer matches one file.
+                # Imported ids are shifted past the open log's ids.
+                offset = model._next_id
+                df = df.assign(_id=df["_id"] + offset)
+                parse_errors = [(row_id + offset, col, text) for row_id, col, text in parse_errors]
+                parse_errors += [(row_id, col, text) for (row_id, col), text in model.parse_errors.items()]
+                df, merged_duplicates, ids = merge_logs([("Open log", model._df), ("Import", df)])
+                df, _ = normalize_log(df)
+                # Errors follow their rows to the new ids, those of dropped repeats go
+                parse_errors = [(ids[row_id], col, text) for row_id, col, text in parse_errors if row_id in ids]
+                duplicates += merged_duplicates
+                self.main_window.filename = None
+            self.main_window.df = df
+            self.main_window.parse_errors = parse_errors
+            self.main_window.current_path = paths[0] if len(paths) == 1 and not merged else None
+            if not merged:
+                self.main_window.dataset = None
+            if len(paths) == 1:
+                self.main_window.add_recent_file(paths[0])
+            self.main_window.reload_window()
+        except Exception as e:
+            self.on_load_failed(str(e))
+            return
+        print(f"Imported {len(paths)} file(s), skipped {duplicates} duplicate rows")
+        self.close()
+
+    def on_load_failed(self, error):
+        self.submit_button.setEnabled(True)
+        self.show_toast(f"Failed to load CSV: {error}")
+
 
 class ManageIDPersonWindow(QWidget):
     def __init__(self, main_window):
@@ -363,6 +437,7 @@ class ManualExport(QGroupBox):
         self.setLayout(layout)
 
     def on_generate_report(self):
+        from raport_generation import raport_generate
         args = [
             self.registration_input.text(),
             self.driver_input.text(),
@@ -372,7 +447,136 @@ class ManualExport(QGroupBox):
             self.tacho_end_input.text(),
             self.kilometers_input.text()
         ]
-        raport_generate(self.aggregated_df, args)
+        raport_generate(self.aggregated_df, args, refuel_appendix=self.main_window.refuel_appendix())
+
+
+class FindReplace(QGroupBox):
+    def __init__(self, main_window):
+        super().__init__("Find and Replace")
+        self.main_window = main_window
+        self.setWindowTitle("Find and Replace")
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QFormLayout()
+
+        model = self.main_window.model
+        self.column_input = QComboBox()
+        self.column_input.addItems([model.headerData(i, Qt.Horizontal) for i in range(model.columnCount())])
+        self.column_input.setCurrentText("Cel Trasy")
+        layout.addRow(QLabel("Kolumna:"), self.column_input)
+
+        self.find_input = QLineEdit()
+        layout.addRow(QLabel("Znajdź:"), self.find_input)
+
+        self.replace_input = QLineEdit()
+        layout.addRow(QLabel("Zamień na:"), self.replace_input)
+
+        self.regex_input = QCheckBox("Wyrażenie regularne")
+        layout.addRow(self.regex_input)
+
+        self.visible_only_input = QCheckBox("Tylko widoczne wiersze")
+        self.visible_only_input.setChecked(True)
+        layout.addRow(self.visible_only_input)
+
+        self.replace_btn = QPushButton("Replace All")
+        self.replace_btn.clicked.connect(self.on_replace)
+        layout.addRow(self.replace_btn)
+
+        self.setLayout(layout)
+
+    def on_replace(self):
+        import re
+        from backend import proxy_rows
+        if not self.find_input.text():
+            return
+        rows = None
+        if self.visible_only_input.isChecked():
+            rows = proxy_rows(self.main_window.proxy_model)
+        try:
+            changed = self.main_window.model.find_replace(
+                self.column_input.currentIndex(), self.find_input.text(),
+                self.replace_input.text(), regex=self.regex_input.isChecked(), rows=rows
+            )
+        except (re.error, ValueError) as e:
+            QMessageBox.warning(self, "Error", f"Could not replace:\n{e}")
+            return
+        QMessageBox.information(self, "Replaced", f"Replaced {changed} values.")
+
+
+class OpenDataset(QGroupBox):
+    def __init__(self, main_window):
+        super().__init__("Open Dataset")
+        self.main_window = main_window
+        self.setWindowTitle("Open Dataset")
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QFormLayout()
+
+        folder_row = QHBoxLayout()
+        self.folder_input = QLineEdit(self.main_window.settings.value("dataset_path", ""))
+        self.folder_input.editingFinished.connect(self.load_overview)
+        folder_row.addWidget(self.folder_input)
+        browse_btn = QPushButton("Browse")
+        browse_btn.clicked.connect(self.browse)
+        folder_row.addWidget(browse_btn)
+        layout.addRow(QLabel("Katalog:"), folder_row)
+
+        self.vehicle_input = QComboBox()
+        self.vehicle_input.setEditable(True)
+        layout.addRow(QLabel("Pojazd:"), self.vehicle_input)
+
+        self.start_date = QDateEdit()
+        self.start_date.setCalendarPopup(True)
+        self.start_date.setDisplayFormat("dd.MM.yyyy")
+        layout.addRow(QLabel("Od:"), self.start_date)
+
+        self.finish_date = QDateEdit()
+        self.finish_date.setCalendarPopup(True)
+        self.finish_date.setDisplayFormat("dd.MM.yyyy")
+        layout.addRow(QLabel("Do:"), self.finish_date)
+
+        self.open_btn = QPushButton("Open")
+        self.open_btn.clicked.connect(self.on_open)
+        layout.addRow(self.open_btn)
+
+        self.setLayout(layout)
+        self.load_overview()
+
+    def browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Dataset", self.folder_input.text())
+        if folder:
+            self.folder_input.setText(folder)
+            self.load_overview()
+
+    def load_overview(self):
+        # Plates and dates straight from the manifest, nothing else is read
+        from dataset import dataset_overview
+        folder = self.folder_input.text()
+        if not folder or not os.path.isdir(folder):
+            return
+        try:
+            vehicles, first, last = dataset_overview(folder)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Could not read dataset:\n{e}")
+            return
+        self.vehicle_input.clear()
+        self.vehicle_input.addItems([""] + vehicles)
+        if first is not None:
+            self.start_date.setDate(QDate(first.year, first.month, first.day))
+            self.finish_date.setDate(QDate(last.year, last.month, last.day))
+
+    def on_open(self):
+        folder = self.folder_input.text()
+        if not folder:
+            return
+        self.main_window.settings.setValue("dataset_path", folder)
+        self.main_window.load_dataset(
+            folder, self.vehicle_input.currentText().strip() or None,
+            self.start_date.date(), self.finish_date.date()
+        )
+        self.close()
 
 
 class ConfigManagement(QGroupBox):
@@ -383,6 +587,10 @@ class ConfigManagement(QGroupBox):
         self.init_ui()
         self.original_drivers_path = self.drivers_path_edit.text()  # Track original value
         self.original_exports_path = self.exports_path_edit.text()  # Track original value
+        self.original_inbox_path = self.inbox_path_edit.text()  # Track original value
+        self.original_database_path = self.database_path_edit.text()  # Track original value
+        self.original_undo_memory = self.undo_memory_input.value()  # Track original value
+        self.original_refuel_appendix = self.refuel_appendix_input.isChecked()  # Track original value
 
     def init_ui(self):
         self.drivers_label = QLabel("Ścieżka prowadząca do mapy kierowców i pojazdów")
@@ -403,6 +611,32 @@ class ConfigManagement(QGroupBox):
         self.browse_exports_button = QPushButton("Browse")
         self.browse_exports_button.clicked.connect(lambda: self.browse_for_path(self.exports_path_edit))
 
+        self.inbox_label = QLabel("Ścieżka do folderu z dopisywanymi plikami CSV")
+        self.inbox_path_edit = QLineEdit()
+
+        saved_inbox_path = self.main_window.settings.value("inbox_path", "")
+        self.inbox_path_edit.setText(saved_inbox_path)
+
+        self.browse_inbox_button = QPushButton("Browse")
+        self.browse_inbox_button.clicked.connect(lambda: self.browse_for_path(self.inbox_path_edit))
+
+        self.database_label = QLabel("Ścieżka do folderu z bazą danych przejazdów")
+        self.database_path_edit = QLineEdit()
+
+        saved_database_path = self.main_window.settings.value("database_path", "")
+        self.database_path_edit.setText(saved_database_path)
+
+        self.browse_database_button = QPushButton("Browse")
+        self.browse_database_button.clicked.connect(lambda: self.browse_for_path(self.database_path_edit))
+
+        self.undo_memory_label = QLabel("Limit pamięci historii zmian (MB), starsze zmiany trafiają na dysk")
+        self.undo_memory_input = QSpinBox()
+        self.undo_memory_input.setRange(1, 4096)
+        self.undo_memory_input.setValue(int(self.main_window.settings.value("undo_memory_mb", 64)))
+
+        self.refuel_appendix_input = QCheckBox("Dołączaj zestawienie tankowań do raportów PDF")
+        self.refuel_appendix_input.setChecked(self.main_window.refuel_appendix())
+
         self.save_button = QPushButton("Save")
         self.save_button.clicked.connect(self.save_changes)
 
@@ -417,6 +651,14 @@ class ConfigManagement(QGroupBox):
         exports_layout.addWidget(self.exports_path_edit)
         exports_layout.addWidget(self.browse_exports_button)
 
+        inbox_layout = QHBoxLayout()
+        inbox_layout.addWidget(self.inbox_path_edit)
+        inbox_layout.addWidget(self.browse_inbox_button)
+
+        database_layout = QHBoxLayout()
+        database_layout.addWidget(self.database_path_edit)
+        database_layout.addWidget(self.browse_database_button)
+
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.exit_button)
@@ -426,6 +668,13 @@ class ConfigManagement(QGroupBox):
         v_layout.addLayout(drivers_layout)
         v_layout.addWidget(self.exports_label)
         v_layout.addLayout(exports_layout)
+        v_layout.addWidget(self.inbox_label)
+        v_layout.addLayout(inbox_layout)
+        v_layout.addWidget(self.database_label)
+        v_layout.addLayout(database_layout)
+        v_layout.addWidget(self.undo_memory_label)
+        v_layout.addWidget(self.undo_memory_input)
+        v_layout.addWidget(self.refuel_appendix_input)
         v_layout.addLayout(button_layout)
 
         self.setLayout(v_layout)
@@ -442,10 +691,25 @@ class ConfigManagement(QGroupBox):
         new_exports_path = self.exports_path_edit.text()
         self.main_window.settings.setValue("export_location_path", new_exports_path)
         self.original_exports_path = new_exports_path  # Update original after saving
+        new_inbox_path = self.inbox_path_edit.text()
+        self.main_window.settings.setValue("inbox_path", new_inbox_path)
+        self.original_inbox_path = new_inbox_path  # Update original after saving
+        self.main_window.start_inbox_watcher()
+        new_database_path = self.database_path_edit.text()
+        self.main_window.settings.setValue("database_path", new_database_path)
+        self.original_database_path = new_database_path  # Update original after saving
+        self.main_window.settings.setValue("undo_memory_mb", self.undo_memory_input.value())
+        self.original_undo_memory = self.undo_memory_input.value()  # Update original after saving
+        self.main_window.settings.setValue("refuel_appendix", self.refuel_appendix_input.isChecked())
+        self.original_refuel_appendix = self.refuel_appendix_input.isChecked()  # Update original after saving
         QMessageBox.information(self, "Saved", "Configuration has been saved.")
 
     def exit_config(self):
-        if self.drivers_path_edit.text() != self.original_drivers_path:
+        if (self.drivers_path_edit.text() != self.original_drivers_path
+                or self.inbox_path_edit.text() != self.original_inbox_path
+                or self.database_path_edit.text() != self.original_database_path
+                or self.undo_memory_input.value() != self.original_undo_memory
+                or self.refuel_appendix_input.isChecked() != self.original_refuel_appendix):
             reply = QMessageBox.question(
                 self, "Unsaved Changes",
                 "You have unsaved changes. Do you want to save before exiting?",
@@ -461,3 +725,40 @@ class ConfigManagement(QGroupBox):
         else:
             self.close()
 
+
+
+class SummaryWindow(QWidget):
+    def __init__(self, main_window, summary):
+        super().__init__()
+        self.main_window = main_window
+        self.summary = summary
+        self.setWindowTitle("Fleet Summary")
+        self.setGeometry(350, 250, 600, 400)
+
+        layout = QVBoxLayout()
+        self.tabs = QTabWidget()
+        self.vehicle_months_view = QTableView()
+        self.tabs.addTab(self.vehicle_months_view, "Pojazd / miesiąc")
+        self.drivers_view = QTableView()
+        self.tabs.addTab(self.drivers_view, "Kierowcy")
+        self.vehicles_view = QTableView()
+        self.tabs.addTab(self.vehicles_view, "Km na dzień")
+        layout.addWidget(self.tabs)
+        self.setLayout(layout)
+
+        self.summary.add_listener(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        from backend import PandasModel
+        for view, table in (
+            (self.vehicle_months_view, self.summary.vehicle_months),
+            (self.drivers_view, self.summary.drivers),
+            (self.vehicles_view, self.summary.vehicles),
+        ):
+            view.setModel(PandasModel(table.reset_index(), locked=True))
+            view.resizeColumnsToContents()
+
+    def closeEvent(self, event):
+        self.summary.remove_listener(self.refresh)
+        super().closeEvent(event)
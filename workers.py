@@ -0,0 +1,71 @@
+import threading
+
+from PySide6.QtCore import (
+    QObject, QRunnable, QThreadPool, Signal
+)
+
+
+class WorkerSignals(QObject):
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class Worker(QRunnable):
+    # Runs fn(*args, **kwargs) on the global thread pool and reports the
+    # result back to the GUI thread through queued signals.
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+        # Lifetime is owned by Python, see _active_workers
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        # A queued worker is taken off the pool, a running one reports
+        # cancelled instead of its result. fn only stops early if it was
+        # given cancel_event and checks it.
+        self.cancel_event.set()
+        if QThreadPool.globalInstance().tryTake(self):
+            self.signals.cancelled.emit()
+
+    def run(self):
+        if self.cancel_event.is_set():
+            self.signals.cancelled.emit()
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(str(e))
+        else:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+# Keeps running workers alive until they report back
+_active_workers = set()
+
+
+def run_in_background(fn, *args, on_finished=None, on_failed=None, cancellable=False, **kwargs):
+    # With cancellable, fn gets the worker's cancel_event as cancelled=
+    worker = Worker(fn, *args, **kwargs)
+    if cancellable:
+        worker.kwargs["cancelled"] = worker.cancel_event
+    if on_finished is not None:
+        worker.signals.finished.connect(on_finished)
+    if on_failed is not None:
+        worker.signals.failed.connect(on_failed)
+    _active_workers.add(worker)
+    worker.signals.finished.connect(lambda _: _active_workers.discard(worker))
+    worker.signals.failed.connect(lambda _: _active_workers.discard(worker))
+    worker.signals.cancelled.connect(lambda: _active_workers.discard(worker))
+    QThreadPool.globalInstance().start(worker)
+    return worker